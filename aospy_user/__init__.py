@@ -1,14 +1,28 @@
-"""My library of aospy objects used for my research."""
+"""My library of aospy objects used for my research.
+
+Submodules and the objects they define are imported on first access; see
+`aospy_user.lazy`.
+"""
 from aospy.internal_names import (LAT_STR, LON_STR, PHALF_STR, PFULL_STR,
                                   PLEVEL_STR, TIME_STR)
 
-from . import units
-from . import regions
-from . import calcs
-from . import variables
-from . import runs
-from . import models
-from . import projs
-from .main import MainParams, MainParamsParser, CalcSuite, ObjectsForCalc, main
-from . import plot
-from .plot import PlotMainParams, plot_main
+from .lazy import lazy_module
+
+lazy_module(__name__, submodules=(
+    'units',
+    'regions',
+    'calcs',
+    'variables',
+    'runs',
+    'models',
+    'projs',
+    'dag',
+    'ensemble',
+    'incremental',
+), attrs={
+    'main': ('MainParams', 'MainParamsParser', 'CalcSuite', 'CalcScheduler',
+             'ObjectsForCalc', 'main'),
+    'store': ('ResultStore',),
+    'region_index': ('RegionIndex',),
+    'plot': ('PlotMainParams', 'plot_main'),
+})
@@ -6,7 +6,12 @@ xarray.DataArrays, to coincide with the same switch within aospy.  However, not
 all of the functions in this module have been converted to support this new
 datatype.
 """
+from .memo import intermediate_cache, memoize
+from .chunking import by_year_chunks, set_years_per_chunk, years_per_chunk
+from .vertcoord import HybridCoord, hybrid_coord, clear_hybrid_coords
 from .tendencies import (
+    period_stats,
+    period_mean,
     first_to_last_vals_dur,
     time_tendency_first_to_last,
     time_tendency_each_timestep,
@@ -14,12 +19,15 @@ from .tendencies import (
 from .numerics import (
     latlon_deriv_prefactor,
     wraparound,
+    periodic_cen_deriv,
+    periodic_upwind_advec,
     d_dx_from_latlon,
     d_dy_from_lat,
     d_dx_at_const_p_from_eta,
     d_dy_at_const_p_from_eta,
     d_dp_from_p,
-    d_dp_from_eta
+    d_dp_from_eta,
+    SpectralBatch,
 )
 from .thermo import (
     dse,
@@ -100,6 +108,7 @@ from .mass import (
     v_mass_adjustment,
     v_mass_adjusted,
     column_flux_divg,
+    column_budget_terms,
     column_flux_divg_adj,
     mass_column,
     mass_column_divg,
@@ -144,6 +153,7 @@ from .energy_budget import (
     energy_column_source,
     energy_column_divg,
     energy_column_budget_residual,
+    energy_budget_terms,
     uv_energy_adjustment,
     uv_energy_adjusted,
     uv_mass_energy_adjustment,
@@ -204,6 +214,7 @@ from .mse_budget import (
     mse_vert_advec_upwind,
     mse_total_advec_upwind,
     mse_budget_advec_residual,
+    mse_budget_terms,
 )
 from .mse_from_hypso_budget import(
     mse_from_hypso_zonal_advec_upwind,
@@ -221,6 +232,7 @@ from .fmse_budget import (
     fmse_zonal_deriv_eta,
     fmse_horiz_advec_eta_upwind,
     fmse_budget_advec_residual,
+    fmse_budget_terms,
     omega_change_from_fmse_budget,
 )
 from .dse_budget import (
@@ -231,6 +243,8 @@ from .dse_budget import (
     dse_vert_advec,
 )
 from .stats import (
+    pointwise_regr_stats,
+    regr_stats_from_chunks,
     pointwise_corr,
     pointwise_lin_regr,
     corr_cre_sw,
@@ -253,6 +267,7 @@ from .water import (
     moisture_column_budget_with_adj_lhs,
     moisture_column_budget_with_adj2_lhs,
     moisture_column_budget_residual,
+    moisture_budget_terms,
 )
 from .gms import (
     field_vert_int_max,
@@ -296,3 +311,24 @@ from .zonal_mean_circ import (
     precip_centroid,
     trop_height,
 )
+from .circ_metrics import (
+    zero_crossing_lat,
+    thermal_equator_lat,
+    hadley_edges,
+    hadley_extent,
+    itcz_lat,
+    centroid_weights,
+    precip_centroid_lat,
+)
+from .streamfunction import (
+    plevel_thickness,
+    mass_streamfunction,
+    mass_streamfunction_max,
+    msf_max_magnitude,
+)
+from .tropopause import tropopause_pressure
+from .heat_transport import (
+    grid_sfc_area,
+    clear_sfc_areas,
+    implied_transport,
+)
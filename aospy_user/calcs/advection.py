@@ -3,7 +3,7 @@ from aospy.utils.vertcoord import to_radians
 from indiff import Upwind
 
 from .. import LAT_STR, LON_STR, PFULL_STR
-from .numerics import (latlon_deriv_prefactor, wraparound,
+from .numerics import (latlon_deriv_prefactor, periodic_upwind_advec,
                        d_dx_from_latlon, d_dy_from_lat, d_dp_from_p,
                        d_dx_at_const_p_from_eta, d_dy_at_const_p_from_eta,
                        d_dp_from_eta, horiz_gradient_spharm,
@@ -39,10 +39,7 @@ def zonal_advec_upwind(arr, u, radius, order=2):
     """Advection in the zonal direction using upwind differencing."""
     prefactor = latlon_deriv_prefactor(to_radians(arr.coords[LAT_STR]),
                                        radius, d_dy_of_scalar_field=False)
-    arr_ext = wraparound(arr, LON_STR, left=order, right=order, circumf=360.)
-    lon_rad_ext = to_radians(arr_ext[LON_STR])
-    return prefactor*Upwind(u, arr_ext, LON_STR, coord=lon_rad_ext,
-                            order=order, fill_edge=False).advec()
+    return prefactor*periodic_upwind_advec(u, arr, LON_STR, order=order)
 
 
 def merid_advec_upwind(arr, v, radius, order=2):
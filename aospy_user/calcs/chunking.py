@@ -0,0 +1,116 @@
+"""Opt-in execution of calcs over successive chunks of whole years.
+
+By default, the functions in this package operate on the entire timeseries at
+once, which for multi-decade, sub-daily, 3-D data requires more memory than a
+typical node has.  Functions decorated with `by_year_chunks` can instead be
+applied separately to chunks spanning a given number of whole years, with the
+results concatenated in time.  If the input data is lazily loaded (as it is
+by aospy via xarray and dask), then only one chunk's worth of the inputs and
+intermediates is ever in memory.
+
+Splitting at year boundaries keeps the results identical to the unchunked
+computation for all functions that are local in time or that only involve
+operations within individual years or months, such as
+`time_tendency_each_timestep`, `time_tendency_first_to_last`, and monthly
+means.  Functions involving operations across years (e.g. averages over the
+whole record) must not be decorated.  Decorating a function also marks it as
+year-local, making Vars computed with it eligible for incremental execution
+(see `aospy_user.incremental`).
+
+Chunking is disabled by default.  Enable it via `set_years_per_chunk`, or
+temporarily via the `years_per_chunk` context manager:
+
+>>> with years_per_chunk(1):
+...     resid = energy_column_budget_residual(*data)
+"""
+import functools
+
+import numpy as np
+import xarray as xr
+
+from .. import TIME_STR
+
+_YEARS_PER_CHUNK = None
+
+
+def set_years_per_chunk(n_years):
+    """Set the number of years per chunk.  None disables chunking."""
+    global _YEARS_PER_CHUNK
+    _YEARS_PER_CHUNK = n_years
+
+
+class years_per_chunk(object):
+    """Context manager temporarily setting the number of years per chunk."""
+    def __init__(self, n_years):
+        self.n_years = n_years
+
+    def __enter__(self):
+        self._orig = _YEARS_PER_CHUNK
+        set_years_per_chunk(self.n_years)
+
+    def __exit__(self, *exc):
+        set_years_per_chunk(self._orig)
+
+
+def _has_time(obj):
+    return isinstance(obj, (xr.DataArray, xr.Dataset)) and TIME_STR in obj.dims
+
+
+def _time_chunk_indices(time, n_years):
+    """Indices along the time axis of each chunk of `n_years` years."""
+    years = time[TIME_STR + '.year'].values
+    unique_years = np.unique(years)
+    bounds = [(chunk[0], chunk[-1]) for chunk in
+              (unique_years[i:i + n_years]
+               for i in range(0, len(unique_years), n_years))]
+    return [np.where((years >= first) & (years <= last))[0]
+            for first, last in bounds]
+
+
+def _concat_results(results):
+    """Concatenate in time the results from each chunk."""
+    first = results[0]
+    if isinstance(first, tuple):
+        return tuple(_concat_results([res[n] for res in results])
+                     for n in range(len(first)))
+    if isinstance(first, list):
+        return [_concat_results([res[n] for res in results])
+                for n in range(len(first))]
+    if not _has_time(first):
+        raise ValueError("Can't compute in chunks of years a function whose "
+                         "output has no time dimension")
+    return xr.concat(results, dim=TIME_STR)
+
+
+def by_year_chunks(func):
+    """Apply the function separately to each chunk of whole years.
+
+    Only takes effect if chunking has been enabled.  The time axis of the
+    first argument with one determines the chunks; all arguments with a time
+    dimension are split accordingly, and all others are passed as is.  Each
+    chunk's result is loaded into memory before moving on to the next.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        n_years = _YEARS_PER_CHUNK
+        timed = [arg for arg in args if _has_time(arg)]
+        if not n_years or not timed:
+            return func(*args, **kwargs)
+        chunks = _time_chunk_indices(timed[0], n_years)
+        if len(chunks) == 1:
+            return func(*args, **kwargs)
+        results = []
+        for inds in chunks:
+            chunk_args = [arg.isel(**{TIME_STR: inds}) if _has_time(arg)
+                          else arg for arg in args]
+            result = func(*chunk_args, **kwargs)
+            if isinstance(result, (tuple, list)):
+                result = type(result)(res.load() for res in result)
+            else:
+                result = result.load()
+            results.append(result)
+        return _concat_results(results)
+    # Lets incremental execution know the function's values in each year
+    # depend only on that year's inputs.
+    wrapper.year_local = True
+    return wrapper
@@ -0,0 +1,294 @@
+"""Hadley cell, ITCZ, and thermal equator metrics for many samples at once.
+
+The functions in `zonal_mean_circ` that locate the Hadley cells, the ITCZ,
+and the thermal equator each operate on a single latitude profile (or
+latitude-pressure slice), so that obtaining e.g. their monthly timeseries
+in many runs requires looping over thousands of slices in Python.  Those
+here instead take DataArrays with any number of additional dimensions
+(time, runs, etc.) and locate the zero crossings and peaks along latitude
+for all of them at once, via array operations.  Samples in which no such
+crossing or peak exists, including those that are entirely missing, yield
+NaN rather than raising an exception.
+
+Likewise, the precipitation centroid is computed for all samples by a
+single matrix product, with weights that are computed once per latitude
+grid.
+"""
+import threading
+
+import numpy as np
+import xarray as xr
+
+from .. import LAT_STR, LON_STR, PLEVEL_STR
+
+
+def _to_last(arr, dims):
+    """The values of the array with the given dims last, and the others."""
+    other = [dim for dim in arr.dims if dim not in dims]
+    values = np.asarray(arr.transpose(*(other + list(dims))).values,
+                        dtype=float)
+    return values, other
+
+
+def _like(values, arr, dims, name=None):
+    """DataArray of the values, on the given dims and coords of the array."""
+    coords = dict((key, coord) for key, coord in arr.coords.items()
+                  if set(coord.dims) <= set(dims))
+    return xr.DataArray(values, dims=dims, coords=coords,
+                        name=name or arr.name)
+
+
+def _take(values, ind):
+    """Values at the given indices along the last axis, NaN where invalid."""
+    valid = ind >= 0
+    out = np.take_along_axis(values, np.where(valid, ind, 0)[..., np.newaxis],
+                             axis=-1)[..., 0]
+    return np.where(valid, out, np.nan)
+
+
+def _sign_changes(values):
+    """Whether the sign changes between each point and the next.
+
+    Follows `np.diff(np.sign(values))`, except that missing values never
+    count as crossings.
+    """
+    sign = np.sign(values)
+    return (sign[..., 1:] != sign[..., :-1]) & ~np.isnan(sign[..., 1:] +
+                                                         sign[..., :-1])
+
+
+def _interp_crossing(values, lat, ind):
+    """Latitude of the linearly interpolated zero crossing after each index.
+
+    As in `zonal_mean_circ.thermal_equator`.
+    """
+    valid = ind >= 0
+    ind = np.where(valid, ind, 0)
+    lat_0, lat_1 = lat[ind], lat[ind + 1]
+    val_0, val_1 = _take(values, ind), _take(values, ind + 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = lat_1 - (lat_1 - lat_0) / (val_1 - val_0)*val_1
+    return np.where(valid, out, np.nan)
+
+
+def _central_crossings(values, offsets=(0,)):
+    """Indices of the crossing nearest the central index and its neighbors.
+
+    The crossing nearest the middle of the last axis is found as in
+    `zonal_mean_circ.thermal_equator`; each offset selects the crossing that
+    many crossings to its north (positive) or south (negative).
+    """
+    crossings = _sign_changes(values)
+    n_lat = values.shape[-1]
+    dist = np.where(crossings, np.abs(np.arange(n_lat - 1) - n_lat/2.),
+                    np.inf)
+    center = np.argmin(dist, axis=-1)[..., np.newaxis]
+    # Number of each crossing, counting from the south.
+    rank = np.where(crossings, np.cumsum(crossings, axis=-1), -1)
+    center_rank = np.take_along_axis(rank, center, axis=-1)
+    indices = []
+    for offset in offsets:
+        hit = rank == np.where(center_rank > 0, center_rank + offset, 0)
+        indices.append(np.where(hit.any(axis=-1), hit.argmax(axis=-1), -1))
+    return indices
+
+
+def zero_crossing_lat(arr, offset=0):
+    """Latitude at which the field crosses zero nearest the equator.
+
+    Linearly interpolated between grid latitudes.  If `offset` is nonzero,
+    the crossing that many crossings to the north (if positive) or south (if
+    negative) of that one is returned instead.
+    """
+    values, other = _to_last(arr, [LAT_STR])
+    lat = np.asarray(arr[LAT_STR].values, dtype=float)
+    ind, = _central_crossings(values, offsets=(offset,))
+    return _like(_interp_crossing(values, lat, ind), arr, other)
+
+
+def thermal_equator_lat(flux):
+    """Location of the zero crossing of the energy flux nearest the equator.
+
+    Vectorized version of `zonal_mean_circ.thermal_equator`.
+    """
+    return zero_crossing_lat(flux).rename('thermal_equator')
+
+
+def hadley_edges(strmfunc, level=500.):
+    """Hadley cells' extent from the streamfunction's zero crossings.
+
+    The center is the zero crossing at the given pressure level nearest the
+    equator, and the southern and northern edges are the crossings on either
+    side of it.  Vectorized version of `zonal_mean_circ.had_bounds500`.
+    Returns a DataArray with a 'bound' dimension, whose values are 'south',
+    'center', and 'north'.
+    """
+    if PLEVEL_STR in strmfunc.dims:
+        strmfunc = strmfunc.sel(**{PLEVEL_STR: level})
+    values, other = _to_last(strmfunc, [LAT_STR])
+    lat = np.asarray(strmfunc[LAT_STR].values, dtype=float)
+    bounds = [_interp_crossing(values, lat, ind)
+              for ind in _central_crossings(values, offsets=(-1, 0, 1))]
+    out = _like(np.stack(bounds, axis=-1), strmfunc, other + ['bound'],
+                name='hadley_edges')
+    return out.assign_coords(bound=['south', 'center', 'north'])
+
+
+def hadley_extent(strmfunc, frac=0.1, lev_dim=PLEVEL_STR):
+    """Hadley cells' poleward extent and center location.
+
+    The edges are where the streamfunction at the level of each cell's
+    maximum magnitude falls to the given fraction of that maximum, and the
+    center is where it changes sign between the two cells, at the level
+    halfway between those of the two maxima.  Vectorized version of
+    `zonal_mean_circ.had_bounds`, returning a DataArray with a 'bound'
+    dimension as in `hadley_edges`.
+    """
+    values, other = _to_last(strmfunc, [lev_dim, LAT_STR])
+    lat = np.asarray(strmfunc[LAT_STR].values, dtype=float)
+    n_lev, n_lat = values.shape[-2:]
+    flat = values.reshape(values.shape[:-2] + (-1,))
+    valid = ~np.isnan(flat).all(axis=-1)
+    # The positive cell's maximum, then the negative cell's minimum north of
+    # it.
+    ind_max = np.nanargmax(np.where(valid[..., np.newaxis], flat, 0.),
+                           axis=-1)
+    z_max, y_max = np.divmod(ind_max, n_lat)
+    south_of_max = (np.arange(n_lat) < y_max[..., np.newaxis])
+    flat_north = np.where(np.tile(south_of_max, n_lev), np.inf, flat)
+    flat_north = np.where(np.isnan(flat_north), np.inf, flat_north)
+    ind_min = np.argmin(flat_north, axis=-1)
+    z_min, y_min = np.divmod(ind_min, n_lat)
+    val_max, val_min = _take(flat, ind_max), _take(flat, ind_min)
+
+    def level(z):
+        return np.take_along_axis(values, z[..., np.newaxis, np.newaxis],
+                                  axis=-2)[..., 0, :]
+
+    lat_ind = np.arange(n_lat - 1)
+    # Last crossing of the threshold south of the maximum.
+    cross_max = (_sign_changes(level(z_max) - frac*val_max[..., np.newaxis]) &
+                 (lat_ind < y_max[..., np.newaxis]))
+    south = np.where(cross_max.any(axis=-1),
+                     n_lat - 2 - cross_max[..., ::-1].argmax(axis=-1), -1)
+    # First crossing of the threshold at or north of the minimum.
+    cross_min = (_sign_changes(level(z_min) - frac*val_min[..., np.newaxis]) &
+                 (lat_ind >= y_min[..., np.newaxis]))
+    north = np.where(cross_min.any(axis=-1), cross_min.argmax(axis=-1), -1)
+    # First sign change between the two cells, at the intermediate level.
+    cross_mid = (_sign_changes(level((z_min + z_max) // 2)) &
+                 (lat_ind >= y_max[..., np.newaxis]) &
+                 (lat_ind < y_min[..., np.newaxis] - 1))
+    center = np.where(cross_mid.any(axis=-1), cross_mid.argmax(axis=-1), -1)
+
+    bounds = [np.where(valid & (ind >= 0), lat[np.maximum(ind, 0)], np.nan)
+              for ind in (south, center, north)]
+    out = _like(np.stack(bounds, axis=-1), strmfunc, other + ['bound'],
+                name='hadley_extent')
+    return out.assign_coords(bound=['south', 'center', 'north'])
+
+
+def itcz_lat(precip):
+    """Latitude of the precipitation maximum, interpolated between points.
+
+    The latitude at which the meridional derivative of precipitation,
+    estimated at the grid maximum and its two neighbors, crosses zero.
+    Vectorized version of `zonal_mean_circ.itcz_pos`.  NaN where the maximum
+    is at the edge of the domain.
+    """
+    values, other = _to_last(precip, [LAT_STR])
+    phi_all = np.deg2rad(np.asarray(precip[LAT_STR].values, dtype=float))
+    n_lat = values.shape[-1]
+    valid = ~np.isnan(values).all(axis=-1)
+    ind_max = np.nanargmax(np.where(valid[..., np.newaxis], values, 0.),
+                           axis=-1)
+    valid &= (ind_max > 0) & (ind_max < n_lat - 1)
+    ind_max = np.clip(ind_max, 1, n_lat - 2)
+    # Precip and latitude at the maximum and its two neighbors.
+    prec = [_take(values, ind_max + i) for i in (-1, 0, 1)]
+    phi = [phi_all[ind_max + i] for i in (-1, 0, 1)]
+    # Derivatives at each of the three points, as in `np.gradient`.
+    d_prec = [prec[1] - prec[0], 0.5*(prec[2] - prec[0]), prec[2] - prec[1]]
+    d_phi = [phi[1] - phi[0], 0.5*(phi[2] - phi[0]), phi[2] - phi[1]]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dp_dphi = [dp / dphi for dp, dphi in zip(d_prec, d_phi)]
+        # Interpolate on whichever side of the maximum the derivative
+        # changes sign.
+        south = np.sign(d_prec[0]) != np.sign(d_prec[1])
+        north = np.sign(d_prec[1]) != np.sign(d_prec[2])
+        interp = [phi[i] - (dp_dphi[i]*(phi[i+1] - phi[i]) /
+                            (dp_dphi[i+1] - dp_dphi[i])) for i in (0, 1)]
+    out = np.where(south, interp[0], np.where(north, interp[1], np.nan))
+    out = np.where(valid, np.rad2deg(out), np.nan)
+    return _like(out, precip, other, name='itcz_lat')
+
+
+_CENTROID_WEIGHTS = {}
+_CENTROID_WEIGHTS_LOCK = threading.Lock()
+
+
+def centroid_weights(lat, lat_max=20., dlat=0.1):
+    """Weights yielding the area-weighted cumulative integral of a profile.
+
+    Returns the latitudes spaced `dlat` apart from `-lat_max` to `lat_max`,
+    the indices of the given latitudes within `lat_max` of the equator, and
+    the weights.  The product of a profile at those indices with the weights
+    is, at each of the returned latitudes, the trapezoidal integral from
+    `-lat_max` of the profile linearly interpolated (as by `np.interp`) times
+    the cosine of latitude.  Computed once per latitude grid and then reused.
+    """
+    lat = np.asarray(lat, dtype=float)
+    key = (lat.tobytes(), float(lat_max), float(dlat))
+    with _CENTROID_WEIGHTS_LOCK:
+        try:
+            return _CENTROID_WEIGHTS[key]
+        except KeyError:
+            pass
+    lat_interp = np.arange(-lat_max, lat_max + 0.01*dlat, dlat)
+    trop = np.flatnonzero(np.abs(lat) < lat_max)
+    trop = trop[np.argsort(lat[trop])]
+    # The interpolation weights are the interpolants of the unit vectors.
+    weights = np.array([np.interp(lat_interp, lat[trop], unit)
+                        for unit in np.eye(trop.size)])
+    weights *= np.abs(np.cos(np.deg2rad(lat_interp)))
+    # Cumulative trapezoidal integration is linear too, so it can be applied
+    # to the weights rather than to every profile.
+    weights = np.deg2rad(dlat)*(np.cumsum(weights, axis=-1) - 0.5*weights -
+                                0.5*weights[:, :1])
+    result = (lat_interp, trop, weights)
+    with _CENTROID_WEIGHTS_LOCK:
+        return _CENTROID_WEIGHTS.setdefault(key, result)
+
+
+def precip_centroid_lat(precip, lat_max=20., dlat=0.1, exact=False):
+    """ITCZ location as the centroid of the area-weighted zonal-mean P.
+
+    The latitude, within `lat_max` of the equator, north and south of which
+    the area-integrated precipitation is equal.  By default this is the
+    closest of the latitudes `dlat` apart on which precipitation is
+    interpolated, as in `zonal_mean_circ.prec_centroid`; if `exact` is True,
+    it is linearly interpolated between them.
+    """
+    if LON_STR in precip.dims:
+        precip = precip.mean(LON_STR)
+    values, other = _to_last(precip, [LAT_STR])
+    lat_interp, trop, weights = centroid_weights(precip[LAT_STR].values,
+                                                 lat_max=lat_max, dlat=dlat)
+    # All samples' cumulative integrals in one matrix product.
+    prec_int = values[..., trop].dot(weights)
+    half = 0.5*prec_int[..., -1:]
+    valid = ~np.isnan(half[..., 0])
+    prec_int = np.where(valid[..., np.newaxis], prec_int, 0.)
+    half = np.where(valid[..., np.newaxis], half, 0.)
+    if exact:
+        ind = np.clip(np.argmax(prec_int >= half, axis=-1), 1,
+                      lat_interp.size - 1)
+        int_0 = _take(prec_int, ind - 1)
+        int_1 = _take(prec_int, ind)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frac = np.clip((half[..., 0] - int_0) / (int_1 - int_0), 0., 1.)
+        out = lat_interp[ind - 1] + dlat*np.where(np.isfinite(frac), frac, 0.)
+    else:
+        out = lat_interp[np.argmin(np.abs(prec_int - half), axis=-1)]
+    return _like(np.where(valid, out, np.nan), precip, other,
+                 name='precip_centroid')
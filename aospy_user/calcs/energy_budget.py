@@ -1,23 +1,25 @@
 """Energy budget-related fields"""
 from aospy.constants import grav
-from aospy.utils.vertcoord import (d_deta_from_pfull, d_deta_from_phalf,
-                                   to_pfull_from_phalf, int_dp_g,
+from aospy.utils.vertcoord import (d_deta_from_pfull, int_dp_g,
                                    vert_coord_name, integrate)
 from aospy.utils.times import monthly_mean_ts, monthly_mean_at_each_ind
 from indiff.advec import EtaUpwind, SphereEtaUpwind
 from .. import PFULL_STR
-from .numerics import d_dp_from_eta, d_dp_from_p
+from .numerics import SpectralBatch, d_dp_from_eta, d_dp_from_p
 from .tendencies import (time_tendency_first_to_last,
                          time_tendency_each_timestep)
 from .advection import (horiz_advec, horiz_advec_upwind,
                         zonal_advec_upwind, merid_advec_upwind,
                         horiz_advec_const_p_from_eta, horiz_advec_spharm,
                         horiz_advec_from_eta_spharm)
-from .mass import (column_flux_divg, budget_residual, uv_mass_adjusted,
-                   uv_dry_mass_adjusted, uv_column_budget_adjustment,
-                   horiz_divg_spharm, mass_column_divg_adj,
+from .mass import (column_budget_terms, column_flux_divg, budget_residual,
+                   uv_mass_adjusted, uv_dry_mass_adjusted,
+                   uv_column_budget_adjustment, mass_column_divg_adj,
                    horiz_divg_from_eta)
+from .chunking import by_year_chunks
+from .memo import memoize
 from .transport import omega_from_divg_eta
+from .vertcoord import hybrid_coord
 from .thermo import energy
 from .toa_sfc_fluxes import column_energy
 
@@ -49,6 +51,7 @@ def energy_column_budget_lhs(temp, z, q, q_ice, u, v, ps, dp, radius):
     return budget_residual(tendency, transport)
 
 
+@by_year_chunks
 def energy_column_budget_residual(temp, z, q, q_ice, u, v, swdn_toa, swup_toa,
                                   olr, swup_sfc, swdn_sfc, lwup_sfc, lwdn_sfc,
                                   shflx, evap, dp, radius):
@@ -60,6 +63,22 @@ def energy_column_budget_residual(temp, z, q, q_ice, u, v, swdn_toa, swup_toa,
     return tendency + transport - source
 
 
+def energy_budget_terms(temp, z, q, q_ice, u, v, swdn_toa, swup_toa, olr,
+                        swup_sfc, swdn_sfc, lwup_sfc, lwdn_sfc, shflx, evap,
+                        dp, radius, omega=None, p=None, freq=None):
+    """All terms of the column energy budget, as a Dataset.
+
+    See `mass.column_budget_terms`.
+    """
+    source = energy_column_source(swdn_toa, swup_toa, olr, swup_sfc, swdn_sfc,
+                                  lwup_sfc, lwdn_sfc, shflx, evap)
+    return column_budget_terms(energy(temp, z, q, q_ice, u, v), u, v, dp,
+                               radius, source=source, omega=omega, p=p,
+                               freq=freq)
+
+
+@memoize
+@by_year_chunks
 def uv_energy_adjustment(temp, z, q, q_ice, u, v, swdn_toa, swup_toa, olr,
                          swup_sfc, swdn_sfc, lwup_sfc, lwdn_sfc, shflx, evap,
                          dp, radius):
@@ -160,6 +179,8 @@ def v_mass_energy_adjustment(temp, z, q, q_ice, u, v, swdn_toa, swup_toa, olr,
     return v_adj
 
 
+@memoize
+@by_year_chunks
 def uv_mass_energy_adjusted(temp, z, q, q_ice, u, v, swdn_toa, swup_toa, olr,
                             swup_sfc, swdn_sfc, lwup_sfc, lwdn_sfc, shflx,
                             evap, precip, ps, dp, radius):
@@ -199,11 +220,9 @@ def energy_column_divg_adj(temp, z, q, q_ice, u, v, swdn_toa, swup_toa, olr,
                            swup_sfc, swdn_sfc, lwup_sfc, lwdn_sfc, shflx, evap,
                            precip, ps, dp, radius):
     """Column energy divergence with mass and energy adjustments."""
-    u_mass_adj, v_mass_adj = uv_mass_adjusted(ps, u, v, evap, precip, radius,
-                                              dp)
-    u_en_adj, v_en_adj = uv_energy_adjusted(
-        temp, z, q, q_ice, u_mass_adj, v_mass_adj, swdn_toa, swup_toa, olr,
-        swup_sfc, swdn_sfc, lwup_sfc, lwdn_sfc, shflx, evap, dp, radius
+    u_en_adj, v_en_adj = uv_mass_energy_adjusted(
+        temp, z, q, q_ice, u, v, swdn_toa, swup_toa, olr, swup_sfc, swdn_sfc,
+        lwup_sfc, lwdn_sfc, shflx, evap, precip, ps, dp, radius
     )
     return energy_column_divg(temp, z, q, q_ice, u_en_adj,
                               v_en_adj, dp, radius)
@@ -214,11 +233,9 @@ def energy_column_divg_adj_time_mean(temp, z, q, q_ice, u, v, swdn_toa,
                                      lwup_sfc, lwdn_sfc, shflx, evap, precip,
                                      ps, dp, radius):
     """Column energy divergence with energy adjustments by time mean flow."""
-    u_mass_adj, v_mass_adj = uv_mass_adjusted(ps, u, v, evap, precip, radius,
-                                              dp)
-    u_en_adj, v_en_adj = uv_energy_adjusted(
-        temp, z, q, q_ice, u_mass_adj, v_mass_adj, swdn_toa, swup_toa, olr,
-        swup_sfc, swdn_sfc, lwup_sfc, lwdn_sfc, shflx, evap, dp, radius
+    u_en_adj, v_en_adj = uv_mass_energy_adjusted(
+        temp, z, q, q_ice, u, v, swdn_toa, swup_toa, olr, swup_sfc, swdn_sfc,
+        lwup_sfc, lwdn_sfc, shflx, evap, precip, ps, dp, radius
     )
     monthly_terms = [monthly_mean_ts(d) for d in (temp, z, q, q_ice, u_en_adj,
                                                   v_en_adj, dp, radius)]
@@ -265,6 +282,7 @@ def energy_column_divg_energy_adj(temp, z, q, q_ice, u, v, swdn_toa,
     return energy_column_divg(temp, z, q, q_ice, u_adj, v_adj, dp, radius)
 
 
+@by_year_chunks
 def energy_column_budget_adj_residual(temp, z, q, q_ice, u, v, swdn_toa,
                                       swup_toa, olr, swup_sfc, swdn_sfc,
                                       lwup_sfc, lwdn_sfc, shflx, evap, precip,
@@ -298,6 +316,7 @@ def energy_column_budget_dry_mass_adj_residual(temp, z, q, q_ice, u, v,
     return tendency + transport - source
 
 
+@by_year_chunks
 def energy_column_budget_mass_adj_residual(temp, z, q, q_ice, u, v, swdn_toa,
                                            swup_toa, olr, swup_sfc, swdn_sfc,
                                            lwup_sfc, lwdn_sfc, shflx, evap,
@@ -313,6 +332,7 @@ def energy_column_budget_mass_adj_residual(temp, z, q, q_ice, u, v, swdn_toa,
     return tendency + transport - source
 
 
+@by_year_chunks
 def energy_column_budget_energy_adj_residual(temp, z, q, q_ice, u, v, swdn_toa,
                                              swup_toa, olr, swup_sfc, swdn_sfc,
                                              lwup_sfc, lwdn_sfc, shflx, evap,
@@ -551,14 +571,13 @@ def horiz_divg_energy_adj_eta(temp, z, q, q_ice, u, v, swdn_toa, swup_toa, olr,
         temp, z, q, q_ice, u, v, swdn_toa, swup_toa, olr, swup_sfc, swdn_sfc,
         lwup_sfc, lwdn_sfc, shflx, evap, precip, ps, dp, radius
     )
-    divg_eta = horiz_divg_spharm(u_adj, v_adj, radius)
+    batch = SpectralBatch([ps], [(u_adj, v_adj)], radius=radius)
+    divg_eta = batch.divergence()
+    dps_dx, dps_dy = batch.gradient()
     du_deta, dv_deta = d_deta_from_pfull(u_adj), d_deta_from_pfull(v_adj)
-    pfull_coord = u[PFULL_STR]
-    bk_at_pfull = to_pfull_from_phalf(bk, pfull_coord)
-    da_deta = d_deta_from_phalf(pk, pfull_coord)
-    db_deta = d_deta_from_phalf(bk, pfull_coord)
-    return (divg_eta - (bk_at_pfull / (da_deta + db_deta*ps)) *
-            horiz_advec_spharm(ps, du_deta, dv_deta, radius))
+    coord = hybrid_coord(bk, pk, u[PFULL_STR])
+    return (divg_eta - coord.const_p_correction(ps) *
+            (du_deta*dps_dx + dv_deta*dps_dy))
 
 
 def energy_horiz_divg_eta(temp, z, q, q_ice, u, v, swdn_toa, swup_toa, olr,
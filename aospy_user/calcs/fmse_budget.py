@@ -3,6 +3,7 @@ from aospy.utils.vertcoord import int_dp_g
 from indiff.advec import SphereEtaUpwind
 from indiff.deriv import SphereEtaCenDeriv
 
+from .mass import column_budget_terms
 from .transport import field_total_advec
 from .toa_sfc_fluxes import column_energy
 from .thermo import fmse
@@ -41,6 +42,20 @@ def fmse_budget_advec_residual(temp, hght, sphum, ice_wat, ucomp, vcomp, omega,
     return f_net - trans_vert_int
 
 
+def fmse_budget_terms(temp, hght, sphum, ice_wat, ucomp, vcomp, dp, radius,
+                      swdn_toa, swup_toa, olr, swup_sfc, swdn_sfc, lwup_sfc,
+                      lwdn_sfc, shflx, evap, omega=None, p=None, freq=None):
+    """All terms of the column frozen MSE budget, as a Dataset.
+
+    See `mass.column_budget_terms`.
+    """
+    f_net = column_energy(swdn_toa, swup_toa, olr, swup_sfc, swdn_sfc,
+                          lwup_sfc, lwdn_sfc, shflx, evap)
+    return column_budget_terms(fmse(temp, hght, sphum, ice_wat), ucomp,
+                               vcomp, dp, radius, source=f_net, omega=omega,
+                               p=p, freq=freq)
+
+
 def omega_change_from_fmse_budget(temp_cont, z_cont, q_cont, q_ice_cont,
                                   u_cont, v_cont, ps_cont, temp_pert, z_pert,
                                   q_pert, q_ice_pert, u_pert, v_pert, ps_pert,
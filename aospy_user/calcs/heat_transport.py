@@ -0,0 +1,117 @@
+"""Northward energy transport implied by column energy sources.
+
+The transport across each latitude is the area integral, from the south
+pole to that latitude, of the column's energy source minus its global
+mean.  `implied_transport` computes it with xarray reductions over latitude
+and longitude, so that it applies to all times, runs, etc. of the source
+at once, and the grid cells' surface areas are computed once per grid and
+then reused.
+"""
+import threading
+
+from aospy.constants import r_e
+import numpy as np
+import xarray as xr
+
+from .. import LAT_STR, LON_STR
+from .memo import fingerprint
+
+
+def _cell_edges(centers, lower, upper):
+    centers = np.asarray(centers, dtype=float)
+    return np.concatenate(([lower], 0.5*(centers[1:] + centers[:-1]),
+                           [upper]))
+
+
+_SFC_AREAS = {}
+_SFC_AREAS_LOCK = threading.Lock()
+
+
+def grid_sfc_area(lat, lon, radius=None):
+    """Surface area of the cells of a regular latitude-longitude grid.
+
+    The cells' edges are halfway between their centers, and at the poles.
+    Computed once per grid and radius and then reused.
+
+    Parameters
+    ----------
+    lat, lon : xarray.DataArray
+        Latitudes and longitudes of the cells' centers, in degrees
+    radius : float, optional
+        Radius of the sphere.  Defaults to that of the Earth.
+    """
+    if radius is None:
+        radius = r_e.value
+    key = (fingerprint(lat), fingerprint(lon), float(radius))
+    with _SFC_AREAS_LOCK:
+        try:
+            return _SFC_AREAS[key]
+        except KeyError:
+            pass
+    if lat.values[0] < lat.values[-1]:
+        lat_edges = _cell_edges(lat, -90., 90.)
+    else:
+        lat_edges = _cell_edges(lat, 90., -90.)
+    lon_vals = np.asarray(lon, dtype=float)
+    dlon_end = (lon_vals[-1] - lon_vals[0]) / (2.*(lon_vals.size - 1))
+    lon_edges = _cell_edges(lon_vals, lon_vals[0] - dlon_end,
+                            lon_vals[-1] + dlon_end)
+    dsin_lat = np.abs(np.diff(np.sin(np.deg2rad(lat_edges))))
+    dlon = np.abs(np.diff(np.deg2rad(lon_edges)))
+    sfc_area = xr.DataArray(radius**2 * np.outer(dsin_lat, dlon),
+                            dims=[LAT_STR, LON_STR],
+                            coords={LAT_STR: lat, LON_STR: lon},
+                            name='sfc_area')
+    with _SFC_AREAS_LOCK:
+        return _SFC_AREAS.setdefault(key, sfc_area)
+
+
+def clear_sfc_areas():
+    """Empty the cache of grid cell surface areas."""
+    with _SFC_AREAS_LOCK:
+        _SFC_AREAS.clear()
+
+
+def implied_transport(source, sfc_area=None, latent_source=None):
+    """Northward energy transport, in W, implied by a column energy source.
+
+    Evaluated at the northern edge of each latitude band.  Missing values
+    are excluded from the global mean and the zonal integrals.
+
+    Parameters
+    ----------
+    source : xarray.DataArray
+        Energy source of the column, in W/m^2, on a latitude-longitude grid
+        and with any other dimensions
+    sfc_area : xarray.DataArray, optional
+        Surface area of the grid cells.  By default, that in the coordinates
+        of `source`, if any, or else computed via `grid_sfc_area`.
+    latent_source : xarray.DataArray, optional
+        Latent energy part of the source, e.g. L_v*(E - P).  If given, the
+        result has a 'component' dimension, whose values are 'total',
+        'latent', and 'dry_static', the last being the remainder.
+    """
+    if sfc_area is None:
+        if 'sfc_area' in source.coords:
+            sfc_area = source.coords['sfc_area']
+        else:
+            sfc_area = grid_sfc_area(source[LAT_STR], source[LON_STR])
+    if latent_source is not None:
+        # The transport is linear in the source, so the parts are computed
+        # together in the same pass.
+        source = xr.concat([source, latent_source, source - latent_source],
+                           dim='component')
+        source.coords['component'] = ['total', 'latent', 'dry_static']
+    source = source.drop_vars('sfc_area', errors='ignore')
+    sfc_area = sfc_area.drop_vars(
+        [name for name in sfc_area.coords if name not in sfc_area.dims]
+    )
+    weighted = source*sfc_area
+    global_mean = (weighted.sum([LAT_STR, LON_STR]) /
+                   sfc_area.where(source.notnull()).sum([LAT_STR, LON_STR]))
+    zonal_integral = (weighted - global_mean*sfc_area).sum(LON_STR)
+    del weighted
+    # Integrate from the south pole northward.
+    zonal_integral = zonal_integral.sortby(LAT_STR)
+    transport = zonal_integral.cumsum(LAT_STR)
+    return transport.reindex({LAT_STR: source[LAT_STR]}).rename('transport')
@@ -1,20 +1,23 @@
 """Mass budget-related quantities."""
-try:
-    from animal_spharm import SpharmInterface
-except ImportError:
-    pass
+from collections import OrderedDict
+
 from aospy.constants import grav
-from aospy.utils.vertcoord import (d_deta_from_pfull, d_deta_from_phalf,
-                                   to_pfull_from_phalf, dp_from_ps, int_dp_g,
+from aospy.utils.vertcoord import (d_deta_from_pfull, dp_from_ps, int_dp_g,
                                    integrate)
 import numpy as np
+import xarray as xr
 
-from .. import PFULL_STR, PHALF_STR, PLEVEL_STR, TIME_STR
+from .. import LAT_STR, LON_STR, PFULL_STR, PHALF_STR, PLEVEL_STR
 from .numerics import (d_dx_from_latlon, d_dy_from_lat, d_dp_from_p,
-                       d_dx_at_const_p_from_eta, d_dy_at_const_p_from_eta)
-from .advection import horiz_advec, horiz_advec_spharm
-from .tendencies import (time_tendency_first_to_last,
+                       d_dx_at_const_p_from_eta, d_dy_at_const_p_from_eta,
+                       spharm_plan, SpectralBatch)
+from .advection import horiz_advec, horiz_advec_spharm, vert_advec
+from .chunking import by_year_chunks
+from .memo import memoize
+from .tendencies import (period_mean, period_stats,
+                         time_tendency_first_to_last,
                          time_tendency_each_timestep)
+from .vertcoord import hybrid_coord
 
 
 def horiz_divg(u, v, radius):
@@ -25,10 +28,7 @@ def horiz_divg(u, v, radius):
 
 
 def horiz_divg_spharm(u, v, radius):
-    sph_int = SpharmInterface(u, v, rsphere=radius, make_vectorwind=True)
-    del u, v
-    divg = sph_int.vectorwind.divergence()
-    return sph_int.to_xarray(divg)
+    return SpectralBatch(winds=[(u, v)], radius=radius).divergence()
 
 
 def horiz_divg_from_eta(u, v, ps, radius, bk, pk):
@@ -48,7 +48,7 @@ def divg_3d(u, v, omega, radius, p):
 
 def dp(ps, bk, pk, arr):
     """Pressure thickness of hybrid coordinate levels from surface pressure."""
-    return dp_from_ps(bk, pk, ps, arr[PFULL_STR])
+    return hybrid_coord(bk, pk, arr[PFULL_STR]).dp(ps)
 
 
 def mass_column(ps):
@@ -93,10 +93,9 @@ def budget_residual(tendency, transport, source=None, freq='1M'):
     tendencies are computed at monthly intervals while the transport is much
     higher frequencies (e.g. 3- or 6-hourly).
     """
-    resid = (tendency +
-             transport.resample(freq, TIME_STR, how='mean').dropna(TIME_STR))
+    resid = tendency + period_mean(transport, freq)
     if source is not None:
-        resid -= source.resample(freq, TIME_STR, how='mean').dropna(TIME_STR)
+        resid -= period_mean(source, freq)
     return resid
 
 
@@ -125,6 +124,7 @@ def mass_column_budget_with_adj_lhs(ps, u, v, q, radius, dp, freq='1M'):
     return budget_residual(tendency, transport, freq=freq)
 
 
+@by_year_chunks
 def mass_column_budget_residual(ps, u, v, evap, precip, radius, dp, freq='1M'):
     """Residual in the mass budget.
 
@@ -149,8 +149,10 @@ def uv_column_budget_adjustment(u, v, residual, col_integral, radius):
     else:
         raise AttributeError("Couldn't find vertical dimension "
                              "of {}".format(u))
+    from animal_spharm import SpharmInterface
     sph_int = SpharmInterface(u.isel(**{dim: 0}), v.isel(**{dim: 0}),
-                              rsphere=radius, make_spharmt=True, squeeze=True)
+                              rsphere=radius, squeeze=True)
+    sph_int.spharmt = spharm_plan(u[LAT_STR].size, u[LON_STR].size, radius)
     # Assume residual stems entirely from divergent flow.
     resid_spectral = SpharmInterface.prep_for_spharm(residual)
     resid_spectral = sph_int.spharmt.grdtospec(resid_spectral)
@@ -161,6 +163,8 @@ def uv_column_budget_adjustment(u, v, residual, col_integral, radius):
     return u_arr / col_integral, v_arr / col_integral
 
 
+@memoize
+@by_year_chunks
 def uv_mass_adjustment(ps, u, v, evap, precip, radius, dp, freq='1M'):
     """Adjustment to horizontal winds to enforce column mass budget closure."""
     residual = mass_column_budget_residual(ps, u, v, evap, precip, radius, dp,
@@ -207,6 +211,7 @@ def mass_column_divg_adj(ps, u, v, evap, precip, radius, dp, freq='1M'):
     return mass_column_divg_spharm(u_adj, v_adj, radius, dp)
 
 
+@by_year_chunks
 def mass_column_budget_adj_residual(ps, u, v, evap, precip, radius, dp,
                                     freq='1M'):
     tendency = time_tendency_each_timestep(ps)
@@ -222,6 +227,73 @@ def column_flux_divg(arr, u, v, radius, dp):
     return horiz_divg_spharm(int_dp_g(arr*u, dp), int_dp_g(arr*v, dp), radius)
 
 
+def column_budget_terms(arr, u, v, dp, radius, source=None, omega=None,
+                        p=None, freq=None):
+    """All terms of the column budget of the given field, computed at once.
+
+    Rather than each term being computed separately, each re-deriving the
+    same fluxes and integrals, this computes every term in a single pass.
+
+    Parameters
+    ----------
+    arr : xarray.DataArray
+        The budgeted field, per unit mass of air
+    u, v : xarray.DataArray
+        Horizontal winds
+    dp : xarray.DataArray
+        Pressure thickness of each level
+    radius : float
+        Planetary radius
+    source : xarray.DataArray, optional
+        Column-integrated source of the field
+    omega, p : xarray.DataArray, optional
+        Vertical velocity and pressure.  If both are given, the horizontal and
+        vertical advection at each level are also computed.
+    freq : str, optional
+        If None (the default), the tendency is computed at each timestep.
+        Otherwise it is computed from the first to the last timestep of each
+        period of this frequency, e.g. '1M', and the other terms, including
+        the advection, are averaged over each period, as in
+        `budget_residual`.
+
+    Returns
+    -------
+    xarray.Dataset
+        The column integral, its tendency, the column flux divergence, the
+        source (if given), and the residual of the budget, i.e. tendency plus
+        flux divergence minus source, and, if `omega` and `p` are given, the
+        horizontal and vertical advection.
+    """
+    column = int_dp_g(arr, dp)
+    transport = horiz_divg_spharm(int_dp_g(arr*u, dp), int_dp_g(arr*v, dp),
+                                  radius)
+    if freq is None:
+        tendency = time_tendency_each_timestep(column)
+    else:
+        stats = period_stats(column, freq)
+        tendency = (stats['last'] - stats['first']) / stats['duration']
+        column, transport = stats['mean'], period_mean(transport, freq)
+        if source is not None:
+            source = period_mean(source, freq)
+    residual = tendency + transport
+    if source is not None:
+        residual = residual - source
+    terms = OrderedDict([('column', column), ('tendency', tendency),
+                         ('column_divg', transport)])
+    if source is not None:
+        terms['source'] = source
+    terms['residual'] = residual
+    if omega is not None and p is not None:
+        advec = OrderedDict([('horiz_advec', horiz_advec(arr, u, v, radius)),
+                             ('vert_advec', vert_advec(arr, omega, p))])
+        for name, term in advec.items():
+            # Keep all terms on the same time axis.
+            if freq is not None:
+                term = period_mean(term, freq)
+            terms[name] = term
+    return xr.Dataset(terms)
+
+
 def column_flux_divg_adj(arr, ps, u, v, evap, precip, radius, dp, freq='1M'):
     """Column flux divergence, with the field defined per unit mass of air."""
     u_adj, v_adj = uv_mass_adjusted(ps, u, v, evap, precip, radius, dp,
@@ -243,14 +315,13 @@ def horiz_divg_mass_adj_spharm(u, v, evap, precip, ps, radius, dp):
 def horiz_divg_mass_adj_from_eta(u, v, evap, precip, ps, radius, dp, bk, pk):
     """Mass-balance adjusted horizontal divergence from model coordinates."""
     u_adj, v_adj = uv_mass_adjusted(ps, u, v, evap, precip, radius, dp)
-    divg_eta = horiz_divg_spharm(u_adj, v_adj, radius)
+    batch = SpectralBatch([ps], [(u_adj, v_adj)], radius=radius)
+    divg_eta = batch.divergence()
+    dps_dx, dps_dy = batch.gradient()
     du_deta, dv_deta = d_deta_from_pfull(u_adj), d_deta_from_pfull(v_adj)
-    pfull_coord = u[PFULL_STR]
-    bk_at_pfull = to_pfull_from_phalf(bk, pfull_coord)
-    da_deta = d_deta_from_phalf(pk, pfull_coord)
-    db_deta = d_deta_from_phalf(bk, pfull_coord)
-    return (divg_eta - (bk_at_pfull / (da_deta + db_deta*ps)) *
-            horiz_advec_spharm(ps, du_deta, dv_deta, radius))
+    coord = hybrid_coord(bk, pk, u[PFULL_STR])
+    return (divg_eta - coord.const_p_correction(ps) *
+            (du_deta*dps_dx + dv_deta*dps_dy))
 
 
 def horiz_advec_mass_adj(arr, u, v, evap, precip, ps, radius, dp):
@@ -314,6 +385,7 @@ def dry_mass_column_budget_residual(ps, u, v, q, radius, dp, freq='1M'):
     return budget_residual(tendency, transport, freq=freq)
 
 
+@memoize
 def uv_dry_mass_adjustment(ps, u, v, q, radius, dp, freq='1M'):
     """Adjustment to horiz. winds to enforce column dry mass budget closure."""
     residual = dry_mass_column_budget_residual(ps, u, v, q, radius,
@@ -0,0 +1,225 @@
+"""Memoization of expensive intermediate quantities shared among calcs.
+
+Many of the functions in this package recompute the same costly
+intermediates, e.g. the column mass- and energy-balance wind adjustments,
+which each require solving a spherical harmonic problem.  When computing the
+zonal and meridional components of the same quantity as separate Vars, or
+different terms of the same budget, these intermediates are identical.  The
+cache in this module lets them be computed once and then reused.
+
+Entries are keyed by the decorated function and a fingerprint of every
+argument.  For DataArrays the fingerprint comprises the name, dims, shape,
+dtype, coordinate values (and therefore the date range), and a digest of the
+data itself, so that the same field loaded from the same run over the same
+dates maps to the same key even if it was loaded separately by different
+Calcs.  For dask-backed data, the name of the dask array, which dask derives
+deterministically from its source files and the operations applied to them,
+stands in for the digest, so that the data isn't read.  Computing a digest
+of in-memory data costs a pass over it, so only functions that are
+expensive relative to that should be memoized.  The cache is bounded in
+memory, evicting least-recently-used entries.
+
+Cached arrays are stored read-only, and every result, whether newly
+computed or retrieved from the cache, is a shallow copy of them.  So
+callers may e.g. rename the results freely, whereas modifying their values
+in place raises an error rather than corrupting the cache.
+"""
+from collections import OrderedDict
+import functools
+import hashlib
+import logging
+import threading
+
+import numpy as np
+import xarray as xr
+
+
+# Maximum size of each block of an array read in when computing its digest.
+_DIGEST_BLOCK_BYTES = 64*1024**2
+
+
+def _digest_array(arr):
+    """MD5 digest of the values of a numpy array or DataArray.
+
+    The array is read in blocks along its leading axis, so that lazily
+    loaded (e.g. dask-backed) arrays are never fully in memory at once.
+    """
+    md5 = hashlib.md5()
+    md5.update(str((np.dtype(arr.dtype).str, arr.shape)).encode('utf-8'))
+    if not arr.ndim or not arr.size:
+        blocks = [arr]
+    else:
+        row_bytes = max(arr.nbytes // arr.shape[0], 1)
+        step = max(_DIGEST_BLOCK_BYTES // row_bytes, 1)
+        blocks = (arr[start:start + step]
+                  for start in range(0, arr.shape[0], step))
+    for block in blocks:
+        values = np.ascontiguousarray(getattr(block, 'values', block))
+        if values.dtype.hasobject:
+            md5.update(repr(values.tolist()).encode('utf-8'))
+        else:
+            md5.update(values.view(np.uint8).ravel())
+    return md5.hexdigest()
+
+
+def _digest_variable(var):
+    """Digest of an xarray Variable's data, without reading it if lazy."""
+    if hasattr(var.data, 'dask'):
+        return ('dask', var.data.name)
+    return _digest_array(var)
+
+
+def fingerprint(obj):
+    """Hashable key uniquely identifying the contents of the given object."""
+    if isinstance(obj, xr.DataArray):
+        coords = tuple((name, _digest_variable(obj[name].variable))
+                       for name in sorted(obj.coords))
+        return ('DataArray', obj.name, obj.dims, obj.shape, obj.dtype.str,
+                coords, _digest_variable(obj.variable))
+    if isinstance(obj, xr.Dataset):
+        return ('Dataset',) + tuple((name, fingerprint(obj[name]))
+                                    for name in sorted(obj.variables))
+    if isinstance(obj, np.ndarray):
+        return ('ndarray', _digest_array(obj))
+    if isinstance(obj, (list, tuple)):
+        return (type(obj).__name__,) + tuple(fingerprint(o) for o in obj)
+    if isinstance(obj, dict):
+        return ('dict',) + tuple((k, fingerprint(obj[k]))
+                                 for k in sorted(obj))
+    # Numerical constants, strings, aospy Constants, etc.
+    value = getattr(obj, 'value', obj)
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+def _read_only(obj):
+    """Shallow copy of the object, with its numpy data made read-only."""
+    if isinstance(obj, np.ndarray):
+        view = obj.view()
+        view.flags.writeable = False
+        return view
+    if isinstance(obj, xr.DataArray):
+        out = obj.copy(deep=False)
+        if isinstance(out.variable.data, np.ndarray):
+            out.variable.data = _read_only(out.variable.data)
+        return out
+    if isinstance(obj, xr.Dataset):
+        out = obj.copy(deep=False)
+        for var in out.data_vars.values():
+            if isinstance(var.variable.data, np.ndarray):
+                var.variable.data = _read_only(var.variable.data)
+        return out
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_read_only(o) for o in obj)
+    return obj
+
+
+def _shallow_copy(obj):
+    """Copy of a cached result that shares its (read-only) data."""
+    if isinstance(obj, np.ndarray):
+        return obj.view()
+    if isinstance(obj, (xr.DataArray, xr.Dataset)):
+        return obj.copy(deep=False)
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_shallow_copy(o) for o in obj)
+    return obj
+
+
+def _nbytes(obj):
+    """Approximate memory footprint of a cached result."""
+    if isinstance(obj, (list, tuple)):
+        return sum(_nbytes(o) for o in obj)
+    return getattr(obj, 'nbytes', 0)
+
+
+class IntermediateCache(object):
+    """Memory-bounded LRU cache of intermediate calculation results.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Upper bound on the total size of the cached results.  Once exceeded,
+        least-recently-used entries are evicted.  Results larger than this
+        are never cached.
+    enabled : bool
+        Whether the cache is used at all.  If False, decorated functions are
+        simply called.
+    """
+    def __init__(self, max_bytes=2*1024**3, enabled=True):
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __repr__(self):
+        return ('IntermediateCache({0} entries, {1} bytes, {2} hits, '
+                '{3} misses)'.format(len(self), self.nbytes, self.hits,
+                                     self.misses))
+
+    def get(self, key):
+        """Retrieve the cached value, marking it as most recently used."""
+        with self._lock:
+            value, nbytes = self._entries.pop(key)
+            self._entries[key] = (value, nbytes)
+        return _shallow_copy(value)
+
+    def put(self, key, value):
+        """Store a read-only copy of the value, evicting entries to fit it.
+
+        Returns a shallow copy of the stored value, as `get` would, so that
+        callers see the same read-only result whether it was cached or not.
+        """
+        value = _read_only(value)
+        nbytes = _nbytes(value)
+        if nbytes > self.max_bytes:
+            logging.debug("Result of {0} bytes exceeds cache size; not "
+                          "caching it.".format(nbytes))
+            return _shallow_copy(value)
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            while self._entries and self.nbytes + nbytes > self.max_bytes:
+                _, (_, old_nbytes) = self._entries.popitem(last=False)
+                self.nbytes -= old_nbytes
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+        return _shallow_copy(value)
+
+    def clear(self):
+        """Remove all entries from the cache."""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def memoize(self, func):
+        """Decorator caching the function's results in this cache."""
+        name = '.'.join([func.__module__, func.__name__])
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            key = (name, fingerprint(args), fingerprint(kwargs))
+            with self._lock:
+                if key in self._entries:
+                    self.hits += 1
+                    return self.get(key)
+                self.misses += 1
+            return self.put(key, func(*args, **kwargs))
+        return wrapper
+
+
+intermediate_cache = IntermediateCache()
+memoize = intermediate_cache.memoize
@@ -7,6 +7,7 @@ from .. import LAT_STR, LON_STR, PLEVEL_STR
 from .advection import (horiz_advec, vert_advec, horiz_advec_upwind,
                         zonal_advec_upwind, merid_advec_upwind,
                         total_advec_upwind)
+from .mass import column_budget_terms
 from .transport import (field_horiz_flux_divg, field_vert_flux_divg,
                         field_total_advec, field_horiz_advec_divg_sum,
                         field_times_horiz_divg)
@@ -97,3 +98,17 @@ def mse_budget_advec_residual(temp, hght, sphum, ucomp, vcomp, omega,
     f_net = column_energy(swdn_toa, swup_toa, olr, swup_sfc, swdn_sfc,
                           lwup_sfc, lwdn_sfc, shflx, evap)
     return f_net - trans_vert_int
+
+
+def mse_budget_terms(temp, hght, sphum, ucomp, vcomp, dp, radius, swdn_toa,
+                     swup_toa, olr, swup_sfc, swdn_sfc, lwup_sfc, lwdn_sfc,
+                     shflx, evap, omega=None, p=None, freq=None):
+    """All terms of the column MSE budget, as a Dataset.
+
+    See `mass.column_budget_terms`.
+    """
+    f_net = column_energy(swdn_toa, swup_toa, olr, swup_sfc, swdn_sfc,
+                          lwup_sfc, lwdn_sfc, shflx, evap)
+    return column_budget_terms(mse(temp, hght, sphum), ucomp, vcomp, dp,
+                               radius, source=f_net, omega=omega, p=p,
+                               freq=freq)
@@ -1,13 +1,19 @@
 """Finite differencing and other numerical methods."""
-from animal_spharm import SpharmInterface
-from aospy.utils.vertcoord import (d_deta_from_pfull, d_deta_from_phalf,
-                                   pfull_from_ps, to_pfull_from_phalf,
-                                   to_radians, to_pascal)
+import logging
+import os
+import pickle
+
+from aospy.utils.vertcoord import d_deta_from_pfull, to_radians, to_pascal
 from indiff import CenDeriv
 import numpy as np
 import xarray as xr
 
 from .. import LAT_STR, LON_STR, PFULL_STR, PLEVEL_STR
+from .vertcoord import hybrid_coord
+
+# Spherical harmonic transform objects, keyed by (n_lat, n_lon, radius).
+_SPHARM_PLANS = {}
+_SPHARM_PLAN_DIREC = None
 
 
 def latlon_deriv_prefactor(lat, radius, radians=True,
@@ -22,25 +28,148 @@ def latlon_deriv_prefactor(lat, radius, radians=True,
 
 def wraparound(arr, dim, left=1, right=1, circumf=360., spacing=1):
     """Append wrap-around point(s) to the DataArray or Dataset coord."""
+    arr_ext = arr
     if left:
         edge_left = arr.isel(**{dim: slice(0, left, spacing)})
         edge_left[dim] += circumf
-        arr = xr.concat([arr, edge_left], dim=dim)
+        arr_ext = xr.concat([arr_ext, edge_left], dim=dim)
     if right:
         edge_right = arr.isel(**{dim: slice(-right, None, spacing)})
         edge_right[dim] -= circumf
-        xr.concat([edge_right, arr], dim=dim)
-    return arr
+        arr_ext = xr.concat([edge_right, arr_ext], dim=dim)
+    return arr_ext
+
+
+# Finite-difference stencils, as {offset: weight} of the points relative to
+# each point, for the derivative times the grid spacing.
+CEN_DIFF_STENCILS = {
+    2: {-1: -1./2, 1: 1./2},
+    4: {-2: 1./12, -1: -8./12, 1: 8./12, 2: -1./12},
+}
+# Upwind stencils for positive flow; those for negative flow are mirrored.
+UPWIND_STENCILS = {
+    1: {-1: -1., 0: 1.},
+    2: {-2: 1./2, -1: -2., 0: 3./2},
+    3: {-2: 1./6, -1: -1., 0: 1./2, 1: 1./3},
+}
+
+
+def _mirror_stencil(stencil):
+    return dict((-offset, -weight) for offset, weight in stencil.items())
+
+
+def _get_stencil(stencils, order):
+    try:
+        return stencils[order]
+    except KeyError:
+        raise ValueError("order must be one of {0}: "
+                         "{1}".format(sorted(stencils), order))
+
+
+def _periodic_spacing(coord, circumf):
+    """Uniform spacing of a coordinate that wraps around periodically."""
+    vals = np.asarray(coord, dtype=float)
+    diffs = np.diff(np.append(vals, vals[0] + circumf))
+    if not np.allclose(diffs, diffs[0]):
+        raise ValueError("Periodic differencing requires uniformly spaced "
+                         "values of '{}'".format(coord.name))
+    return diffs[0]
+
+
+def _apply_periodic_stencil(values, stencil, out, scratch, where=True):
+    """Add the stencil applied along the periodic last axis to `out`.
+
+    Each term is accumulated in place via slices of the values, so that,
+    unlike concatenating wrap-around points, no copies of the field are
+    made besides the given output and scratch arrays.  Only the points
+    where `where` is True are evaluated.
+    """
+    n = values.shape[-1]
+    for offset, weight in stencil.items():
+        shift = offset % n
+        for dst, src in (((Ellipsis, slice(0, n - shift)),
+                          (Ellipsis, slice(shift, n))),
+                         ((Ellipsis, slice(n - shift, n)),
+                          (Ellipsis, slice(0, shift)))):
+            mask = where if where is True else where[dst]
+            np.multiply(values[src], weight, out=scratch[dst], where=mask)
+            np.add(out[dst], scratch[dst], out=out[dst], where=mask)
+    return out
+
+
+def _as_float(values):
+    return np.asarray(values, dtype=np.result_type(values.dtype, float))
+
+
+def _cen_deriv_kernel(values, stencil, spacing):
+    values = _as_float(values)
+    deriv = _apply_periodic_stencil(values, stencil, np.zeros_like(values),
+                                    np.empty_like(values))
+    deriv /= spacing
+    return deriv
+
+
+def _upwind_advec_kernel(flow, values, stencil, spacing):
+    values = _as_float(values)
+    flow = np.broadcast_to(flow, values.shape)
+    upstream_right = flow < 0
+    advec = np.zeros_like(values)
+    scratch = np.empty_like(values)
+    _apply_periodic_stencil(values, stencil, advec, scratch,
+                            where=~upstream_right)
+    _apply_periodic_stencil(values, _mirror_stencil(stencil), advec,
+                            scratch, where=upstream_right)
+    advec *= flow
+    advec /= spacing
+    return advec
+
+
+def _apply_periodic(kernel, args, arr, dim, circumf, stencil):
+    """Apply the kernel along the periodic dimension of `arr`.
+
+    Dask-backed data stays lazy, in which case it must not be chunked along
+    `dim`.
+    """
+    spacing = np.deg2rad(_periodic_spacing(arr[dim], circumf))
+    args = [a if dim in a.dims else a.expand_dims({dim: arr[dim]})
+            for a in args]
+    result = xr.apply_ufunc(
+        kernel, *args, input_core_dims=[[dim]]*len(args),
+        output_core_dims=[[dim]],
+        kwargs=dict(stencil=stencil, spacing=spacing), dask='parallelized',
+        output_dtypes=[np.result_type(arr.dtype, float)]
+    )
+    extra_dims = [d for d in result.dims if d not in arr.dims]
+    return result.transpose(*(list(arr.dims) + extra_dims)).rename(arr.name)
+
+
+def periodic_cen_deriv(arr, dim=LON_STR, order=2, circumf=360.):
+    """Centered derivative in radians along a periodic dimension in degrees.
+
+    Supports orders 2 and 4.  The coordinate must be uniformly spaced.
+    """
+    stencil = _get_stencil(CEN_DIFF_STENCILS, order)
+    return _apply_periodic(_cen_deriv_kernel, [arr], arr, dim, circumf,
+                           stencil)
+
+
+def periodic_upwind_advec(flow, arr, dim=LON_STR, order=1, circumf=360.):
+    """Upwind advection in radians along a periodic dimension in degrees.
+
+    I.e. `flow` times the derivative of `arr`, with one-sided differencing
+    upstream of each point; only the upstream stencil is evaluated at each
+    point.  Supports orders 1, 2, and 3.  The coordinate must be uniformly
+    spaced.
+    """
+    stencil = _get_stencil(UPWIND_STENCILS, order)
+    return _apply_periodic(_upwind_advec_kernel, [flow, arr], arr, dim,
+                           circumf, stencil)
 
 
-def d_dx_from_latlon(arr, radius):
+def d_dx_from_latlon(arr, radius, order=2):
     """Compute \partial arr/\partial x using centered differencing."""
     prefactor = latlon_deriv_prefactor(arr[LAT_STR], radius, radians=False)
-    arr_ext = wraparound(arr, LON_STR, left=True, right=True, circumf=360.)
-    lon_rad_ext = to_radians(arr_ext[LON_STR])
-    darr_dx = CenDeriv(arr_ext, LON_STR, coord=lon_rad_ext,
-                       fill_edge=False).deriv()
-    return prefactor*darr_dx
+    return prefactor*periodic_cen_deriv(arr, LON_STR, order=order)
 
 
 def d_dy_from_lat(arr, radius, vec_field=False):
@@ -59,16 +188,13 @@ def d_dx_at_const_p_from_eta(arr, ps, radius, bk, pk):
 
     `arr` must be defined on full levels in hybrid sigma-pressure coordinates.
     """
-    pfull_coord = arr[PFULL_STR]
+    coord = hybrid_coord(bk, pk, arr[PFULL_STR])
     d_dx_const_eta = d_dx_from_latlon(arr, radius)
     darr_deta = d_deta_from_pfull(arr)
-    bk_at_pfull = to_pfull_from_phalf(bk, pfull_coord)
-    da_deta = d_deta_from_phalf(pk, pfull_coord)
-    db_deta = d_deta_from_phalf(bk, pfull_coord)
     d_dx_ps = d_dx_from_latlon(ps, radius)
 
-    return d_dx_const_eta + (darr_deta * bk_at_pfull * d_dx_ps /
-                             (da_deta + db_deta*ps))
+    return d_dx_const_eta + (darr_deta * coord.bk_at_pfull * d_dx_ps /
+                             coord.dp_deta(ps))
 
 
 def d_dy_at_const_p_from_eta(arr, ps, radius, bk, pk, vec_field=False):
@@ -76,16 +202,13 @@ def d_dy_at_const_p_from_eta(arr, ps, radius, bk, pk, vec_field=False):
 
     `arr` must be defined on full levels in hybrid sigma-pressure coordinates.
     """
-    pfull_coord = arr[PFULL_STR]
+    coord = hybrid_coord(bk, pk, arr[PFULL_STR])
     d_dy_const_eta = d_dy_from_lat(arr, radius, vec_field=vec_field)
     darr_deta = d_deta_from_pfull(arr)
-    bk_at_pfull = to_pfull_from_phalf(bk, pfull_coord)
-    da_deta = d_deta_from_phalf(pk, pfull_coord)
-    db_deta = d_deta_from_phalf(bk, pfull_coord)
     d_dy_ps = d_dy_from_lat(ps, radius, vec_field=vec_field)
 
-    return d_dy_const_eta + (darr_deta*bk_at_pfull * d_dy_ps /
-                             (da_deta + db_deta*ps))
+    return d_dy_const_eta + (darr_deta*coord.bk_at_pfull * d_dy_ps /
+                             coord.dp_deta(ps))
 
 
 def d_dp_from_p(arr, order=2):
@@ -100,20 +223,191 @@ def d_dp_from_eta(arr, ps, bk, pk, order=2):
 
     The array is assumed to be on full (as opposed to half) levels.
     """
-    pfull = pfull_from_ps(bk, pk, ps, arr[PFULL_STR])
+    pfull = hybrid_coord(bk, pk, arr[PFULL_STR]).pfull(ps)
     return CenDeriv(arr, PFULL_STR, coord=pfull).deriv(order=order,
                                                        fill_edges=True)
 
 
+def set_spharm_plan_direc(direc):
+    """Set directory in which to persist spherical harmonic transforms.
+
+    If None (the default), transforms are only cached within the current
+    process.  Otherwise each one is also pickled to this directory the first
+    time it is created and subsequently read back in by any process needing
+    the same grid, rather than being recomputed.
+    """
+    global _SPHARM_PLAN_DIREC
+    _SPHARM_PLAN_DIREC = direc
+
+
+def _spharm_plan_path(n_lat, n_lon, radius):
+    return os.path.join(_SPHARM_PLAN_DIREC, 'spharm_plan.{0}x{1}.r{2!r}.pkl'
+                        ''.format(n_lat, n_lon, radius))
+
+
+def _load_spharm_plan(n_lat, n_lon, radius):
+    """Load a previously persisted transform object, if there is one."""
+    if _SPHARM_PLAN_DIREC is None:
+        return None
+    try:
+        with open(_spharm_plan_path(n_lat, n_lon, radius), 'rb') as f:
+            return pickle.load(f)
+    except (IOError, OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def _save_spharm_plan(plan, n_lat, n_lon, radius):
+    """Persist the transform object to disk, if a directory has been set."""
+    if _SPHARM_PLAN_DIREC is None:
+        return
+    try:
+        if not os.path.isdir(_SPHARM_PLAN_DIREC):
+            os.makedirs(_SPHARM_PLAN_DIREC)
+        with open(_spharm_plan_path(n_lat, n_lon, radius), 'wb') as f:
+            pickle.dump(plan, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except (IOError, OSError, pickle.PicklingError) as e:
+        logging.warning("Couldn't save spherical harmonic transform to disk: "
+                        "{}".format(repr(e)))
+
+
+def spharm_plan(n_lat, n_lon, radius):
+    """Spherical harmonic transform object for the given grid and radius.
+
+    Creating the transform entails computing the Legendre functions for the
+    grid, which is expensive.  So each is created only once per process (or,
+    if `set_spharm_plan_direc` has been used, once ever) and then reused.
+    """
+    key = (int(n_lat), int(n_lon), float(radius))
+    try:
+        return _SPHARM_PLANS[key]
+    except KeyError:
+        pass
+    plan = _load_spharm_plan(*key)
+    if plan is None:
+        from animal_spharm import SpharmInterface
+        plan = SpharmInterface(n_lat=key[0], n_lon=key[1], rsphere=key[2],
+                               make_spharmt=True).spharmt
+        _save_spharm_plan(plan, *key)
+    _SPHARM_PLANS[key] = plan
+    return plan
+
+
+def clear_spharm_plans():
+    """Remove all spherical harmonic transforms from the in-memory cache."""
+    _SPHARM_PLANS.clear()
+
+
+def _total_wavenumbers(n_coeffs):
+    """Total wavenumber of each spectral coefficient, in spharm's order."""
+    ntrunc = int(round((np.sqrt(8*n_coeffs + 1) - 3) / 2))
+    return np.concatenate([np.arange(m, ntrunc + 1)
+                           for m in range(ntrunc + 1)])
+
+
+class SpectralBatch(object):
+    """Spherical harmonic coefficients of several fields on the same grid.
+
+    All of the scalar fields are transformed to spectral space together in a
+    single call, as are all of the wind pairs, by stacking them along the
+    trailing axis that spharm transforms independently.  Each of the derived
+    quantities (gradients, Laplacians, divergence, and vorticity) is likewise
+    transformed back to the grid for all of the fields at once, the first
+    time that of any field is requested.
+
+    Parameters
+    ----------
+    scalars : sequence of xarray.DataArray
+        Scalar fields
+    winds : sequence of (xarray.DataArray, xarray.DataArray)
+        Zonal and meridional wind pairs
+    radius : float
+        Radius of the sphere
+    """
+    def __init__(self, scalars=(), winds=(), radius=None):
+        from animal_spharm import SpharmInterface
+        self.scalars = list(scalars)
+        self.winds = list(winds)
+        grid = (self.scalars or [u for u, _ in self.winds])[0]
+        n_lat, n_lon = grid[LAT_STR].size, grid[LON_STR].size
+        self.sph = SpharmInterface(n_lat=n_lat, n_lon=n_lon, rsphere=radius)
+        self.sph.spharmt = spharm_plan(n_lat, n_lon, radius)
+        self.radius = radius
+        self._grids = {}
+        if self.scalars:
+            grids, self._scalar_shapes = self._stack(self.scalars)
+            self.scalar_spec = self.sph.spharmt.grdtospec(grids)
+        if self.winds:
+            u_grids, u_shapes = self._stack([u for u, _ in self.winds])
+            v_grids, _ = self._stack([v for _, v in self.winds])
+            self.vort_spec, self.divg_spec = (
+                self.sph.spharmt.getvrtdivspec(u_grids, v_grids)
+            )
+            self._wind_shapes = u_shapes
+
+    def _stack(self, arrs):
+        """Stack the fields' grids along the trailing axis."""
+        grids = [self.sph.prep_for_spharm(arr) for arr in arrs]
+        shapes = [grid.shape for grid in grids]
+        stacked = np.concatenate([grid.reshape(grid.shape[:2] + (-1,))
+                                  for grid in grids], axis=-1)
+        return stacked, shapes
+
+    def _unstack(self, stacked, arrs, shapes):
+        """Split the stacked grid back into DataArrays like the fields."""
+        sizes = [int(np.prod(shape[2:])) for shape in shapes]
+        bounds = np.cumsum([0] + sizes)
+        return [self.sph.to_xarray(
+            stacked[..., start:stop].reshape(shape), arr_orig=arr
+        ) for arr, shape, start, stop in zip(arrs, shapes, bounds[:-1],
+                                             bounds[1:])]
+
+    def _scalar_grids(self, name, func):
+        if name not in self._grids:
+            grids = func(self.scalar_spec)
+            if isinstance(grids, tuple):
+                self._grids[name] = list(zip(*[
+                    self._unstack(grid, self.scalars, self._scalar_shapes)
+                    for grid in grids
+                ]))
+            else:
+                self._grids[name] = self._unstack(grids, self.scalars,
+                                                  self._scalar_shapes)
+        return self._grids[name]
+
+    def _wind_grids(self, name, spec):
+        if name not in self._grids:
+            self._grids[name] = self._unstack(
+                self.sph.spharmt.spectogrd(spec),
+                [u for u, _ in self.winds], self._wind_shapes
+            )
+        return self._grids[name]
+
+    def gradient(self, n=0):
+        """Zonal and meridional gradient of the nth scalar field."""
+        return self._scalar_grids('gradient', self.sph.spharmt.getgrad)[n]
+
+    def laplacian(self, n=0):
+        """Laplacian of the nth scalar field."""
+        def laplacian(spec):
+            wavenum = _total_wavenumbers(spec.shape[0])
+            factor = -wavenum*(wavenum + 1.) / self.radius**2
+            return self.sph.spharmt.spectogrd(
+                spec*factor.reshape((-1,) + (1,)*(spec.ndim - 1))
+            )
+        return self._scalar_grids('laplacian', laplacian)[n]
+
+    def divergence(self, n=0):
+        """Horizontal divergence of the nth wind pair."""
+        return self._wind_grids('divergence', self.divg_spec)[n]
+
+    def vorticity(self, n=0):
+        """Relative vorticity of the nth wind pair."""
+        return self._wind_grids('vorticity', self.vort_spec)[n]
+
+
 def horiz_gradient_spharm(arr, radius):
     """Horizontal gradient computed spectrally using spherical harmonics."""
-    n_lat, n_lon = arr[LAT_STR].size, arr[LON_STR].size
-    sph = SpharmInterface(n_lat=n_lat, n_lon=n_lon, rsphere=radius,
-                          make_spharmt=True)
-    d_dx, d_dy = (sph.spharmt.getgrad(sph.spharmt.grdtospec(
-        sph.prep_for_spharm(arr)
-    )))
-    return sph.to_xarray(d_dx, arr_orig=arr), sph.to_xarray(d_dy, arr_orig=arr)
+    return SpectralBatch([arr], radius=radius).gradient()
 
 
 def horiz_gradient_from_eta_spharm(arr, ps, radius, bk, pk, vec_field=False):
@@ -121,17 +415,16 @@ def horiz_gradient_from_eta_spharm(arr, ps, radius, bk, pk, vec_field=False):
 
     `arr` must be defined on full levels in hybrid sigma-pressure coordinates.
     """
-    pfull_coord = arr[PFULL_STR]
-    d_dx_const_eta, d_dy_const_eta = horiz_gradient_spharm(arr, radius)
+    coord = hybrid_coord(bk, pk, arr[PFULL_STR])
+    batch = SpectralBatch([arr, ps], radius=radius)
+    d_dx_const_eta, d_dy_const_eta = batch.gradient(0)
     darr_deta = d_deta_from_pfull(arr)
-    bk_at_pfull = to_pfull_from_phalf(bk, pfull_coord)
-    da_deta = d_deta_from_phalf(pk, pfull_coord)
-    db_deta = d_deta_from_phalf(bk, pfull_coord)
-    d_dx_ps, d_dy_ps = horiz_gradient_spharm(ps, radius)
-    return (d_dx_const_eta + (darr_deta * bk_at_pfull * d_dx_ps /
-                              (da_deta + db_deta*ps)),
-            d_dy_const_eta + (darr_deta * bk_at_pfull * d_dy_ps /
-                              (da_deta + db_deta*ps)))
+    d_dx_ps, d_dy_ps = batch.gradient(1)
+    dp_deta = coord.dp_deta(ps)
+    return (d_dx_const_eta + (darr_deta * coord.bk_at_pfull * d_dx_ps /
+                              dp_deta),
+            d_dy_const_eta + (darr_deta * coord.bk_at_pfull * d_dy_ps /
+                              dp_deta))
 
 
 def d_dx_from_eta_spharm(arr, ps, radius, bk, pk, vec_field=False):
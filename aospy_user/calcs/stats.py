@@ -1,20 +1,128 @@
 """Functions related to statistical methods."""
+from collections import OrderedDict
+
 from aospy.utils.vertcoord import level_thickness
 import numpy as np
-import scipy
+import xarray as xr
 
 from .. import PLEVEL_STR
 from .toa_sfc_fluxes import cre_sw, cre_lw, cre_net, toa_rad_clr
 
 
-def flatten_spatial_dims(data):
-    """Flatten all spatial dimensions of an input array.
+def _regr_moments(x, y):
+    """Count, means, and sums of squared deviations of x and y along axis 0.
 
-    Assumes input array has shape (time, vert, lat, lon).
+    Points where either x or y is NaN are ignored.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    n = valid.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.where(valid, x, 0.).sum(axis=0) / n
+        mean_y = np.where(valid, y, 0.).sum(axis=0) / n
+    mean_x, mean_y = [np.where(n > 0, m, 0.) for m in (mean_x, mean_y)]
+    dx = np.where(valid, x - mean_x, 0.)
+    dy = np.where(valid, y - mean_y, 0.)
+    return (n, mean_x, mean_y, (dx*dx).sum(axis=0), (dy*dy).sum(axis=0),
+            (dx*dy).sum(axis=0))
+
+
+def _merge_regr_moments(first, second):
+    """Combine moments computed separately on two chunks of the data.
+
+    Uses the pairwise update of Chan et al. (1979), which unlike accumulating
+    raw sums of squares doesn't suffer from catastrophic cancellation.
+    """
+    n_a, mean_x_a, mean_y_a, sxx_a, syy_a, sxy_a = first
+    n_b, mean_x_b, mean_y_b, sxx_b, syy_b, sxy_b = second
+    n = n_a + n_b
+    with np.errstate(invalid='ignore', divide='ignore'):
+        frac_b = np.where(n > 0, n_b / n.astype(float), 0.)
+    delta_x = mean_x_b - mean_x_a
+    delta_y = mean_y_b - mean_y_a
+    weight = n_a*frac_b
+    return (n, mean_x_a + delta_x*frac_b, mean_y_a + delta_y*frac_b,
+            sxx_a + sxx_b + delta_x*delta_x*weight,
+            syy_a + syy_b + delta_y*delta_y*weight,
+            sxy_a + sxy_b + delta_x*delta_y*weight)
+
+
+def _iter_time_chunks(x, y, chunk_size):
+    """Yield successive chunks along the leading (time) axis of x and y."""
+    n_time = np.shape(x)[0]
+    if chunk_size is None:
+        chunk_size = n_time
+    for start in range(0, n_time, chunk_size):
+        yield x[start:start + chunk_size], y[start:start + chunk_size]
+
+
+def regr_stats_from_chunks(chunks):
+    """Pointwise correlation and linear regression statistics of y on x.
+
+    Parameters
+    ----------
+    chunks : iterable
+        Each element is a pair (x, y) of arrays spanning a contiguous chunk of
+        the time axis, which must be their leading axis.  The chunks are
+        consumed one at a time, so only one need be in memory at once.
+
+    Returns
+    -------
+    collections.OrderedDict
+        Arrays of 'corr', 'slope', 'intercept', 'r_squared', 'p_value', and
+        'stderr' (the standard error of the slope), each with the shape of
+        the inputs minus the time axis.  These match the output of
+        `scipy.stats.linregress` at each point, with NaN values excluded.
     """
-    n_lon, n_lat, n_lev = data.shape[-1], data.shape[-2], data.shape[-3]
-    n_pt = n_lon*n_lat*n_lev
-    return data.reshape((-1, n_pt))
+    # Imported here, since importing scipy is slow.
+    import scipy.stats
+    moments = None
+    for x, y in chunks:
+        chunk_moments = _regr_moments(x, y)
+        if moments is None:
+            moments = chunk_moments
+        else:
+            moments = _merge_regr_moments(moments, chunk_moments)
+    if moments is None:
+        raise ValueError("No data was provided")
+    n, mean_x, mean_y, sxx, syy, sxy = moments
+    dof = n - 2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = sxy / sxx
+        corr = np.clip(sxy / np.sqrt(sxx*syy), -1., 1.)
+        r_squared = corr*corr
+        t_stat = corr*np.sqrt(dof / ((1. - corr)*(1. + corr)))
+        stderr = np.sqrt((1. - r_squared)*syy / sxx / dof)
+    p_value = 2.*scipy.stats.t.sf(np.abs(t_stat), dof)
+    intercept = mean_y - slope*mean_x
+    return OrderedDict([('corr', corr), ('slope', slope),
+                        ('intercept', intercept), ('r_squared', r_squared),
+                        ('p_value', p_value), ('stderr', stderr)])
+
+
+def pointwise_regr_stats(x, y, chunk_size=None):
+    """Pointwise correlation and linear regression in time of two arrays.
+
+    All points are computed at once using vectorized operations.  The leading
+    axis must be time.  If `chunk_size` is given, the data is read and
+    processed that many timesteps at a time, so that e.g. netCDF- or
+    dask-backed DataArrays needn't be loaded into memory all at once.
+
+    See `regr_stats_from_chunks` for the statistics returned.  If `x` is a
+    DataArray, each is returned as a DataArray with its non-time coordinates.
+    """
+    if not np.all(np.shape(x) == np.shape(y)):
+        raise ValueError("x and y must have same shapes")
+    stats = regr_stats_from_chunks(_iter_time_chunks(x, y, chunk_size))
+    if isinstance(x, xr.DataArray):
+        time_dim = x.dims[0]
+        coords = dict((name, coord) for name, coord in
+                      x.isel(**{time_dim: 0}).coords.items()
+                      if name != time_dim)
+        for name, values in stats.items():
+            stats[name] = xr.DataArray(values, dims=x.dims[1:],
+                                       coords=coords, name=name)
+    return stats
 
 
 def pointwise_corr(x, y):
@@ -22,16 +130,7 @@ def pointwise_corr(x, y):
 
     Assumes input arrays have shape (time, vert, lat, lon).
     """
-    if not np.all(np.shape(x) == np.shape(y)):
-        raise ValueError("x and y must have same shapes")
-    # pearsonr only accepts 1d arrays.  Must flatten, compute, then reshape.
-    orig_shape = np.shape(x)
-    x, y = [flatten_spatial_dims(z) for z in (x, y)]
-    n_pt = x.shape[-1]
-    # pearsonr returns (corr, p_value).  Retain only corr via '[0]'.
-    corr = [scipy.stats.pearsonr(x[:, i], y[:, i])[0] for i in range(n_pt)]
-    # Reshape to original shape, but dropping the time dimension.
-    return np.reshape(corr, orig_shape[1:])
+    return pointwise_regr_stats(x, y)['corr']
 
 
 def pointwise_lin_regr(x, y):
@@ -40,16 +139,7 @@ def pointwise_lin_regr(x, y):
     Assumes input arrays have shape (time, vert, lat, lon).  The regression is
     of x against y, i.e. the slope returned is m, where y=mx+b.
     """
-    if not np.all(np.shape(x) == np.shape(y)):
-        raise ValueError("x and y must have same shapes")
-    # linregress only accepts 1d arrays.  Must flatten, compute, then reshape.
-    orig_shape = np.shape(x)
-    x, y = [flatten_spatial_dims(x_) for x_ in (x, y)]
-    n_pt = x.shape[-1]
-    # linregress returns (slope, ...).  Retain only slope via '[0]'.
-    slope = [scipy.stats.linregress(x[:, i], y[:, i])[0] for i in range(n_pt)]
-    # Reshape to original shape, but dropping the time dimension.
-    return np.reshape(slope, orig_shape[1:])
+    return pointwise_regr_stats(x, y)['slope']
 
 
 def corr_cre_sw(swup_toa, swup_toa_clr, var2):
@@ -0,0 +1,101 @@
+"""Meridional mass streamfunction on pressure or model-native levels.
+
+`mass_streamfunction` takes the meridional wind as a DataArray with any
+dimensions besides latitude and its vertical dimension (time, run, etc.),
+on either standard pressure levels or model-native levels with the given
+pressure thicknesses.  The zonal-mean mass flux is integrated downward from
+the top of the atmosphere in a single cumulative sum.  That is cheap enough
+that it isn't memoized, since fingerprinting its input would cost as much.
+"""
+from aospy.constants import grav, r_e
+from aospy.utils.vertcoord import to_pascal
+import numpy as np
+import xarray as xr
+
+from .. import LAT_STR, LON_STR, PFULL_STR, PLEVEL_STR
+
+
+def _vert_dim(arr):
+    for dim in (PLEVEL_STR, PFULL_STR):
+        if dim in arr.dims:
+            return dim
+    raise ValueError("Couldn't find vertical dimension of {}".format(arr))
+
+
+def plevel_thickness(level, p_top=5., p_bot=1005.):
+    """Pressure thickness in Pa of pressure levels given in hPa.
+
+    The edges of each level are halfway between it and its neighbors, and
+    the given pressures (also in hPa) bound the uppermost and lowermost
+    levels.  The levels may be in either order.
+    """
+    p = np.asarray(level.values, dtype=float)
+    order = np.argsort(p)
+    p_sorted = p[order]
+    edges = np.concatenate(([p_top], 0.5*(p_sorted[1:] + p_sorted[:-1]),
+                            [p_bot]))
+    dp = np.empty_like(p)
+    dp[order] = 100.*np.diff(edges)
+    return xr.DataArray(dp, dims=level.dims, coords=level.coords, name='dp')
+
+
+def mass_streamfunction(v, dp=None, p_top=5., p_bot=1005.):
+    """Eulerian meridional mass streamfunction, in kg/s, at each level.
+
+    Integrated from the top of the atmosphere down to the middle of each
+    level, of the zonal-mean (if `v` has a longitude dimension) northward
+    mass flux.  By the convention of `zonal_mean_circ.msf`, the sign is such
+    that the Northern Hemisphere's Hadley cell is negative.
+
+    Parameters
+    ----------
+    v : xarray.DataArray
+        Northward wind, on pressure levels or model-native full levels
+    dp : xarray.DataArray, optional
+        Pressure thickness of the levels.  Required for model-native levels;
+        if not given for pressure levels, it is computed via
+        `plevel_thickness` with the given top and bottom pressures in hPa.
+    """
+    vert_dim = _vert_dim(v)
+    if dp is None:
+        if vert_dim != PLEVEL_STR:
+            raise ValueError("Pressure thicknesses are required for data "
+                             "on model-native levels")
+        dp = plevel_thickness(v[PLEVEL_STR], p_top=p_top, p_bot=p_bot)
+    flux = v*to_pascal(dp, is_dp=True)
+    if LON_STR in flux.dims:
+        flux = flux.mean(LON_STR)
+    other = [dim for dim in flux.dims if dim not in (vert_dim, LAT_STR)]
+    flux = flux.transpose(*(other + [vert_dim, LAT_STR]))
+    values = np.asarray(flux.values, dtype=float)
+    # Integrate from whichever end of the levels is the top.
+    top_last = (flux[vert_dim].size > 1 and
+                flux[vert_dim].values[0] > flux[vert_dim].values[-1])
+    if top_last:
+        values = values[..., ::-1, :]
+    strmfunc = np.cumsum(values, axis=-2)
+    # Subtract half of each level's own flux, to obtain the values at its
+    # middle rather than its bottom.
+    values *= 0.5
+    strmfunc -= values
+    del values
+    strmfunc *= (-2.*np.pi*r_e.value / grav.value *
+                 np.cos(np.deg2rad(flux[LAT_STR].values)))
+    if top_last:
+        strmfunc = strmfunc[..., ::-1, :]
+    return xr.DataArray(strmfunc, dims=flux.dims, coords=flux.coords,
+                        name='msf')
+
+
+def msf_max_magnitude(strmfunc):
+    """Streamfunction value of maximum magnitude at each latitude."""
+    vert_dim = _vert_dim(strmfunc)
+    pos_max = strmfunc.max(vert_dim)
+    neg_max = strmfunc.min(vert_dim)
+    return pos_max.where(pos_max > -neg_max, neg_max)
+
+
+def mass_streamfunction_max(v, dp=None, p_top=5., p_bot=1005.):
+    """Maximum magnitude of the mass streamfunction at each latitude."""
+    return msf_max_magnitude(mass_streamfunction(v, dp=dp, p_top=p_top,
+                                                 p_bot=p_bot))
@@ -1,40 +1,193 @@
 """Calculations involved in mass and energy budgets."""
 from indiff import CenDeriv
 import numpy as np
+import pandas as pd
+import xarray as xr
 
 from .. import TIME_STR
 
 
+# Number of periods of the data read in at a time by `period_stats`.
+_PERIODS_PER_BLOCK = 12
+
+
+def _period_bounds(time, freq):
+    """Labels and indices of the first and last timesteps of each period.
+
+    Periods without any timesteps are omitted.
+    """
+    positions = pd.Series(np.arange(time.size),
+                          index=pd.DatetimeIndex(time.values))
+    resampler = positions.resample(freq)
+    first, last = resampler.first().dropna(), resampler.last().dropna()
+    return (first.index.values, first.values.astype(int),
+            last.values.astype(int))
+
+
+def _on_periods(values, arr, labels):
+    """DataArray of per-period values, with the array's other coords."""
+    coords = dict((name, coord) for name, coord in arr.coords.items()
+                  if TIME_STR not in coord.dims)
+    coords[TIME_STR] = labels
+    return xr.DataArray(values, dims=arr.dims, coords=coords, name=arr.name)
+
+
+def _duration(time, labels, first_ind, last_ind):
+    """Seconds between the first and last timesteps of each period."""
+    times = time.values
+    # Divide by a 1 sec timedelta to convert to seconds.
+    return xr.DataArray(
+        (times[last_ind] - times[first_ind]) / np.timedelta64(1, 's'),
+        dims=[TIME_STR], coords={TIME_STR: labels}
+    )
+
+
+def _first_valid(values, axis, reverse=False):
+    """Values at each point's first non-missing timestep along the axis.
+
+    Or its last if `reverse` is True.  NaN where all values are missing.
+    """
+    values = np.rollaxis(values, axis)
+    if reverse:
+        values = values[::-1]
+    out = values[0].copy()
+    for step in values[1:]:
+        missing = np.isnan(out)
+        if not missing.any():
+            break
+        out[missing] = step[missing]
+    return np.expand_dims(out, axis)
+
+
+def _period_reductions(arr, freq, names):
+    """Labels and named per-period reductions of the array.
+
+    `names` are among 'first', 'last', and 'mean'.  Only these are computed,
+    in a single pass over the data reading in the timesteps of only a few
+    periods at a time.
+    """
+    labels, first_ind, last_ind = _period_bounds(arr[TIME_STR], freq)
+    axis = arr.get_axis_num(TIME_STR)
+    parts = dict((name, []) for name in names)
+    for start in range(0, labels.size, _PERIODS_PER_BLOCK):
+        stop = min(start + _PERIODS_PER_BLOCK, labels.size)
+        offset = first_ind[start]
+        block = np.asarray(arr.isel(**{TIME_STR: slice(
+            offset, last_ind[stop - 1] + 1)}).values)
+        starts = first_ind[start:stop] - offset
+        if 'mean' in names:
+            valid = ~np.isnan(block)
+            sums = np.add.reduceat(np.where(valid, block, 0.), starts,
+                                   axis=axis, dtype=np.float64)
+            counts = np.add.reduceat(valid, starts, axis=axis,
+                                     dtype=np.int64)
+            with np.errstate(invalid='ignore'):
+                parts['mean'].append(sums / counts)
+        for first, last in zip(starts, last_ind[start:stop] - offset):
+            period = block[(slice(None),)*axis + (slice(first, last + 1),)]
+            for name in ('first', 'last'):
+                if name in names:
+                    parts[name].append(_first_valid(
+                        period, axis, reverse=(name == 'last')
+                    ))
+    out = dict((name, np.concatenate(part, axis=axis))
+               for name, part in parts.items())
+    if 'mean' in out:
+        out['mean'] = out['mean'].astype(
+            np.result_type(arr.dtype, np.float32), copy=False)
+    return (labels, first_ind, last_ind,
+            dict((name, _on_periods(values, arr, labels))
+                 for name, values in out.items()))
+
+
+def period_stats(arr, freq='1M'):
+    """First, last, and mean values and duration of each time period.
+
+    Computed in a single pass over the data, reading in the timesteps of
+    only a few periods at a time, so that lazily loaded arrays are never
+    entirely in memory.  Periods without any timesteps are omitted.
+
+    Parameters
+    ----------
+    arr : xarray.DataArray
+        Data with a time dimension, e.g. at 3- or 6-hourly frequency
+    freq : str
+        Frequency of the periods, e.g. '1M' for months
+
+    Returns
+    -------
+    xarray.Dataset
+        'first' and 'last' are the first and last non-missing values in each
+        period, as with resampling via how='first' and how='last', 'mean'
+        the mean over the period of the non-missing values, and 'duration'
+        the time in seconds between the period's first and last timesteps.
+    """
+    labels, first_ind, last_ind, stats = _period_reductions(
+        arr, freq, ('first', 'last', 'mean')
+    )
+    stats['duration'] = _duration(arr[TIME_STR], labels, first_ind,
+                                  last_ind)
+    return xr.Dataset(stats)
+
+
+def period_mean(arr, freq='1M'):
+    """Mean of the array over each time period; see `period_stats`."""
+    return _period_reductions(arr, freq, ('mean',))[-1]['mean']
+
+
 def first_to_last_vals_dur(arr, freq='1M'):
     """Time elapsed between 1st and last values in each given time period."""
-    time = arr[TIME_STR]
-    first = time.resample(freq, TIME_STR, how='first')
-    last = time.resample(freq, TIME_STR, how='last')
-    delta_time = last - first
-    # Divide by a 1 sec timedelta to convert to seconds.
-    delta_time.values = delta_time.values / np.timedelta64(1, 's')
-    return delta_time
+    return _duration(arr[TIME_STR], *_period_bounds(arr[TIME_STR], freq))
 
 
 def time_tendency_first_to_last(arr, freq='1M'):
-    """Time tendency of the given field over given time interval."""
-    first = arr.resample(freq, TIME_STR, how='first').dropna(TIME_STR)
-    last = arr.resample(freq, TIME_STR, how='last').dropna(TIME_STR)
-    return (last - first) / first_to_last_vals_dur(arr, freq)
+    """Time tendency of the given field over given time interval.
+
+    Uses the first and last non-missing values in each period, divided by
+    the time between the period's first and last timesteps.
+    """
+    labels, first_ind, last_ind, stats = _period_reductions(
+        arr, freq, ('first', 'last')
+    )
+    return (stats['last'] - stats['first']) / _duration(
+        arr[TIME_STR], labels, first_ind, last_ind
+    )
 
 
 def cen_diff_time(arr):
     """Time centered differencing"""
-    time = arr[TIME_STR].copy()
     # Force time units to be seconds.
-    time = (time - np.datetime64(0, 's')) / np.timedelta64(1, 's')
+    time = _time_in_seconds(arr[TIME_STR].copy())
     return CenDeriv(arr, TIME_STR, coord=time, fill_edge=True).deriv()
 
 
+def _time_in_seconds(time):
+    return (time - np.datetime64(0, 's')) / np.timedelta64(1, 's')
+
+
 def time_tendency_each_timestep(arr):
     """Time tendency of the given field at each timestep.
 
     Compute via centered differencing at interior timesteps, one-sided
-    differencing at endpoints.
+    differencing at endpoints.  Each year is treated separately, i.e. the
+    first and last timesteps of each year use one-sided differences.  The
+    tendency is undefined, and so NaN, in years with a single timestep.
+
+    Equivalent to applying `cen_diff_time` to each year separately, but
+    computed over the whole time axis at once, and lazily if the array is
+    dask-backed.
     """
-    return arr.groupby('time.year').apply(cen_diff_time)
+    time = _time_in_seconds(arr[TIME_STR])
+    year = arr[TIME_STR].dt.year
+    # Neighbors within the same year; otherwise the value itself, yielding
+    # a one-sided difference.
+    has_next = year.shift(**{TIME_STR: -1}) == year
+    has_prev = year.shift(**{TIME_STR: 1}) == year
+    arr_next = arr.shift(**{TIME_STR: -1}).where(has_next, arr)
+    arr_prev = arr.shift(**{TIME_STR: 1}).where(has_prev, arr)
+    time_next = time.shift(**{TIME_STR: -1}).where(has_next, time)
+    time_prev = time.shift(**{TIME_STR: 1}).where(has_prev, time)
+    # Years with a single timestep have no neighbors to difference with.
+    dt = time_next - time_prev
+    dt = dt.where(dt != 0)
+    return ((arr_next - arr_prev) / dt).transpose(*arr.dims)
@@ -1,14 +1,15 @@
 """Functions for computing tracer transports."""
-from aospy.utils.vertcoord import (int_dp_g, to_pfull_from_phalf,
-                                   d_deta_from_phalf, dp_from_ps)
+from aospy.utils.vertcoord import int_dp_g
 from indiff.advec import SphereUpwind
 import numpy as np
 
 from .. import PFULL_STR
-from .numerics import d_dx_from_latlon, d_dy_from_lat, d_dp_from_p
-from .advection import horiz_advec, vert_advec, horiz_advec_spharm
-from .mass import (horiz_divg, horiz_divg_mass_adj, horiz_advec_mass_adj,
-                   horiz_divg_spharm)
+from .chunking import by_year_chunks
+from .numerics import (d_dx_from_latlon, d_dy_from_lat, d_dp_from_p,
+                       SpectralBatch)
+from .advection import horiz_advec, vert_advec
+from .mass import horiz_divg, horiz_divg_mass_adj, horiz_advec_mass_adj
+from .vertcoord import hybrid_coord
 
 
 def field_horiz_flux_divg(arr, u, v, radius):
@@ -61,30 +62,26 @@ def field_horiz_advec_divg_sum(arr, u, v, radius, dp):
             horiz_advec(arr, u, v, radius))
 
 
+@by_year_chunks
 def omega_from_divg_eta(u, v, ps, radius, bk, pk):
     """Omega computed from the horizontal flow on model-native coordinates."""
-    ps_advec = horiz_advec_spharm(ps, u, v, radius)
-    divg = horiz_divg_spharm(u, v, radius)
-    term2 = u.copy()
-    pfull_coord = u[PFULL_STR]
+    batch = SpectralBatch([ps], [(u, v)], radius=radius)
+    dps_dx, dps_dy = batch.gradient()
+    ps_advec = u*dps_dx + v*dps_dy
+    divg = batch.divergence()
+    coord = hybrid_coord(bk, pk, u[PFULL_STR])
 
     del u, v
 
-    term1 = to_pfull_from_phalf(bk, pfull_coord) * ps_advec
+    term1 = coord.bk_at_pfull * ps_advec
 
-    db = d_deta_from_phalf(bk, pfull_coord)
-    term2.values = np.cumsum(ps_advec*db, axis=1)
+    term2 = (ps_advec*coord.dbk_deta).cumsum(PFULL_STR)
 
     del ps_advec
 
-    dp = dp_from_ps(bk, pk, ps, pfull_coord)
-    divg_dp = divg*dp
+    dp = coord.dp(ps)
+    divg_int = (divg*dp).cumsum(PFULL_STR)
 
     del dp
 
-    p_axis_num = divg_dp.get_axis_num(PFULL_STR)
-    divg_int = np.cumsum(divg_dp, axis=p_axis_num)
-
-    del divg_dp
-
     return term1 - term2 - divg_int
@@ -0,0 +1,145 @@
+"""Tropopause of each column by the WMO lapse-rate criterion.
+
+Following Reichler et al. 2003 GRL, the tropopause is the lowest level at
+which the lapse rate decreases to 2 K/km, provided that the average lapse
+rate between it and every level within 2 km above it also stays below
+2 K/km, the average being the temperature difference divided by the
+height difference.  All columns and time steps are searched at once: every
+level at which the lapse rate crosses the threshold is a candidate, the
+candidates failing the 2 km check are masked out, and the lowest one
+remaining is selected by an argmax along the vertical.
+"""
+from aospy.constants import grav, kappa, R_d
+from aospy.utils.vertcoord import to_pascal, vert_coord_name
+import numpy as np
+import xarray as xr
+
+
+# Factors converting pressure in the given units to Pa.
+_TO_PA = {'Pa': 1., 'hPa': 100., 'mb': 100., 'mbar': 100.,
+          'millibars': 100.}
+
+
+def _pressure_in_pa(p):
+    """Pressure in Pa, converted according to its 'units' attribute.
+
+    Data without units is assumed to be in hPa or Pa based on its magnitude,
+    as aospy does.
+    """
+    units = p.attrs.get('units')
+    if units is None:
+        return to_pascal(p)
+    try:
+        factor = _TO_PA[units]
+    except KeyError:
+        raise ValueError("Unrecognized pressure units: {}".format(units))
+    return p if factor == 1. else factor*p
+
+
+def _take(arr, ind):
+    return np.take_along_axis(arr, ind, axis=-1)
+
+
+def _wmo_tropopause(temp, p, lapse_crit, depth, p_min, p_max):
+    """Tropopause pressure of columns along the last axis of the arrays."""
+    temp, p = np.broadcast_arrays(np.asarray(temp, dtype=float),
+                                  np.asarray(p, dtype=float))
+    # Order the levels from the bottom up.
+    if np.nanmean(p[..., 0]) < np.nanmean(p[..., -1]):
+        temp, p = temp[..., ::-1], p[..., ::-1]
+    n_lev = temp.shape[-1]
+    kap = kappa.value
+    pkap = p**kap
+    # dT/dz between adjacent levels, assuming T linear in pressure^kappa.
+    dtdz = ((temp[..., 1:] - temp[..., :-1]) *
+            (pkap[..., :-1] + pkap[..., 1:]) /
+            ((temp[..., 1:] + temp[..., :-1]) *
+             (pkap[..., :-1] - pkap[..., 1:]))) * kap*grav.value/R_d.value
+    pkap_half = 0.5*(pkap[..., 1:] + pkap[..., :-1])
+    # Heights of the levels and of the middles of the layers between them,
+    # via the hypsometric equation.  Only differences are used, so levels
+    # missing below ground don't matter.
+    dz = (R_d.value/grav.value * 0.5*(temp[..., 1:] + temp[..., :-1]) *
+          np.log(p[..., :-1] / p[..., 1:]))
+    z = np.concatenate([np.zeros_like(dz[..., :1]),
+                        np.nancumsum(dz, axis=-1)], axis=-1)
+    z_half = z[..., 1:] - 0.5*dz
+    slope = np.diff(temp, axis=-1) / dz
+    del pkap, dz
+
+    # Candidates: where dT/dz rises above the threshold, linearly
+    # interpolated in pressure^kappa.
+    crit = -lapse_crit
+    below, above = dtdz[..., :-1], dtdz[..., 1:]
+    is_cand = (below <= crit) & (above > crit)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frac = (crit - below) / (above - below)
+        p_tp = (pkap_half[..., :-1] +
+                frac*(pkap_half[..., 1:] - pkap_half[..., :-1]))**(1./kap)
+        z_tp = z_half[..., :-1] + frac*(z_half[..., 1:] - z_half[..., :-1])
+        # The temperature there, linear in height between the levels, of
+        # which the one between the two layers' middles is the second
+        # layer's bottom.
+        z_bot = z[..., 1:-1]
+        t_tp = temp[..., 1:-1] + (z_tp - z_bot)*np.where(
+            z_tp < z_bot, slope[..., :-1], slope[..., 1:]
+        )
+    del below, above, pkap_half, frac, slope, z_bot
+    is_cand &= (p_tp >= p_min) & (p_tp <= p_max)
+
+    # Mask out the candidates for which the average dT/dz between them and
+    # any level within the given depth above, i.e. the temperature
+    # difference over the height difference, falls below the threshold.
+    # The levels `offset` above the bottom of each candidate's lower layer
+    # are a slice, the first of them always above the candidate being 2.
+    for offset in range(2, n_lev):
+        n_cand = n_lev - offset
+        dz_tp = z[..., offset:] - z_tp[..., :n_cand]
+        within = dz_tp <= depth
+        if not within.any():
+            break
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_dtdz = (temp[..., offset:] - t_tp[..., :n_cand]) / dz_tp
+        is_cand[..., :n_cand] &= ~within | (mean_dtdz >= crit)
+
+    # The lowest remaining candidate.
+    first = np.argmax(is_cand, axis=-1)[..., np.newaxis]
+    return np.where(is_cand.any(axis=-1), _take(p_tp, first)[..., 0],
+                    np.nan)
+
+
+def tropopause_pressure(temp, p=None, lapse_crit=2e-3, depth=2000.,
+                        p_min=75., p_max=550.):
+    """Pressure, in Pa, of the WMO tropopause of each column.
+
+    NaN in columns where no level satisfies the criterion.  The computation
+    is applied block by block, so that data chunked along any dimension but
+    the vertical can stream through it.
+
+    Parameters
+    ----------
+    temp : xarray.DataArray
+        Temperature, on pressure levels or model-native full levels
+    p : xarray.DataArray, optional
+        Pressure of the levels.  Required for model-native levels; if not
+        given, the pressure levels of `temp` are used.  Converted to Pa
+        according to its 'units' attribute, if it has one.
+    lapse_crit : float, optional
+        Threshold lapse rate, in K/m
+    depth : float, optional
+        Depth, in meters, above the tropopause within which the average
+        lapse rate must not exceed the threshold
+    p_min, p_max : float, optional
+        Range of pressures, in hPa, within which to search
+    """
+    vert_dim = vert_coord_name(temp)
+    if p is None:
+        p = temp[vert_dim]
+    trop_p = xr.apply_ufunc(
+        _wmo_tropopause, temp, _pressure_in_pa(p),
+        input_core_dims=[[vert_dim], [vert_dim]],
+        kwargs=dict(lapse_crit=lapse_crit, depth=depth, p_min=100.*p_min,
+                    p_max=100.*p_max),
+        dask='parallelized', output_dtypes=[float]
+    )
+    return trop_p.rename('trop_p')
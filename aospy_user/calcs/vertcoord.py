@@ -0,0 +1,128 @@
+"""Hybrid sigma-pressure coordinates, with their derived quantities cached.
+
+Functions on model-native (eta) levels need the coefficients of each model's
+hybrid coordinate interpolated to, or differenced onto, full levels, and the
+pressure and pressure thickness of each level derived from the surface
+pressure.  Previously each function recomputed all of these on every call.
+A `HybridCoord` instead computes the level coefficients once per model, and
+the pressures derived from each surface pressure array (or each time chunk
+of one) once, and `hybrid_coord` shares the same object among all of the
+functions and Calcs on the same model levels.
+
+The results are identical to those of the functions in
+`aospy.utils.vertcoord` that they replace.
+"""
+import threading
+import types
+
+from aospy.internal_names import ETA_STR
+from aospy.utils.vertcoord import (d_deta_from_phalf, phalf_from_ps,
+                                   to_pfull_from_phalf)
+
+from .memo import IntermediateCache, fingerprint
+
+# Pressures derived from surface pressure, shared by all HybridCoords.
+pressure_cache = IntermediateCache(max_bytes=1024**3)
+
+
+class HybridCoord(object):
+    """Hybrid sigma-pressure vertical coordinate of a model.
+
+    Parameters
+    ----------
+    bk, pk : xarray.DataArray
+        Coefficients of the surface pressure and the constant pressure,
+        respectively, at half levels
+    pfull_coord : xarray.DataArray
+        The full levels
+    """
+    def __init__(self, bk, pk, pfull_coord):
+        self.bk = bk
+        self.pk = pk
+        self.pfull_coord = pfull_coord
+        self.bk_at_pfull = to_pfull_from_phalf(bk, pfull_coord)
+        self.dpk_deta = d_deta_from_phalf(pk, pfull_coord)
+        self.dbk_deta = d_deta_from_phalf(bk, pfull_coord)
+        self._key = (fingerprint(bk), fingerprint(pk),
+                     fingerprint(pfull_coord))
+
+    def _cached(self, name, ps, func):
+        key = (self._key, name, fingerprint(ps))
+        try:
+            return pressure_cache.get(key)
+        except KeyError:
+            pass
+        return pressure_cache.put(key, func(ps))
+
+    def phalf(self, ps):
+        """Pressure at half levels."""
+        return self._cached('phalf', ps,
+                            lambda ps: phalf_from_ps(self.bk, self.pk, ps))
+
+    def pfull(self, ps):
+        """Pressure at full levels."""
+        return self._cached('pfull', ps, lambda ps: to_pfull_from_phalf(
+            self.phalf(ps), self.pfull_coord))
+
+    def dp(self, ps):
+        """Pressure thickness of the full levels."""
+        return self._cached('dp', ps, lambda ps: d_deta_from_phalf(
+            self.phalf(ps), self.pfull_coord))
+
+    def dp_deta(self, ps):
+        """Derivative of pressure in eta at full levels."""
+        return self._cached('dp_deta', ps,
+                            lambda ps: self.dpk_deta + self.dbk_deta*ps)
+
+    def const_p_correction(self, ps):
+        """Factor multiplying d/deta times the gradient of surface pressure.
+
+        Subtracted from the gradient along eta levels of a field, this
+        product yields its gradient at constant pressure.
+        """
+        return self._cached('const_p_correction', ps,
+                            lambda ps: self.bk_at_pfull / self.dp_deta(ps))
+
+
+_COORDS = {}
+_COORDS_LOCK = threading.Lock()
+
+
+def hybrid_coord(bk, pk, pfull_coord):
+    """The `HybridCoord` of the given coefficients and levels, cached."""
+    key = (fingerprint(bk), fingerprint(pk), fingerprint(pfull_coord))
+    with _COORDS_LOCK:
+        try:
+            return _COORDS[key]
+        except KeyError:
+            pass
+    coord = HybridCoord(bk, pk, pfull_coord)
+    with _COORDS_LOCK:
+        return _COORDS.setdefault(key, coord)
+
+
+def clear_hybrid_coords():
+    """Empty the caches of `HybridCoord` objects and derived pressures."""
+    with _COORDS_LOCK:
+        _COORDS.clear()
+    pressure_cache.clear()
+
+
+def _get_pressure_from_eta_coords(calc, ps, name='p', n=0):
+    """Replacement for `aospy.Calc._get_pressure_from_eta_coords`."""
+    model = calc.model[n]
+    coord = hybrid_coord(model.bk, model.pk, model.pfull)
+    if name == 'p':
+        return coord.pfull(ps)
+    if name == 'dp':
+        return coord.dp(ps)
+    raise ValueError("name must be 'p' or 'dp':"
+                     "'{}'".format(name))
+
+
+def share_hybrid_coord(calc):
+    """Make the Calc derive pressures on eta levels via `hybrid_coord`."""
+    if calc.dtype_in_vert == ETA_STR:
+        calc._get_pressure_from_eta_coords = types.MethodType(
+            _get_pressure_from_eta_coords, calc)
+    return calc
@@ -3,9 +3,9 @@ from aospy.constants import grav
 from aospy.utils.vertcoord import int_dp_g
 
 from .tendencies import time_tendency_first_to_last
-from .mass import (column_flux_divg, column_flux_divg_adj,
-                   budget_residual, dry_mass_column_budget_residual,
-                   mass_column_divg_adj)
+from .mass import (column_budget_terms, column_flux_divg,
+                   column_flux_divg_adj, budget_residual,
+                   dry_mass_column_budget_residual, mass_column_divg_adj)
 
 
 def p_minus_e(precip, evap):
@@ -69,6 +69,17 @@ def moisture_column_budget_residual(q, u, v, dp, radius, evap, precip,
     return budget_residual(tendency, transport, source=source, freq=freq)
 
 
+def moisture_budget_terms(q, u, v, dp, radius, evap, precip, omega=None,
+                          p=None, freq='1M'):
+    """All terms of the column water vapor budget, as a Dataset.
+
+    See `mass.column_budget_terms`.
+    """
+    return column_budget_terms(q, u, v, dp, radius,
+                               source=moisture_column_source(precip, evap),
+                               omega=omega, p=p, freq=freq)
+
+
 def moisture_column_divg_with_adj2(q, ps, u, v, evap, precip, radius, dp,
                                    freq='1M'):
     """Column flux divergence, with the field defined per unit mass of air."""
@@ -1,56 +1,80 @@
 """Zonal-mean meridional circulation and mass transport quantities."""
-from aospy.constants import c_p, grav, L_f, L_v, Omega, r_e, R_d
-from aospy.utils.vertcoord import level_thickness, to_pascal
+from aospy.constants import c_p, grav, L_f, L_v, Omega, r_e
+from aospy.utils.vertcoord import level_thickness
 import numpy as np
+import xarray as xr
 
-from .. import LAT_STR
+from .. import LAT_STR, LON_STR, PLEVEL_STR, TIME_STR
+from .circ_metrics import hadley_edges, precip_centroid_lat
+from .heat_transport import implied_transport
+from .streamfunction import mass_streamfunction, msf_max_magnitude
 from .thermo import dse, mse
-from .toa_sfc_fluxes import column_energy
+from .toa_sfc_fluxes import column_energy, sfc_energy, toa_rad
+from .tropopause import tropopause_pressure
+
+
+def _plevel_vcomp(lats, levs, v):
+    """DataArray of northward wind given as a (time, level, lat, lon) array."""
+    dims = [TIME_STR, PLEVEL_STR, LAT_STR, LON_STR][-np.ndim(v):]
+    return xr.DataArray(v, dims=dims,
+                        coords={PLEVEL_STR: levs, LAT_STR: lats})
 
 
 def msf(lats, levs, v):
-    """Meridional mass streamfunction."""
-    # Compute half level boundaries and widths.
-    p_top = 5.
-    p_bot = 1005.
-    p_half = 0.5*(levs[1:] + levs[:-1])
-    p_half = np.insert(np.append(p_half, p_top), 0, p_bot)
-    dp = to_pascal(p_half[:-1] - p_half[1:])[np.newaxis, ::-1, np.newaxis]
-    geom_factor = (2.*np.pi*r_e/grav *
-                   np.cos(np.deg2rad(lats))[np.newaxis, np.newaxis, :])
-    # Integrate from TOA down to surface.
-    msf_ = geom_factor * np.cumsum(v.mean(axis=-1) * dp, axis=1)[::-1]
-    # Average the values calculated at half levels; flip sign by convention.
-    msf_[:,:-1] = -0.5*(msf_[:,1:] + msf_[:,:-1])
-    # Uppermost level goes to 0 hPa (so divide by 2); surface value is zero.
-    msf_[:,-1]*=0.5
-    msf_[:,0] = 0.
-    return msf_
+    """Meridional mass streamfunction.
+
+    For numpy arrays; see `streamfunction.mass_streamfunction`.
+    """
+    return mass_streamfunction(_plevel_vcomp(lats, levs, v)).values
 
 
 def msf_max(lats, levs, v):
     """Maximum meridional mass streamfunction magnitude at each latitude."""
-    strmfunc = msf(lats, levs, v)
-    pos_max = np.amax(strmfunc, axis=1)
-    neg_max = np.amin(strmfunc, axis=1)
-    return np.where(pos_max > -neg_max, pos_max, neg_max)
+    return msf_max_magnitude(
+        mass_streamfunction(_plevel_vcomp(lats, levs, v))
+    ).values
 
 
 def aht(swdn_toa, swup_toa, olr, swup_sfc, swdn_sfc, lwup_sfc, lwdn_sfc,
-        shflx, evap, snow_ls, snow_conv, sfc_area):
-    """Total atmospheric northward energy flux."""
+        shflx, evap, snow_ls, snow_conv, sfc_area, precip=None):
+    """Total atmospheric northward energy flux.
+
+    If `precip` is given, split into its latent and dry static parts; see
+    `heat_transport.implied_transport`.
+    """
     # Calculate energy balance at each grid point.
     local = (column_energy(swdn_toa, swup_toa, olr, swup_sfc, swdn_sfc,
                            lwup_sfc, lwdn_sfc, shflx, evap) +
-             L_f*(snow_ls + snow_conv))
-    # Calculate meridional heat transport.
-    local_flat = local.reshape((local.shape[0],-1))
-    global_mean = np.ma.average(local_flat, weights=sfc_area.ravel(), axis=1)
-    zonal_integral = np.sum(
-        sfc_area * (local_flat - global_mean[:,np.newaxis,np.newaxis]),
-        axis=-1
+             L_f.value*(snow_ls + snow_conv))
+    if precip is None:
+        latent = None
+    else:
+        latent = L_v.value*(evap - precip)
+    return implied_transport(local, sfc_area=sfc_area, latent_source=latent)
+
+
+def aht_no_snow(swdn_toa, swup_toa, olr, swup_sfc, swdn_sfc, lwup_sfc,
+                lwdn_sfc, shflx, evap, sfc_area=None):
+    """Total atmospheric northward energy flux, without snow's latent heat."""
+    return implied_transport(
+        column_energy(swdn_toa, swup_toa, olr, swup_sfc, swdn_sfc, lwup_sfc,
+                      lwdn_sfc, shflx, evap),
+        sfc_area=sfc_area
     )
-    return np.ma.cumsum(zonal_integral, axis=-1)
+
+
+def tht(swdn_toa, swup_toa, olr, sfc_area=None):
+    """Total atmospheric plus oceanic northward energy flux."""
+    return implied_transport(toa_rad(swdn_toa, swup_toa, olr),
+                             sfc_area=sfc_area)
+
+
+def oht(swup_sfc, swdn_sfc, lwup_sfc, lwdn_sfc, shflx, evap, snow_ls,
+        snow_conv, sfc_area=None):
+    """Total oceanic northward energy flux, implied by the surface fluxes."""
+    local = (sfc_energy(swup_sfc, swdn_sfc, lwup_sfc, lwdn_sfc, shflx, evap) +
+             L_f.value*(snow_ls + snow_conv))
+    return implied_transport(-1*local, sfc_area=sfc_area)
 
 
 def gms_change_up_therm_low(temp, hght, sphum, level, lev_up=200., lev_dn=850.):
@@ -156,18 +180,9 @@ def gms_change_est2(T_cont, T_pert, q_cont, precip, level, lat,
 
 def hadley_bounds(lats, levs, vcomp):
     """Poleward extent of Hadley Cell."""
-    # Get meridional mass streamfunction at 500 hPa.
-    p_ind = np.where(levs == 500.)
-    sf = np.squeeze(msf(lats, levs, vcomp)[p_ind])
-    zero_cross = np.where(np.diff(np.sign(sf)))[0]
-    # Hadley Cell center is the zero crossing nearest the equator.
-    ind_cent = np.argmin(np.abs(zero_cross - lats.size/2))
-    # Hadley cell poleward boundaries are the zero crossings on either side.
-    ind = [zero_cross[ind_cent + i] for i in range(-1,2)]
-    # Linearly interpolate to true zero crossings.
-    return np.array([lats[ind[i]+1] - (lats[ind[i]+1] - lats[ind[i]]) /
-                (sf[ind[i]+1] - sf[ind[i]])*sf[ind[i]+1]
-                for i in range(3)])
+    # Zero crossings of the meridional mass streamfunction at 500 hPa.
+    return hadley_edges(mass_streamfunction(_plevel_vcomp(lats, levs, vcomp)),
+                        level=500.).values
 
 
 def had_bounds(strmfunc, return_max=False):
@@ -268,28 +283,20 @@ def prec_centroid(precip, lat_max=20.):
     """
     Calculate ITCZ location as the centroid of the area weighted zonal-mean P.
     """
-    # Interpolate zonal mean precip to a 0.1 degree latitude grid for 20S-20N
-    lat = precip[LAT_STR]
-    trop = np.where(np.abs(lat) < lat_max)
-    lat_interp = np.arange(-lat_max, lat_max + 0.01, 0.1)
-    prec = np.interp(lat_interp, lat[trop], precip[trop])
-    # Integrate area-weighted precip and find median.
-    prec_int = np.cumsum(prec*np.abs(np.cos(np.deg2rad(lat_interp))))
-    return lat_interp[np.argmin(np.abs(prec_int - 0.5*prec_int[-1]))]
+    return precip_centroid_lat(precip, lat_max=lat_max).values
 
 
 def precip_centroid(lats, precip, lat_max=20.):
     """
     Calculate ITCZ location as the centroid of the area weighted zonal-mean P.
+
+    For numpy arrays with latitude and longitude as the last two axes; see
+    `circ_metrics.precip_centroid_lat`.
     """
-    # Interpolate zonal mean P to 0.1 degree latitude grid over desired extent.
-    trop = np.where(np.abs(lats) < lat_max)
-    precip = precip.mean(axis=-1)[trop]
-    lat_interp = np.arange(-lat_max, lat_max + 0.01, 0.1)
-    prec = np.interp(lat_interp, lats[trop], precip)
-    # Integrate area-weighted precip and find median.
-    prec_int = np.cumsum(prec*np.abs(np.cos(np.deg2rad(lat_interp))), axis=0)
-    return lat_interp[np.argmin(np.abs(prec_int - 0.5*prec_int[-1]), axis=0)]
+    dims = (['dim_{}'.format(n) for n in range(np.ndim(precip) - 2)] +
+            [LAT_STR, LON_STR])
+    precip = xr.DataArray(precip, dims=dims, coords={LAT_STR: lats})
+    return precip_centroid_lat(precip, lat_max=lat_max).values
 
 
 def ang_mom(lats, ucomp):
@@ -298,64 +305,24 @@ def ang_mom(lats, ucomp):
     return (Omega*r_e*cos_lat + ucomp)*r_e*cos_lat
 
 
-def trop_height(level, T):
+def trop_height(level, T, units='hPa'):
     """
     Tropopause height of each column, based on Reichler et al 2003 GRL.
+
+    For numpy arrays with the vertical axis first.  The tropopause pressure
+    is returned in the same `units` as `level`, either 'hPa' or 'Pa'; see
+    `tropopause.tropopause_pressure`.
     """
-    # Get pressure and temperature data.
-    p = level[:,np.newaxis,np.newaxis]
-    # Compute half levels of pressure^kappa
-    kap = R_d / c_p
-    pkap_half = 0.5*(p[1:]**kap + p[:-1]**kap)
-    # Compute lapse rate at half-levels, assuming T linear in pressure^kappa.
-    Gamma = ((T[1:] - T[:-1])*(p[:-1]**kap + p[1:]**kap) /
-            ((T[1:] + T[:-1])*(p[:-1]**kap - p[1:]**kap)))*kap*grav/R_d
-    # Find levels of continuous Gamma where dT/dz > -2 K/km.
-    Gamma_crit = -2e-3
-    Gamma_good = np.where(Gamma > Gamma_crit, Gamma, 0)
-    # Check that avg dT/dz in 2 km above > -2 K/km.
-    Gam_slope = (Gamma[1:] - Gamma[:-1]) / (pkap_half[1:] - pkap_half[:-1])
-    # Take lowest level satisfying these criteria.
-    tp = 8
-    # Linearly interpolate to pressure level of critical Gamma value.
-    pkap_tp = (pkap_half[tp-1] + ((pkap_half[tp] - pkap_half[tp-1]) *
-               (Gamma_crit - Gamma[tp-1])/(Gamma[tp] - Gamma[tp-1])))
-    # Convert from pressure^kappa to pressure.
-    return pkap_tp**(1./kap)
+    if units not in ('hPa', 'Pa'):
+        raise ValueError("units must be 'hPa' or 'Pa': {}".format(units))
+    dims = [PLEVEL_STR] + ['dim_{}'.format(n) for n in range(1, np.ndim(T))]
+    level = xr.DataArray(level, dims=[PLEVEL_STR], attrs={'units': units})
+    temp = xr.DataArray(T, dims=dims, coords={PLEVEL_STR: level})
+    trop_p = tropopause_pressure(temp).values
+    return trop_p if units == 'Pa' else 1e-2*trop_p
 
 
 # Functions below this line haven't been converted to new argument format.
-def tht(variables, **kwargs):
-    """Total atmospheric plus oceanic northward energy flux."""
-    # Calculate energy balance at each grid point.
-    loc = -1*(variables[0] - variables[1] - variables[2])
-    # Calculate meridional heat transport.
-    len_dt = variables[0].shape[0]
-    sfc_area = grid_sfc_area(nc)
-    glb = np.average(loc.reshape(len_dt, -1),
-                     weights=sfc_area.ravel(), axis=1)
-    # AHT is meridionally integrated energy flux divergence.
-    flux_div = np.sum(sfc_area*(glb[:,np.newaxis,np.newaxis] - loc), axis=-1)
-    return np.cumsum(flux_div, axis=-1)
-
-
-def oht(variables, **kwargs):
-    """Total oceanic northward energy flux as residual of total minus atmospheric flux."""
-    # Calculate energy balance at each grid point.
-    loc = (variables[0] - variables[1] + variables[2] - variables[3] +   # sfc radiation
-           variables[4] +                                 # sfc SH flux
-           L_f*(variables[5] + variables[6]) + L_v*variables[7])   # column LH flux
-    # Calculate meridional heat transport.
-    len_dt = variables[0].shape[0]
-    sfc_area = grid_sfc_area(nc)
-    glb = np.average(loc.reshape(len_dt, -1),
-                     weights=sfc_area.ravel(), axis=1)
-    # AHT is meridionally integrated energy flux divergence.
-    flux_div = np.sum(sfc_area*(glb[:,np.newaxis,np.newaxis] - loc), axis=-1)
-    return np.cumsum(flux_div, axis=-1)
-    #return tht(variables, **kwargs) - aht(variables, **kwargs)
-
-
 def moc_flux(variables, **kwargs):
     """Mass weighted column integrated meridional flux by time and
     zonal mean flow."""
@@ -493,20 +460,3 @@ def total_gms(variables, **kwargs):
     """Total (mean plus eddy) gross moist stability."""
     return -(aht(variables[:-1], **kwargs) /
              msf_max([variables[-1]], **kwargs))/c_p
-
-
-def aht_no_snow(variables, **kwargs):
-    """Total atmospheric northward energy flux."""
-    # Calculate energy balance at each grid point.
-    loc = -1*(variables[0] - variables[1] - variables[2] +             # TOA radiation
-              variables[3] - variables[4] + variables[5] - variables[6] +   # sfc radiation
-              variables[7] +                                 # sfc SH flux
-              L_v*variables[-1])   # column LH flux
-    # Calculate meridional heat transport.
-    len_dt = variables[0].shape[0]
-    sfc_area = grid_sfc_area(nc)
-    glb = np.average(loc.reshape(len_dt, -1),
-                     weights=sfc_area.ravel(), axis=1)
-    # AHT is meridionally integrated energy flux divergence.
-    flux_div = np.sum(sfc_area*(glb[:,np.newaxis,np.newaxis] - loc), axis=-1)
-    return np.cumsum(flux_div, axis=-1)
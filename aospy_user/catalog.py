@@ -0,0 +1,170 @@
+"""Index from names to the Projs, Vars, and Regions of this package.
+
+`aospy.to_proj`, `aospy.to_var`, and `aospy.to_region` look up each name as
+an attribute of the module defining the object, so Vars can't be found by
+their alternate names (e.g. 'ta' or 'T' for temperature), and each attribute
+lookup on a `LazyModule` goes through its import machinery.  A `Catalog`
+instead indexes each object by its name and all of its alternate names once,
+in plain dicts.  Its `projs`, `variables` and `regions` attributes can be
+passed to the aospy lookup functions in place of the modules.  Models and
+Runs are already looked up by name in dicts of their Proj and Model.
+
+The index itself holds only the names of the module attributes, so a Catalog
+can be pickled (e.g. to be sent to worker processes) or saved to disk as
+JSON, without pickling the objects themselves.
+"""
+import importlib
+import json
+import logging
+
+import aospy
+
+from .lazy import LazyModule
+
+
+class NameIndex(object):
+    """Attribute-style access to the objects of a module by any of their names.
+
+    Parameters
+    ----------
+    module_name : str
+        Full name of the module defining the objects
+    names : dict
+        Maps each name to the name of the module attribute holding the object
+    """
+    def __init__(self, module_name, names):
+        self.module_name = module_name
+        self.names = names
+
+    @property
+    def module(self):
+        return importlib.import_module(self.module_name)
+
+    def __getattr__(self, name):
+        if name in ('module_name', 'names') or name.startswith('__'):
+            raise AttributeError(name)
+        try:
+            attr = self.names[name]
+        except KeyError:
+            raise AttributeError("No object named '{0}' in "
+                                 "{1}".format(name, self.module_name))
+        return getattr(self.module, attr)
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def __len__(self):
+        return len(self.names)
+
+
+def _index_module(module, cls, alt_names=False):
+    """Map each name of each instance of the class in the module to it.
+
+    The objects of a `LazyModule` are indexed by their declared names only,
+    without importing them.
+    """
+    if isinstance(module, LazyModule):
+        return dict((attr, attr) for attr in module.declared_attrs())
+    primary, alternate = {}, {}
+    for attr, obj in vars(module).items():
+        if not isinstance(obj, cls):
+            continue
+        primary.setdefault(obj.name, attr)
+        primary.setdefault(attr, attr)
+        if alt_names:
+            for name in getattr(obj, 'alt_names', None) or ():
+                if alternate.setdefault(name, attr) != attr:
+                    logging.warning("Alternate name '{0}' is shared by "
+                                    "'{1}' and '{2}'; using the "
+                                    "former".format(name, alternate[name],
+                                                    attr))
+    # Primary names take precedence over other objects' alternate names.
+    alternate.update(primary)
+    return alternate
+
+
+class Catalog(object):
+    """Index of the Projs, Vars, and Regions of this package by name.
+
+    Parameters
+    ----------
+    projs, variables, regions : NameIndex
+        Indexes of the Projs, the Vars (by name and alternate names), and the
+        Regions
+    """
+    def __init__(self, projs, variables, regions):
+        self.projs = projs
+        self.variables = variables
+        self.regions = regions
+
+    @classmethod
+    def build(cls, projs_module='aospy_user.projs',
+              vars_module='aospy_user.variables',
+              regions_module='aospy_user.regions'):
+        """Create the Catalog of the objects in the given modules."""
+        indexes = [
+            NameIndex(name, _index_module(importlib.import_module(name), cls_,
+                                          alt_names=alt_names))
+            for name, cls_, alt_names in [(projs_module, aospy.Proj, False),
+                                          (vars_module, aospy.Var, True),
+                                          (regions_module, aospy.Region,
+                                           False)]
+        ]
+        return cls(*indexes)
+
+    def to_proj(self, proj):
+        """As `aospy.to_proj`, using the Catalog's Projs."""
+        return aospy.to_proj(proj, self.projs)
+
+    def to_model(self, model, proj):
+        """As `aospy.to_model`, using the Catalog's Projs."""
+        return aospy.to_model(model, proj, self.projs)
+
+    def to_run(self, run, model, proj):
+        """As `aospy.to_run`, using the Catalog's Projs."""
+        return aospy.to_run(run, model, proj, self.projs)
+
+    def to_var(self, var):
+        """As `aospy.to_var`, but also accepting alternate names."""
+        return aospy.to_var(var, self.variables)
+
+    def to_region(self, region, proj=False):
+        """As `aospy.to_region`, using the Catalog's Regions."""
+        return aospy.to_region(region, self.regions, proj=proj)
+
+    def to_dict(self):
+        return dict((key, [index.module_name, index.names]) for key, index in
+                    [('projs', self.projs), ('variables', self.variables),
+                     ('regions', self.regions)])
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(*[NameIndex(*d[key])
+                     for key in ('projs', 'variables', 'regions')])
+
+    def save(self, path):
+        """Save the index to the given path as JSON."""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        """Load an index saved via `Catalog.save`."""
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+_CATALOGS = {}
+
+
+def get_catalog(projs_module='aospy_user.projs'):
+    """The Catalog of the given Projs and this package's Vars and Regions.
+
+    Built once per process for each module of Projs, and then reused.
+    """
+    try:
+        return _CATALOGS[projs_module]
+    except KeyError:
+        catalog = Catalog.build(projs_module=projs_module)
+        _CATALOGS[projs_module] = catalog
+        return catalog
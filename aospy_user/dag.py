@@ -0,0 +1,149 @@
+"""Batched execution of the Calcs in a CalcSuite, sharing their inputs.
+
+Calcs for the same run, date range, and input data types very often load
+many of the same input fields, e.g. `ps`, `temp`, `ucomp`, and `vcomp`.
+Rather than each Calc loading these independently, the Calcs are grouped
+into batches that share these attributes.  Within each batch, every input
+field is loaded from disk only once and is released as soon as the last
+Calc needing it is done.  Quantities derived from the inputs are still
+computed by each Calc, except those memoized in `calcs.memo`, which are
+shared within the batch.
+"""
+from collections import OrderedDict
+import logging
+import threading
+
+import aospy
+
+from .calcs import intermediate_cache
+
+
+def var_inputs(var):
+    """The Vars that the given Var is directly computed from."""
+    return tuple(v for v in (getattr(var, 'variables', None) or ())
+                 if isinstance(v, aospy.Var))
+
+
+def _loaded_input_names(var):
+    """Names of the Vars loaded from disk when computing the given Var.
+
+    A Var not computed from other Vars is loaded directly.  Pressure and
+    pressure thickness are computed by the Calc from the surface pressure, so
+    that is what gets loaded for them.
+    """
+    names = set(v.name for v in var_inputs(var)) or set([var.name])
+    if names & set(['p', 'dp']):
+        names.add('ps')
+    return names
+
+
+def batch_key(calc):
+    """Attributes that Calcs must share to share their inputs."""
+    return (calc.model_str, calc.run_str_full, calc.start_date,
+            calc.end_date, calc.intvl_in, calc.dtype_in_time,
+            calc.dtype_in_vert)
+
+
+def group_calcs_by_batch(calcs):
+    """Group the Calcs by the attributes determining their input data."""
+    batches = OrderedDict()
+    for calc in calcs:
+        batches.setdefault(batch_key(calc), []).append(calc)
+    return batches
+
+
+class SharedInputs(object):
+    """Loads each input field once, freeing it when no longer needed.
+
+    Parameters
+    ----------
+    n_consumers : dict
+        The number of Calcs still to be computed that need each input Var,
+        keyed by Var name.  Once this reaches zero via `release`, the loaded
+        data of that Var is dropped.
+    """
+    def __init__(self, n_consumers):
+        self.n_consumers = dict(n_consumers)
+        self._data = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def wrap(self, load_variable):
+        """Wrap a DataLoader's `load_variable` method to share its results."""
+        def load(var=None, start_date=None, end_date=None, time_offset=None,
+                 **data_attrs):
+            key = (var.name, start_date, end_date, time_offset,
+                   tuple(sorted(data_attrs.items())))
+            with self._key_lock(key):
+                try:
+                    return self._data[key]
+                except KeyError:
+                    pass
+                data = load_variable(var, start_date, end_date, time_offset,
+                                     **data_attrs)
+                if self.n_consumers.get(var.name, 0) > 1:
+                    self._data[key] = data
+                return data
+        return load
+
+    def release(self, var):
+        """Record that a Calc of the given Var has finished."""
+        with self._lock:
+            for name in _loaded_input_names(var):
+                self.n_consumers[name] = self.n_consumers.get(name, 1) - 1
+                if self.n_consumers[name] <= 0:
+                    for key in [k for k in self._data if k[0] == name]:
+                        logging.debug("Releasing input data: "
+                                      "{}".format(key))
+                        del self._data[key]
+
+
+def _wrap_data_loaders(calcs, shared):
+    """Point each Calc's DataLoader at the shared inputs."""
+    wrapped = []
+    for calc in calcs:
+        loader = calc.data_loader
+        if any(loader is w for w in wrapped):
+            continue
+        loader.load_variable = shared.wrap(loader.load_variable)
+        wrapped.append(loader)
+    return wrapped
+
+
+def _unwrap_data_loaders(loaders):
+    for loader in loaders:
+        del loader.load_variable
+
+
+def exec_calcs_dag(calcs, n_workers=None):
+    """Compute the Calcs batch by batch, sharing their loaded inputs.
+
+    Within each batch, all of the Calcs are computed concurrently in threads
+    of this process, via a `CalcScheduler`, loading each input field once.
+    Yields (calc, result, error) as each Calc completes.
+    """
+    # Import here to avoid a circular import.
+    from .main import CalcScheduler
+
+    scheduler = CalcScheduler(n_workers=n_workers, backend='thread')
+    for key, batch in group_calcs_by_batch(calcs).items():
+        logging.info("Computing batch of {0} Calcs sharing "
+                     "{1}".format(len(batch), key))
+        n_consumers = {}
+        for calc in batch:
+            for name in _loaded_input_names(calc.var):
+                n_consumers[name] = n_consumers.get(name, 0) + 1
+        shared = SharedInputs(n_consumers)
+        loaders = _wrap_data_loaders(batch, shared)
+        try:
+            for calc, result, error in scheduler.run(batch):
+                shared.release(calc.var)
+                yield calc, result, error
+        finally:
+            _unwrap_data_loaders(loaders)
+            # Nothing downstream of this batch needs its intermediates.
+            intermediate_cache.clear()
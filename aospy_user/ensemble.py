@@ -0,0 +1,223 @@
+"""Computation of a Var across an ensemble of runs stacked together.
+
+Suites spanning many runs of the same model, e.g. the SST-perturbation runs
+of AM2, otherwise compute each run's Calc entirely independently.  Here Calcs
+differing only in their run are grouped into ensembles.  Each member's input
+data is loaded as usual, but then the inputs of all members are stacked along
+a new `run` dimension and the Var's function is evaluated only once, on the
+stacked arrays.  Inputs that are identical across members and have no time
+dimension, e.g. the grid and other static fields, are not stacked but passed
+once as is.  Each member's slice of the result is then time-reduced and saved
+by that member's Calc exactly as if it had computed it itself.
+"""
+from collections import OrderedDict
+import logging
+
+from aospy.utils.times import monthly_mean_ts
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from . import TIME_STR
+
+RUN_STR = 'run'
+
+
+def _hashable(value):
+    """Hashable equivalent of a Calc attribute, for use in keys."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _hashable(val))
+                            for key, val in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(val) for val in value)
+    return getattr(value, 'name', value)
+
+
+def ensemble_key(calc):
+    """Attributes that Calcs must share to be computed as one ensemble."""
+    return (calc.name, calc.model_str, calc.start_date, calc.end_date,
+            calc.intvl_in, calc.dtype_in_time, calc.dtype_in_vert,
+            calc.intvl_out, calc.dtype_out_vert, calc.level,
+            _hashable(calc.region), _hashable(calc.time_offset))
+
+
+def group_calcs_by_ensemble(calcs, max_members=None):
+    """Group the Calcs that differ only in their run.
+
+    Parameters
+    ----------
+    calcs : sequence of aospy.Calc objects
+    max_members : int, optional
+        Maximum number of members per ensemble, to bound the memory needed
+        for the stacked data.  Larger groups are split.  Defaults to no
+        limit.
+    """
+    groups = OrderedDict()
+    for calc in calcs:
+        groups.setdefault(ensemble_key(calc), []).append(calc)
+    ensembles = []
+    for group in groups.values():
+        size = max_members or len(group)
+        ensembles.extend(group[i:i + size]
+                         for i in range(0, len(group), size))
+    return ensembles
+
+
+def _is_static(values):
+    """Whether the input is the same for all members and time-invariant."""
+    first = values[0]
+    if isinstance(first, xr.DataArray):
+        if TIME_STR in first.dims:
+            return False
+        return all(isinstance(val, xr.DataArray) and first.identical(val)
+                   for val in values[1:])
+    return all(np.array_equal(first, val) for val in values[1:])
+
+
+def stack_runs(values, run_names):
+    """Stack one input of every member along a new run dimension.
+
+    Static inputs are returned unstacked.  Raises ValueError if the input
+    can't be stacked, e.g. because the members' time coordinates differ.
+    """
+    if _is_static(values):
+        return values[0]
+    if not all(isinstance(val, xr.DataArray) for val in values):
+        raise ValueError("Can't stack non-array inputs that differ across "
+                         "runs: {}".format(values))
+    first = values[0]
+    for val in values[1:]:
+        if val.dims != first.dims:
+            raise ValueError("Inputs have different dimensions across runs: "
+                             "{0} vs. {1}".format(first.dims, val.dims))
+        for dim in first.dims:
+            if not np.array_equal(val[dim].values, first[dim].values):
+                raise ValueError("Inputs have different '{0}' coordinates "
+                                 "across runs".format(dim))
+    return xr.concat(values, dim=pd.Index(run_names, name=RUN_STR))
+
+
+def unstack_run(arr, n):
+    """The given member's slice of a result computed on stacked inputs."""
+    if not isinstance(arr, xr.DataArray) or RUN_STR not in arr.dims:
+        return arr
+    return arr.isel(**{RUN_STR: n}).reset_coords(RUN_STR, drop=True)
+
+
+def _to_monthly(arr):
+    try:
+        return monthly_mean_ts(arr)
+    except (KeyError, AttributeError):
+        return arr
+
+
+class _MemberFunction(object):
+    """Stands in for a member Calc's function, returning its precomputed slice.
+
+    A Calc evaluates its function either on its input data as loaded or on
+    the monthly means of it; the two are distinguished by whether the
+    arguments are the very objects that were loaded.
+    """
+    def __init__(self, data, full, monthly):
+        self.data = data
+        self.full = full
+        self.monthly = monthly
+
+    def __call__(self, *args):
+        if all(arg is val for arg, val in zip(args, self.data)):
+            return self.full()
+        return self.monthly()
+
+
+class _StackedResults(object):
+    """Lazily evaluates the function on the stacked inputs, at most once."""
+    def __init__(self, function, stacked):
+        self.function = function
+        self.stacked = stacked
+        self._full = None
+        self._monthly = None
+
+    def full(self):
+        if self._full is None:
+            self._full = self.function(*self.stacked)
+        return self._full
+
+    def monthly(self):
+        if self._monthly is None:
+            self._monthly = self.function(*[_to_monthly(arr)
+                                            for arr in self.stacked])
+        return self._monthly
+
+
+def _load_member_data(calc):
+    """Load the Calc's input data, as `Calc.compute` would."""
+    return calc._prep_data(calc._get_all_data(calc.start_date, calc.end_date),
+                           calc.var.func_input_dtype)
+
+
+def _compute_members(calcs, data, stacked):
+    """Compute each Calc using its slice of the stacked result."""
+    results = _StackedResults(calcs[0].function, stacked)
+    for n, (calc, member_data) in enumerate(zip(calcs, data)):
+        function = calc.function
+        calc.function = _MemberFunction(
+            member_data,
+            lambda n=n: unstack_run(results.full(), n),
+            lambda n=n: unstack_run(results.monthly(), n)
+        )
+        calc._get_all_data = lambda *args, **kwargs: member_data
+        try:
+            yield calc, calc.compute(), None
+        except (RuntimeError, IOError) as e:
+            logging.warn(repr(e))
+            yield calc, None, e
+        finally:
+            calc.function = function
+            del calc._get_all_data
+
+
+def _compute_individually(calcs):
+    # Import here to avoid a circular import.
+    from .main import _compute_calc
+    for calc in calcs:
+        yield _compute_calc(calc)
+
+
+def exec_calcs_ensemble(calcs, max_members=None):
+    """Compute the Calcs, stacking those differing only in their run.
+
+    Calcs whose inputs can't be stacked, or whose Var's function takes numpy
+    arrays rather than DataArrays, are computed individually.  Yields (calc,
+    result, error) as each Calc completes.
+    """
+    for ensemble in group_calcs_by_ensemble(calcs, max_members=max_members):
+        stackable = (len(ensemble) > 1 and
+                     ensemble[0].var.func_input_dtype in (None, 'DataArray'))
+        if not stackable:
+            for output in _compute_individually(ensemble):
+                yield output
+            continue
+        logging.info("Computing {0} as an ensemble of {1} runs".format(
+            ensemble[0].name, len(ensemble)))
+        members, data = [], []
+        for calc in ensemble:
+            try:
+                data.append(_load_member_data(calc))
+            except (RuntimeError, IOError) as e:
+                logging.warn(repr(e))
+                yield calc, None, e
+            else:
+                members.append(calc)
+        if not members:
+            continue
+        try:
+            run_names = [calc.run_str_full for calc in members]
+            stacked = [stack_runs(values, run_names) for values in zip(*data)]
+        except ValueError as e:
+            logging.info("Can't stack the runs; computing them individually: "
+                         "{}".format(e))
+            for output in _compute_individually(members):
+                yield output
+            continue
+        for output in _compute_members(members, data, stacked):
+            yield output
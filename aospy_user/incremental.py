@@ -0,0 +1,226 @@
+"""Extending a Calc's date range by computing only the newly added years.
+
+All of the time reductions aospy performs ('ts', 'av', 'std', and their
+regional counterparts) are applied to the timeseries of yearly averages
+that `Calc._make_full_mean_eddy_ts` creates, and each year's average depends
+only on that year's data.  So the yearly timeseries themselves are the
+mergeable partial aggregates: they are saved alongside the Calc's outputs,
+and when the date range is later extended, only the years not already saved
+are read from disk and computed.  They are then merged with the saved years,
+and the time reductions are applied to the merged timeseries exactly as in
+`Calc.compute`.  Since the same yearly values are reduced in the same order,
+the outputs are identical to those of computing from scratch.
+
+This requires that each year's values of the Var depend only on that year's
+data, which isn't the case for e.g. time derivatives using neighboring
+timesteps across years.  So only Vars read directly from disk, or computed
+with functions decorated with `by_year_chunks` (which asserts exactly this),
+are eligible.  It also requires date ranges spanning whole calendar years,
+within the range of dates supported by numpy, and it excludes Calcs with
+regional outputs of Vars on model-native vertical levels, since those carry
+the pressure of each level, which is read over the full date range.  Other
+Calcs are simply computed in full.
+"""
+import copy
+import datetime
+import hashlib
+import logging
+import os
+
+from aospy.internal_names import ETA_STR, YEAR_STR
+from aospy.utils.io import data_in_label, data_out_label, ens_label
+from aospy.utils.times import numpy_datetime_range_workaround
+import pandas as pd
+import xarray as xr
+
+from .store import _var_signature
+
+_TS_NAMES = ('full', 'monthly', 'eddy')
+
+
+def partials_path(calc):
+    """Path to the Calc's saved yearly timeseries, for any date range."""
+    out_lbl = data_out_label(calc.intvl_out, 'yearly_partials',
+                             dtype_vert=calc.dtype_out_vert)
+    in_lbl = data_in_label(calc.intvl_in, calc.dtype_in_time,
+                           calc.dtype_in_vert)
+    name = '.'.join([calc.name, out_lbl, in_lbl, calc.model_str,
+                     calc.run_str, ens_label(calc.ens_mem), 'nc'])
+    return os.path.join(calc.dir_out, name.replace('..', '.'))
+
+
+def _signature(calc):
+    """Hash of the Var's definition, to detect stale saved timeseries."""
+    return hashlib.sha1(repr(_var_signature(calc.var)).encode(
+        'utf-8')).hexdigest()
+
+
+def _has_regional_pressure(calc):
+    """Whether the Calc's regional outputs include the levels' pressure.
+
+    `region_calcs` reads the pressure over the Calc's whole date range and
+    averages it within each year using the Calc's `dt`, neither of which
+    the saved yearly timeseries retain.
+    """
+    return (calc.def_vert and calc.dtype_in_vert == ETA_STR and
+            calc.dtype_out_vert is False and
+            any('reg' in dout.split('.') for dout in calc.dtype_out_time))
+
+
+def _is_year_local(var):
+    """Whether the Var's values in each year depend only on that year's data.
+
+    True of Vars read directly from disk, and of those computed with
+    functions decorated with `by_year_chunks`.
+    """
+    return var.variables is None or getattr(var.func, 'year_local', False)
+
+
+def is_incremental(calc):
+    """Whether the Calc's outputs can be computed incrementally in years."""
+    return (calc.def_time and 'av' not in calc.dtype_in_time and
+            _is_year_local(calc.var) and
+            (calc.start_date.month, calc.start_date.day) == (1, 1) and
+            (calc.end_date.month, calc.end_date.day) == (12, 31) and
+            calc.start_date >= pd.Timestamp.min and
+            calc.end_date <= pd.Timestamp.max and
+            not _has_regional_pressure(calc))
+
+
+def _needed_ts(calc):
+    """Names of the yearly timeseries the Calc's time reductions use.
+
+    Mirrors the logic of `Calc._make_full_mean_eddy_ts`.
+    """
+    bool_monthly = (['monthly_from' in calc.dtype_in_time] +
+                    ['time-mean' in dout for dout in calc.dtype_out_time])
+    bool_eddy = ['eddy' in dout for dout in calc.dtype_out_time]
+    needed = []
+    if not all(bool_monthly):
+        needed.append('full')
+    if any(bool_eddy) or any(bool_monthly):
+        needed.append('monthly')
+    if any(bool_eddy):
+        needed.append('eddy')
+    return needed
+
+
+def _load_partials(calc):
+    """The saved yearly timeseries of the Calc, or None if unusable."""
+    try:
+        with xr.open_dataset(partials_path(calc)) as ds:
+            ds = ds.load()
+    except (IOError, OSError, RuntimeError, ValueError):
+        return None
+    if ds.attrs.get('signature') != _signature(calc):
+        logging.info("Saved yearly timeseries for {} are for a different "
+                     "Var definition; ignoring them".format(calc))
+        return None
+    if sorted(ds.data_vars) != sorted(_needed_ts(calc)):
+        logging.info("Saved yearly timeseries for {} are for different "
+                     "time reductions; ignoring them".format(calc))
+        return None
+    return ds
+
+
+def _save_partials(calc, partials):
+    ds = xr.Dataset(dict((name, ts) for name, ts in partials.items()
+                         if ts is not False))
+    ds.attrs['signature'] = _signature(calc)
+    path = partials_path(calc)
+    if not os.path.isdir(calc.dir_out):
+        os.makedirs(calc.dir_out)
+    ds.to_netcdf(path)
+
+
+def _contiguous_blocks(years):
+    """Split the sorted years into runs of consecutive years."""
+    blocks = []
+    for year in years:
+        if blocks and year == blocks[-1][-1] + 1:
+            blocks[-1].append(year)
+        else:
+            blocks.append([year])
+    return blocks
+
+
+def _calc_for_years(calc, first, last):
+    """Copy of the Calc spanning only the given years."""
+    sub = copy.copy(calc)
+    for attr in ('dt', '_ps_data'):
+        sub.__dict__.pop(attr, None)
+    sub.start_date = datetime.datetime(first, 1, 1)
+    sub.end_date = datetime.datetime(last, 12, 31)
+    sub.start_date_xarray = numpy_datetime_range_workaround(sub.start_date)
+    sub.end_date_xarray = (sub.start_date_xarray +
+                           (sub.end_date - sub.start_date))
+    return sub
+
+
+def _yearly_ts(calc):
+    """Compute the Calc's full, monthly, and eddy yearly timeseries."""
+    data = calc._prep_data(calc._get_all_data(calc.start_date, calc.end_date),
+                           calc.var.func_input_dtype)
+    return dict(zip(_TS_NAMES, calc._make_full_mean_eddy_ts(data)))
+
+
+def _merge(saved, new):
+    """Combine the saved and newly computed yearly timeseries."""
+    merged = {}
+    for name in _TS_NAMES:
+        parts = [part[name] for part in [saved] + new
+                 if part is not None and name in part and
+                 part[name] is not False]
+        if not parts:
+            merged[name] = False
+            continue
+        ts = xr.concat(parts, dim=YEAR_STR) if len(parts) > 1 else parts[0]
+        merged[name] = ts.isel(**{YEAR_STR: ts[YEAR_STR].argsort().values})
+    return merged
+
+
+def compute_incremental(calc, save_files=True, save_tar_files=True):
+    """Compute the Calc, reusing the yearly timeseries already saved.
+
+    Calcs that can't be computed incrementally are computed in full via
+    `Calc.compute`.
+    """
+    if not is_incremental(calc):
+        return calc.compute(save_files=save_files,
+                            save_tar_files=save_tar_files)
+    years = list(range(calc.start_date.year, calc.end_date.year + 1))
+    saved = _load_partials(calc)
+    if saved is not None:
+        saved_years = set(int(y) for y in saved[YEAR_STR].values)
+        saved = saved.sel(**{YEAR_STR: [y for y in years
+                                        if y in saved_years]})
+        if not saved[YEAR_STR].size:
+            saved = None
+    else:
+        saved_years = set()
+    new_years = [y for y in years if y not in saved_years]
+    new = []
+    for block in _contiguous_blocks(new_years):
+        logging.info("Computing {0} for years {1}-{2}".format(
+            calc.name, block[0], block[-1]))
+        new.append(_yearly_ts(_calc_for_years(calc, block[0], block[-1])))
+    if saved is not None:
+        logging.info("Reusing saved yearly timeseries of {0} for {1} "
+                     "years".format(calc.name, saved[YEAR_STR].size))
+    merged = _merge(saved, new)
+    reduced = calc._apply_all_time_reductions(merged['full'],
+                                              merged['monthly'],
+                                              merged['eddy'])
+    for dtype_time, data in reduced.items():
+        calc.save(data, dtype_time, dtype_out_vert=calc.dtype_out_vert,
+                  save_files=save_files, save_tar_files=save_tar_files)
+    if new:
+        # Keep any saved years outside of the current date range.
+        previous = _load_partials(calc)
+        if previous is not None:
+            other_years = [y for y in previous[YEAR_STR].values
+                           if y not in years]
+            if other_years:
+                merged = _merge(previous.sel(**{YEAR_STR: other_years}),
+                                [merged])
+        _save_partials(calc, merged)
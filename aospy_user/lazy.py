@@ -0,0 +1,80 @@
+"""Modules whose submodules and objects are imported on first access.
+
+Importing all of the projects, models, runs, and Vars of this package, and
+the modules they depend on, takes several seconds, which every worker process
+and every script would otherwise pay even if it uses only a few of them.
+Modules converted via `lazy_module` instead declare which submodules they
+contain and which objects each defines, and import each submodule only when
+it or one of its objects is first accessed.
+"""
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Module importing its declared submodules and objects on first access.
+
+    Parameters
+    ----------
+    name : str
+        The module's full name
+    submodules : sequence of str
+        Names of submodules to import on first access
+    attrs : dict
+        Maps the name of each submodule to the names of the objects defined
+        in it that are to be accessible as attributes of this module
+    """
+    def __init__(self, name, submodules=(), attrs=None):
+        super(LazyModule, self).__init__(name)
+        self._lazy_submodules = set(submodules)
+        self._lazy_attrs = {}
+        for submodule, names in (attrs or {}).items():
+            self._lazy_submodules.add(submodule)
+            for attr in names:
+                self._lazy_attrs[attr] = submodule
+
+    def _import_submodule(self, submodule):
+        module = importlib.import_module('.' + submodule, self.__name__)
+        # Bind all of its declared objects at once, overriding the binding of
+        # the submodule itself if one of them shares its name.
+        for attr, source in self._lazy_attrs.items():
+            if source == submodule:
+                setattr(self, attr, getattr(module, attr))
+        return module
+
+    def __getattr__(self, name):
+        if name.startswith('_lazy_'):
+            raise AttributeError(name)
+        if name in self._lazy_attrs:
+            self._import_submodule(self._lazy_attrs[name])
+            return self.__dict__[name]
+        if name in self._lazy_submodules:
+            return self._import_submodule(name)
+        raise AttributeError("module '{0}' has no attribute "
+                             "'{1}'".format(self.__name__, name))
+
+    def declared_attrs(self):
+        """Names of the declared objects, without importing any of them."""
+        return sorted(self._lazy_attrs)
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | self._lazy_submodules |
+                      set(self._lazy_attrs))
+
+
+def lazy_module(name, submodules=(), attrs=None):
+    """Replace the named, already imported module with a `LazyModule`.
+
+    Meant to be called at the end of a package's `__init__`, with `__name__`.
+    The existing module's attributes are carried over.
+    """
+    module = sys.modules[name]
+    lazy = LazyModule(name, submodules=submodules, attrs=attrs)
+    lazy.__dict__.update((key, value) for key, value in module.__dict__.items()
+                         if key not in ('__class__', '__dict__'))
+    # Keep the original module alive, since under Python 2 its globals,
+    # which its functions still refer to, are cleared once it is collected.
+    lazy._lazy_original = module
+    sys.modules[name] = lazy
+    return lazy
@@ -7,8 +7,132 @@ import logging
 import aospy
 import colorama
 import multiprocess
+import multiprocess.pool
 
-from . import projs, variables
+from . import dag, ensemble, projs
+from .catalog import get_catalog
+from .calcs.vertcoord import share_hybrid_coord
+from .incremental import compute_incremental
+from .manifest import DataManifest
+from .region_index import index_regions
+from .store import ResultStore
+
+
+# Approximate number of input timesteps per year for each input interval.
+_TIMESTEPS_PER_YEAR = {'annual': 1, 'seasonal': 4, 'monthly': 12,
+                       'daily': 365, '6hr': 1460, '3hr': 2920}
+
+
+def estimate_calc_cost(calc):
+    """Rough relative cost of computing the given Calc.
+
+    Only meaningful relative to other Calcs: the product of the number of
+    years, input timesteps per year, input variables, and (for 3D variables)
+    an assumed number of vertical levels.
+    """
+    try:
+        n_years = calc.end_date.year - calc.start_date.year + 1
+    except AttributeError:
+        n_years = 1
+    n_per_year = _TIMESTEPS_PER_YEAR.get(getattr(calc, 'intvl_in', None), 12)
+    n_vars = len(getattr(calc, 'variables', ())) or 1
+    n_levs = 30 if getattr(calc, 'def_vert', False) else 1
+    return n_years*n_per_year*n_vars*n_levs
+
+
+def _compute_calc(calc):
+    """Compute the Calc, isolating the same errors as the serial path does.
+
+    Returns the (possibly copied) Calc, the result, and the caught exception
+    (or None if the computation succeeded).
+    """
+    try:
+        return calc, calc.compute(), None
+    except (RuntimeError, IOError) as e:
+        logging.warn(repr(e))
+        return calc, None, e
+
+
+def _compute_calc_incremental(calc):
+    """As `_compute_calc`, but only computing years not already saved."""
+    try:
+        return calc, compute_incremental(calc), None
+    except (RuntimeError, IOError) as e:
+        logging.warn(repr(e))
+        return calc, None, e
+
+
+class CalcScheduler(object):
+    """Executes Calcs in parallel, yielding each result as it completes.
+
+    Parameters
+    ----------
+    n_workers : int, optional
+        Number of worker processes or threads.  Defaults to the number of
+        CPUs.
+    backend : {'process', 'thread'}
+        Whether to compute in separate processes or in threads of this one.
+    chunksize : int
+        Number of Calcs handed to a worker at a time.
+    order_by_cost : bool
+        If True, start the Calcs with the largest estimated cost first, so
+        that the longest tasks don't straggle at the end.
+    incremental : bool
+        If True, compute each Calc via `incremental.compute_incremental`.
+    """
+    def __init__(self, n_workers=None, backend='process', chunksize=1,
+                 order_by_cost=True, incremental=False):
+        if backend not in ('process', 'thread'):
+            raise ValueError("backend must be 'process' or 'thread': "
+                             "'{}'".format(backend))
+        self.n_workers = n_workers
+        self.backend = backend
+        self.chunksize = chunksize
+        self.order_by_cost = order_by_cost
+        self.incremental = incremental
+
+    def _make_pool(self):
+        if self.backend == 'thread':
+            return multiprocess.pool.ThreadPool(self.n_workers)
+        return multiprocess.Pool(self.n_workers)
+
+    def run(self, calcs):
+        """Compute the Calcs, yielding (calc, result, error) as each finishes.
+
+        RuntimeErrors and IOErrors raised by a Calc are logged and returned
+        as its error, without affecting the others.  Any other exception is
+        re-raised, as in the serial path.
+        """
+        calcs = list(calcs)
+        if self.order_by_cost:
+            calcs = sorted(calcs, key=estimate_calc_cost, reverse=True)
+        n_calcs = len(calcs)
+        pool = self._make_pool()
+        try:
+            compute = (_compute_calc_incremental if self.incremental
+                       else _compute_calc)
+            results = pool.imap_unordered(compute, calcs,
+                                          chunksize=self.chunksize)
+            for n, (calc, result, error) in enumerate(results, 1):
+                status = 'Failed' if error is not None else 'Finished'
+                logging.info('{0} Calc {1} of {2}: {3}'.format(
+                    status, n, n_calcs, calc))
+                yield calc, result, error
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+
+def _successful_results(outputs, store=None):
+    """Results of the Calcs that succeeded, recording them in the store."""
+    results = []
+    for calc, result, error in outputs:
+        if error is None:
+            if store is not None:
+                store.record(calc)
+            results.append(result)
+    return results
 
 
 class ObjectsForCalc(tuple):
@@ -31,10 +155,10 @@ class MainParams(object):
 class MainParamsParser(object):
     """Interface between specified parameters and resulting CalcSuite."""
     def str_to_aospy_obj(self, proj, model, var, region):
-        proj_out = aospy.to_proj(proj, self.projs)
-        model_out = aospy.to_model(model, proj_out, self.projs)
-        var_out = aospy.to_var(var, variables)
-        region_out = aospy.to_region(region, self.projs, proj=proj_out)
+        proj_out = self.catalog.to_proj(proj)
+        model_out = self.catalog.to_model(model, proj_out)
+        var_out = self.catalog.to_var(var)
+        region_out = self.catalog.to_region(region, proj=proj_out)
         return proj_out, model_out, var_out, region_out
 
     def aospy_obj_to_iterable(self, proj, model, var, region):
@@ -50,7 +174,7 @@ class MainParamsParser(object):
         for run in runs:
             for model in models:
                 try:
-                    run_obj = aospy.to_run(run, model, proj, self.projs)
+                    run_obj = self.catalog.to_run(run, model, proj)
                     if isinstance(run, ObjectsForCalc):
                         run_objs.append(ObjectsForCalc(run_obj))
                     else:
@@ -72,6 +196,7 @@ class MainParamsParser(object):
         """Turn all inputs into aospy-ready objects."""
         self.__dict__ = vars(main_params)
         self.projs = projs
+        self.catalog = get_catalog(projs.__name__)
         self.proj, self.model, self.var, self.region = (
             self.str_to_aospy_iterable(main_params.proj, main_params.model,
                                        main_params.var, main_params.region)
@@ -148,8 +273,21 @@ class CalcSuite(object):
             param_combos.append(dict(zip(attr_names, permutation)))
         return param_combos
 
-    def create_calcs(self, param_combos, exec_calcs=False, print_table=False):
-        """Iterate through given parameter combos, creating needed Calcs."""
+    def create_calcs(self, param_combos, exec_calcs=False, print_table=False,
+                     store=None, incremental=False, use_region_index=False,
+                     manifest=None):
+        """Iterate through given parameter combos, creating needed Calcs.
+
+        If a `ResultStore` is given, Calcs whose outputs it records as
+        current aren't recomputed, and those computed are recorded in it.
+        If `incremental` is True, only the years not already saved are
+        computed; see `incremental.compute_incremental`.  If
+        `use_region_index` is True, each Calc's regional reductions are
+        performed for all of its regions at once; see `region_index`.  If a
+        `DataManifest` is given, Calcs whose input data doesn't exist are
+        logged and skipped rather than computed.  Calcs on model-native
+        levels share each model's `calcs.vertcoord.HybridCoord`.
+        """
         calcs = []
         for params in param_combos:
             try:
@@ -157,15 +295,29 @@ class CalcSuite(object):
             except:
                 raise
             calc = aospy.Calc(ci)
+            if manifest is not None and not manifest.prune([calc]):
+                continue
+            share_hybrid_coord(calc)
+            if use_region_index:
+                index_regions(calc)
             if exec_calcs:
                 try:
-                    calc.compute()
+                    if store is not None and store.is_current(calc):
+                        calcs.append(calc)
+                        continue
+                    if incremental:
+                        compute_incremental(calc)
+                    else:
+                        calc.compute()
                 except RuntimeError as e:
                     logging.warn(repr(e))
                 except IOError as e:
                     logging.warn(repr(e))
                 except:
                     raise
+                else:
+                    if store is not None:
+                        store.record(calc)
                 if print_table:
                     print("{}".format(calc.load(
                         'reg.av', dtype_out_vert=False,
@@ -174,17 +326,47 @@ class CalcSuite(object):
             calcs.append(calc)
         return calcs
 
-    def exec_calcs(self, calcs):
+    def exec_calcs(self, calcs, store=None, incremental=False):
         out = []
+        if store is not None:
+            calcs = store.misses(calcs)
         for calc in calcs:
             try:
-                o = calc.compute()
+                if incremental:
+                    o = compute_incremental(calc)
+                else:
+                    o = calc.compute()
             except RuntimeError as e:
                 logging.warn(repr(e))
             else:
+                if store is not None:
+                    store.record(calc)
                 out.append(o)
         return out
 
+    def exec_calcs_dag(self, calcs, n_workers=None, store=None):
+        """Compute the Calcs in batches sharing their inputs.
+
+        See `dag.exec_calcs_dag`.
+        """
+        if store is not None:
+            calcs = store.misses(calcs)
+        return _successful_results(
+            dag.exec_calcs_dag(calcs, n_workers=n_workers), store
+        )
+
+    def exec_calcs_ensemble(self, calcs, max_members=None, store=None):
+        """Compute the Calcs, stacking those differing only in their run.
+
+        See `ensemble.exec_calcs_ensemble`.
+        """
+        if store is not None:
+            calcs = store.misses(calcs)
+        return _successful_results(
+            ensemble.exec_calcs_ensemble(calcs, max_members=max_members),
+            store
+        )
+
     def print_results(self, calcs):
         for calc in calcs:
             for region in calc.region.values():
@@ -194,8 +376,32 @@ class CalcSuite(object):
 
 
 def main(main_params, exec_calcs=True, print_table=True, prompt_verify=True,
-         parallelize=False):
-    """Main script for interfacing with aospy."""
+         parallelize=False, n_workers=None, backend='process',
+         share_inputs=False, stack_runs=False, max_members=None,
+         store_direc=None, incremental=False, use_region_index=False,
+         check_data=False, manifest_cache=None):
+    """Main script for interfacing with aospy.
+
+    If `parallelize` is True, the Calcs are computed by a `CalcScheduler`
+    with the given number of workers and backend ('process' or 'thread').
+    If `share_inputs` is True, they are instead computed in batches that load
+    each input only once, using threads; see `dag.exec_calcs_dag`.  If
+    `stack_runs` is True, Calcs differing only in their run are computed
+    together, in ensembles of at most `max_members` runs; see
+    `ensemble.exec_calcs_ensemble`.
+
+    If `store_direc` is given, a `ResultStore` there records each completed
+    Calc, and Calcs recorded in it whose outputs are current are skipped.
+    If `incremental` is True, serially or in parallel only the years not
+    already saved for each Calc are computed; see
+    `incremental.compute_incremental`.  If `use_region_index` is True,
+    regional averages are computed for all regions at once; see
+    `region_index.RegionIndex`.
+
+    If `check_data` is True, Calcs whose input files don't exist are skipped
+    up front, according to a `DataManifest` of each Run's data directory,
+    cached in the file `manifest_cache` if given.
+    """
     # Instantiate objects and load default/all models, runs, and regions.
     cs = CalcSuite(MainParamsParser(main_params, projs))
     cs.print_params()
@@ -206,12 +412,35 @@ def main(main_params, exec_calcs=True, print_table=True, prompt_verify=True,
             logging.warn(repr(e))
             return
     param_combos = cs.create_params_all_calcs()
+    store = ResultStore(store_direc) if store_direc is not None else None
+    manifest = DataManifest(manifest_cache) if check_data else None
+    if stack_runs and exec_calcs:
+        calcs = cs.create_calcs(param_combos, exec_calcs=False,
+                                print_table=print_table,
+                                use_region_index=use_region_index,
+                                manifest=manifest)
+        return cs.exec_calcs_ensemble(calcs, max_members=max_members,
+                                      store=store)
+    if share_inputs and exec_calcs:
+        calcs = cs.create_calcs(param_combos, exec_calcs=False,
+                                print_table=print_table,
+                                use_region_index=use_region_index,
+                                manifest=manifest)
+        return cs.exec_calcs_dag(calcs, n_workers=n_workers, store=store)
     if parallelize and exec_calcs:
         calcs = cs.create_calcs(param_combos, exec_calcs=False,
-                                print_table=print_table)
-        p = multiprocess.Pool()
-        return p.map(lambda calc: calc.compute(), calcs)
+                                print_table=print_table,
+                                use_region_index=use_region_index,
+                                manifest=manifest)
+        if store is not None:
+            calcs = store.misses(calcs)
+        scheduler = CalcScheduler(n_workers=n_workers, backend=backend,
+                                  incremental=incremental)
+        return _successful_results(scheduler.run(calcs), store)
     else:
         calcs = cs.create_calcs(param_combos, exec_calcs=exec_calcs,
-                                print_table=print_table)
+                                print_table=print_table, store=store,
+                                incremental=incremental,
+                                use_region_index=use_region_index,
+                                manifest=manifest)
     return calcs
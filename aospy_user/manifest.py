@@ -0,0 +1,169 @@
+"""Manifest of the data available on disk, to skip Calcs lacking input data.
+
+Without it, a missing input file is only discovered when the Calc that needs
+it raises an IOError partway through being computed.  A `DataManifest`
+instead walks each Run's data directory once, records every file in it, and
+caches the listing on disk.  Whether each Calc's input files exist is then
+determined from the listing, before anything is computed, using the same
+GFDL post-processing naming conventions that `aospy.GFDLDataLoader` uses to
+find them.
+
+Calcs whose Runs use other kinds of DataLoader are assumed to be feasible.
+"""
+import json
+import logging
+import os
+import re
+import time
+
+from aospy.data_loader import GFDLDataLoader
+from aospy.internal_names import (BK_STR, ETA_STR, LAT_STR, LON_STR, PK_STR,
+                                  PLEVEL_STR, SFC_AREA_STR, TIME_STR)
+
+from .store import _loaded_vars
+
+# Vars taken from the Model rather than loaded from data files.
+_GRID_VARS = (LAT_STR, LON_STR, TIME_STR, PLEVEL_STR, PK_STR, BK_STR,
+              SFC_AREA_STR)
+
+# Timeseries files, e.g. 'atmos.198301-201212.precip.nc' or
+# 'atmos.1983.precip.nc'.
+_TS_FILE = re.compile(r'^(?P<domain>[^.]+)\.(?P<start>\d{4})\d*'
+                      r'(-(?P<end>\d{4})\d*)?\.(?P<var>[^.]+)\.nc$')
+
+
+class DataManifest(object):
+    """Listing of the files under each data directory, scanned only once.
+
+    Parameters
+    ----------
+    cache_path : str, optional
+        JSON file in which to cache the listings between sessions.  If None,
+        they are kept in memory only.
+    max_age : float, optional
+        Age in seconds beyond which a cached listing is rescanned.  If None,
+        cached listings never expire; use `refresh` after adding data.
+    """
+    def __init__(self, cache_path=None, max_age=24*3600.):
+        self.cache_path = cache_path
+        self.max_age = max_age
+        self._listings = {}
+        self._file_sets = {}
+        if cache_path is not None and os.path.isfile(cache_path):
+            try:
+                with open(cache_path) as f:
+                    self._listings = json.load(f)
+            except (IOError, OSError, ValueError) as e:
+                logging.warning("Couldn't read data manifest cache: "
+                                "{}".format(repr(e)))
+
+    def _save(self):
+        if self.cache_path is None:
+            return
+        try:
+            with open(self.cache_path, 'w') as f:
+                json.dump(self._listings, f)
+        except (IOError, OSError) as e:
+            logging.warning("Couldn't save data manifest cache: "
+                            "{}".format(repr(e)))
+
+    def _is_expired(self, listing):
+        return (self.max_age is not None and
+                time.time() - listing['scanned'] > self.max_age)
+
+    def refresh(self, direc):
+        """Rescan the directory, replacing any cached listing of it."""
+        direc = os.path.abspath(direc)
+        files = []
+        for root, _, names in os.walk(direc):
+            rel_root = os.path.relpath(root, direc)
+            files.extend(os.path.normpath(os.path.join(rel_root, name))
+                         for name in names)
+        self._listings[direc] = {'scanned': time.time(),
+                                 'files': sorted(files)}
+        self._file_sets.pop(direc, None)
+        self._save()
+        return self._listings[direc]
+
+    def files(self, direc):
+        """Paths, relative to the directory, of all of the files under it."""
+        direc = os.path.abspath(direc)
+        listing = self._listings.get(direc)
+        if listing is None or self._is_expired(listing):
+            listing = self.refresh(direc)
+        if direc not in self._file_sets:
+            self._file_sets[direc] = frozenset(listing['files'])
+        return self._file_sets[direc]
+
+    def summary(self, direc):
+        """The timeseries available under the directory.
+
+        Returns a dict mapping each (domain, data type, input interval,
+        variable name) to a sorted list of the (first, last) years spanned by
+        each of its files.
+        """
+        available = {}
+        for path in self.files(direc):
+            parts = path.split(os.sep)
+            match = _TS_FILE.match(parts[-1])
+            # Timeseries are in <domain>/<type>/<interval>/<duration>/.
+            if (match is None or len(parts) != 5 or
+                    parts[0] != match.group('domain')):
+                continue
+            start = int(match.group('start'))
+            end = int(match.group('end') or start)
+            key = (parts[0], parts[1], parts[2], match.group('var'))
+            available.setdefault(key, []).append((start, end))
+        return dict((key, sorted(spans)) for key, spans in available.items())
+
+    def _missing(self, direc, paths):
+        files = self.files(direc)
+        return [path for path in paths
+                if os.path.normpath(os.path.relpath(path, direc)) not in files]
+
+    def missing_files(self, calc):
+        """Input files of the Calc that don't exist.
+
+        Returns None if they can't be determined, i.e. if the Calc's Run
+        doesn't use a `GFDLDataLoader`.  If none of a Var's names has all of
+        its files, those missing for the name with the fewest are reported.
+        """
+        loader = getattr(calc, 'data_loader', None)
+        if not isinstance(loader, GFDLDataLoader):
+            return None
+        direc = os.path.abspath(loader.data_direc)
+        missing = []
+        for var in _loaded_vars(calc.var):
+            if var.name in ('p', 'dp'):
+                if calc.dtype_in_vert != ETA_STR:
+                    continue
+                var = calc.ps
+            if var.name in _GRID_VARS:
+                continue
+            missing.extend(min(
+                (self._missing(direc, loader._input_data_paths_gfdl(
+                    name, calc.start_date, calc.end_date,
+                    **calc.data_loader_attrs
+                )) for name in var.names), key=len
+            ))
+        return missing
+
+    def is_feasible(self, calc):
+        """Whether all of the Calc's input files exist, or can't be known."""
+        return not self.missing_files(calc)
+
+    def prune(self, calcs):
+        """The Calcs whose input files exist, logging those that are pruned.
+
+        Calcs whose input files can't be determined are kept.
+        """
+        feasible = []
+        for calc in calcs:
+            missing = self.missing_files(calc)
+            if missing:
+                logging.warning("Skipping {0}: {1} input file(s) missing, "
+                                "e.g. {2}".format(calc, len(missing),
+                                                  missing[0]))
+            else:
+                feasible.append(calc)
+        return feasible
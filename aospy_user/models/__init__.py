@@ -1,7 +1,13 @@
-"""Collection of Spencer Hill's aospy.Model objects."""
-from .gfdl_models import (
-    am2, am3, hiram, hiram_c48, sm2, am2p5, am3c90, am4a1, am4a2, am4c1
-)
+"""Collection of Spencer Hill's aospy.Model objects.
+
+Each module of Models is imported on first access to one of its Models.
+"""
+from ..lazy import lazy_module
+
+lazy_module(__name__, attrs={
+    'gfdl_models': ('am2', 'am3', 'hiram', 'hiram_c48', 'sm2', 'am2p5',
+                    'am3c90', 'am4a1', 'am4a2', 'am4c1'),
+})
 # from .obs_models import (
 #     cru, prec_l, gpcp, cmap, trmm, udel, ceres, era, merra, cfsr, jra,
 #     landflux, landflux95, hadisst, hurrell, reynolds_oi
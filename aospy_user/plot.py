@@ -1,8 +1,6 @@
 """Tools for interfacing with aospy.plotting to create multi-panel plots."""
 import aospy
-from aospy_user import projs
-from aospy_user import variables as v
-from aospy_user import regions
+from aospy_user.catalog import get_catalog
 import matplotlib
 
 
@@ -24,11 +22,12 @@ class PlotMainParams(object):
         self.fig_kwargs = fig_kwargs
 
     def prep_data(self):
-        proj = aospy.to_proj(self.proj, projs)
-        model = aospy.to_model(self.model, proj, projs)
-        run = aospy.to_run(self.run, model, proj, projs)
-        var = aospy.to_var(self.var, v)
-        region = aospy.to_region(self.region, regions, proj=proj)
+        catalog = get_catalog()
+        proj = catalog.to_proj(self.proj)
+        model = catalog.to_model(self.model, proj)
+        run = catalog.to_run(self.run, model, proj)
+        var = catalog.to_var(self.var)
+        region = catalog.to_region(self.region, proj=proj)
         proj, model, var, region = [aospy.to_iterable(obj)
                                     for obj in (proj, model, var, region)]
         self.proj = proj
@@ -1,6 +1,13 @@
-"""Library of aospy.Proj objects that I use."""
-from .aero_3agcm import aero_3agcm
-# from .burls import burls
-# from .cmip5 import cmip5
-from .gcm_input import gcm_input
-# from .obs import obs
+"""Library of aospy.Proj objects that I use.
+
+Each Proj is imported on first access.
+"""
+from ..lazy import lazy_module
+
+lazy_module(__name__, attrs={
+    'aero_3agcm': ('aero_3agcm',),
+    # 'burls': ('burls',),
+    # 'cmip5': ('cmip5',),
+    'gcm_input': ('gcm_input',),
+    # 'obs': ('obs',),
+})
@@ -0,0 +1,169 @@
+"""Reduction over many Regions at once via a cached per-grid weight matrix.
+
+`aospy.Calc.region_calcs` loops over the Calc's regions, and each Region
+builds its lat-lon mask, applies the land mask and surface area weights, and
+reduces the field over latitude and longitude separately.  Here the weights
+of all of the regions on a given model grid -- the surface area of each grid
+cell inside the region, times the land or ocean fraction if the region is
+masked -- are built once into a matrix of shape (regions, lat*lon) and
+cached.  The region-average timeseries of all of the regions are then
+obtained from a single matrix product with the flattened field, so that the
+cost scales with the size of the field rather than with the number of
+regions.
+
+The results are those of `aospy.Region.ts` up to floating point roundoff.
+"""
+from collections import OrderedDict
+import threading
+import types
+
+from aospy.internal_names import ETA_STR, LAT_STR, LON_STR, YEAR_STR
+from aospy.region import _get_land_mask, _make_mask
+from aospy.var import Var
+import numpy as np
+import xarray as xr
+
+from .calcs.memo import fingerprint
+
+
+def _region_key(region):
+    return (region.name, repr(region.mask_bounds), repr(region.do_land_mask))
+
+
+class RegionIndex(object):
+    """Weights of multiple Regions on a single lat-lon grid.
+
+    Parameters
+    ----------
+    regions : sequence of aospy.Region objects
+        The regions.  Their names must be unique.
+    grid : xarray.DataArray
+        Any array on the grid, with `sfc_area` coordinates (and `land_mask`
+        coordinates, if any of the regions apply a land or ocean mask).
+    """
+    def __init__(self, regions, grid):
+        self.names = [region.name for region in regions]
+        if len(set(self.names)) != len(self.names):
+            raise ValueError("Region names must be unique: "
+                             "{}".format(self.names))
+        grid = grid.isel(**dict((dim, 0) for dim in grid.dims
+                                if dim not in (LAT_STR, LON_STR)))
+        sfc_area = grid.sfc_area.transpose(LAT_STR, LON_STR)
+        weights = []
+        for region in regions:
+            mask = _make_mask(grid, region.mask_bounds)
+            land_mask = _get_land_mask(grid, region.do_land_mask)
+            weight = (sfc_area.where(mask, 0.)*land_mask).fillna(0.)
+            weight = weight.transpose(LAT_STR, LON_STR)
+            weights.append(weight.values.ravel())
+        self.shape = sfc_area.shape
+        self.weights = np.array(weights)
+        self.norms = self.weights.sum(axis=1)
+
+    def ts(self, data):
+        """Region-average timeseries of the data for each region.
+
+        Returns an OrderedDict mapping each region's name to its DataArray.
+        Missing values are excluded from the area-weighted sum, as in
+        `aospy.Region.ts`.
+        """
+        other_dims = [dim for dim in data.dims
+                      if dim not in (LAT_STR, LON_STR)]
+        arr = data.transpose(*(other_dims + [LAT_STR, LON_STR]))
+        if arr.shape[-2:] != self.shape:
+            raise ValueError("Data's lat-lon shape {0} doesn't match that of "
+                             "the region index {1}".format(arr.shape[-2:],
+                                                           self.shape))
+        values = np.asarray(arr.values, dtype=np.float64)
+        values = np.where(np.isnan(values), 0., values)
+        flat = values.reshape(-1, self.weights.shape[1])
+        reduced = np.dot(flat, self.weights.T) / self.norms
+        reduced = reduced.reshape(arr.shape[:-2] + (len(self.names),))
+        coords = OrderedDict((name, coord) for name, coord in
+                             data.coords.items()
+                             if not set(coord.dims) & {LAT_STR, LON_STR})
+        out = OrderedDict()
+        for n, name in enumerate(self.names):
+            out[name] = xr.DataArray(
+                reduced[..., n].astype(data.dtype, copy=False),
+                dims=other_dims, coords=coords, name=data.name
+            )
+        return out
+
+    def reduce(self, data, func):
+        """Apply the given regional reduction ('ts', 'av', or 'std')."""
+        if func not in ('ts', 'av', 'std'):
+            raise ValueError("Specified regional reduction '{}' is not "
+                             "supported".format(func))
+        out = self.ts(data)
+        if func == 'ts' or YEAR_STR not in data.coords:
+            return out
+        for name, ts in out.items():
+            out[name] = getattr(ts, 'mean' if func == 'av' else 'std')(
+                YEAR_STR)
+        return out
+
+
+_INDEXES = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def region_index(regions, grid):
+    """The `RegionIndex` of the regions on the data's grid, cached per grid."""
+    grid_key = tuple(
+        fingerprint(grid[name]) if name in grid.coords else None
+        for name in (LAT_STR, LON_STR, 'sfc_area', 'land_mask')
+    )
+    key = (tuple(_region_key(region) for region in regions), grid_key)
+    with _INDEXES_LOCK:
+        try:
+            return _INDEXES[key]
+        except KeyError:
+            pass
+    index = RegionIndex(regions, grid)
+    with _INDEXES_LOCK:
+        _INDEXES[key] = index
+    return index
+
+
+def clear_region_indexes():
+    """Empty the cache of `RegionIndex` objects."""
+    with _INDEXES_LOCK:
+        _INDEXES.clear()
+
+
+def region_calcs(calc, arr, func, n=0):
+    """Perform a calculation for all of the Calc's regions at once.
+
+    Drop-in replacement for `aospy.Calc.region_calcs`; see `index_regions`.
+    """
+    bool_pfull = (calc.def_vert and calc.dtype_in_vert == ETA_STR and
+                  calc.dtype_out_vert is False)
+    regions = list(calc.region.values())
+    index = region_index(regions, arr)
+    if 'av' in calc.dtype_in_time:
+        reg_dat = index.ts(arr)
+    else:
+        reg_dat = index.reduce(arr, func)
+        if bool_pfull:
+            pfull = calc._full_to_yearly_ts(calc._prep_data(
+                calc._get_input_data(Var('p'), calc.start_date,
+                                     calc.end_date, 0),
+                calc.var.func_input_dtype
+            ), calc.dt).rename('pressure')
+            # Don't apply e.g. standard deviation to coordinates.
+            coords = index.reduce(pfull, func if func in ('av', 'ts')
+                                  else 'ts')
+            for name in reg_dat:
+                # Convert Pa to hPa
+                reg_dat[name] = reg_dat[name].assign_coords(
+                    **{name + '_pressure': coords[name]*1e-2}
+                )
+    return OrderedDict(sorted(reg_dat.items(), key=lambda t: t[0]))
+
+
+def index_regions(calc):
+    """Make the Calc perform its regional reductions via a `RegionIndex`."""
+    if calc.region:
+        calc.region_calcs = types.MethodType(region_calcs, calc)
+    return calc
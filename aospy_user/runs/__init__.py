@@ -1,165 +1,168 @@
-"""Collection of aospy.Run objects created by Spencer Hill."""
+"""Collection of aospy.Run objects created by Spencer Hill.
+
+Each module of Runs is imported on first access to it or one of its Runs.
+"""
+from ..lazy import lazy_module
+
 # from . import cmip5_runs
 # from .cmip5_runs import *
-from . import am2_runs
-from .am2_runs import (
-    am2_cont,
-    am2_aero,
-    am2_atm,
-    am2_amtm,
-    am2_gas,
-    am2_gtm,
-    am2_gmtm,
-    am2_aatl,
-    am2_aind,
-    am2_apac,
-    am2_noT,
-    am2_noT_p2K,
-    am2_amip,
-    am2_reyoi_cont,
-    am2_reyoi_m0p25,
-    am2_reyoi_m0p5,
-    am2_reyoi_m1,
-    am2_reyoi_m1p5,
-    am2_reyoi_m2,
-    am2_reyoi_m3,
-    am2_reyoi_m4,
-    am2_reyoi_p0p25,
-    am2_reyoi_p0p5,
-    am2_reyoi_p1,
-    am2_reyoi_p1p5,
-    am2_reyoi_p2,
-    am2_reyoi_p3,
-    am2_reyoi_p4,
-    am2_reyoi_p6,
-    am2_reyoi_p8,
-    am2_reyoi_m6,
-    am2_reyoi_m8,
-    am2_reyoi_m10,
-    am2_reyoi_m15,
-    am2_reyoi_p10,
-    am2_reyoi_wpwp_p2,
-    am2_reyoi_wpwp_m2,
-    am2_reyoi_uw,
-    am2_reyoi_uw_p2,
-    am2_reyoi_uw_p5,
-    am2_reyoi_uw_p10,
-    am2_reyoi_uw_m2,
-    am2_reyoi_uw_m5,
-    am2_reyoi_uw_m10,
-    am2_reyoi_uw_lo_0p5,
-    am2_reyoi_uw_lo_0p5_p2k,
-    am2_reyoi_uw_lo_0p5_p4k,
-    am2_reyoi_uw_lo_0p5_p6k,
-    am2_reyoi_uw_lo_0p5_p8k,
-    am2_reyoi_uw_lo_0p5_p10k,
-    am2_reyoi_uw_lo_0p5_m2k,
-    am2_reyoi_uw_lo_0p5_m4k,
-    am2_reyoi_uw_lo_0p5_m6k,
-    am2_reyoi_uw_lo_0p5_m8k,
-    am2_reyoi_uw_lo_0p5_m10k,
-    am2_reyoi_uw_lo_0p25,
-    am2_reyoi_uw_lo_0p25_p2k,
-    am2_cld_lock_cont,
-    am2_cld_lock_p2,
-    am2_cld_lock_sst,
-    am2_cld_lock_cld,
-    am2_amip1,
-    am2_amip1_p2,
-    am2_reynolds,
-    am2_reynolds_p2,
-    am2_hurrell_cont,
-    am2_hurrell_p2,
-    am2_cld_seed_all_p2,
-    am2_cld_seed_np_p2,
-    am2_cld_seed_sp_p2,
-    am2_cld_seed_sa_p2,
-    am2_zshen_cont,
-    am2_atmos_heat_wpwp,
-    am2_atmos_heat_wpwp_small,
-    am2_reyoi_w_ice,
-    am2_test,
-)
-from . import am3_runs
-from .am3_runs import (
-    am3_cont,
-    am3_aero,
-    am3_atm,
-    am3_amtm,
-    am3_gas,
-    am3_gtm,
-    am3_gmtm,
-    am3_aatl,
-    am3_aind,
-    am3_apac,
-    am3_hc,
-    am3_hp1k,
-    am3_hp2k,
-    am3_hp4k,
-    am3_hp6k,
-    am3_hp8k,
-    am3_hp10k,
-    am3_hm1k,
-    am3_hm2k,
-    am3_hm4k,
-    am3_hm6k,
-    am3_hm8k,
-    am3_hm10k,
-    am3_hm15k,
-    # am3_amip,
-    am3_hwpwp_p2k,
-    am3_hc_static_veg,
-    am3_hc_static_veg_p4k,
-    am3_hc_static_veg_10kyr,
-)
-from . import gfdl_runs
-from .gfdl_runs import (
-    sm2_cont,
-    sm2_aero,
-    sm2_gas,
-    sm2_both,
-    hiram_c48_0,
-    hiram_c48_0_p2K,
-    hiram_c48_1,
-    hiram_c48_1_p2K,
-    hiram_c48_2,
-    hiram_c48_2_p2K,
-    hiram_c48_3,
-    hiram_c48_3_p2K,
-    hiram_c48_4,
-    hiram_c48_4_p2K,
-    hiram_c48_5,
-    hiram_c48_5_p2K,
-    hiram_c48_6,
-    hiram_c48_6_p2K,
-    hiram_c48_7,
-    hiram_c48_7_p2K,
-    hiram_c48_8,
-    hiram_c48_8_p2K,
-    am3c90_cont,
-    am3c90_p2K,
-    am2p5_cont,
-    am2p5_p2K,
-    am4_a1c,
-    am4_a1p2k,
-    am4_a2c,
-    am4_a2p2k,
-    am4_c1c,
-    am4_c1p2k,
-)
-from . import hiram_runs
-from .hiram_runs import (
-    hiram_cont,
-    hiram_aero,
-    hiram_atm,
-    hiram_amtm,
-    hiram_apac,
-    hiram_aatl,
-    hiram_aind,
-    hiram_gas,
-    hiram_gtm,
-    hiram_gmtm,
-    # hiram_amip
-)
 # from . import obs_runs
 # from .obs_runs import *
+lazy_module(__name__, attrs={
+    'am2_runs': (
+        'am2_cont',
+        'am2_aero',
+        'am2_atm',
+        'am2_amtm',
+        'am2_gas',
+        'am2_gtm',
+        'am2_gmtm',
+        'am2_aatl',
+        'am2_aind',
+        'am2_apac',
+        'am2_noT',
+        'am2_noT_p2K',
+        'am2_amip',
+        'am2_reyoi_cont',
+        'am2_reyoi_m0p25',
+        'am2_reyoi_m0p5',
+        'am2_reyoi_m1',
+        'am2_reyoi_m1p5',
+        'am2_reyoi_m2',
+        'am2_reyoi_m3',
+        'am2_reyoi_m4',
+        'am2_reyoi_p0p25',
+        'am2_reyoi_p0p5',
+        'am2_reyoi_p1',
+        'am2_reyoi_p1p5',
+        'am2_reyoi_p2',
+        'am2_reyoi_p3',
+        'am2_reyoi_p4',
+        'am2_reyoi_p6',
+        'am2_reyoi_p8',
+        'am2_reyoi_m6',
+        'am2_reyoi_m8',
+        'am2_reyoi_m10',
+        'am2_reyoi_m15',
+        'am2_reyoi_p10',
+        'am2_reyoi_wpwp_p2',
+        'am2_reyoi_wpwp_m2',
+        'am2_reyoi_uw',
+        'am2_reyoi_uw_p2',
+        'am2_reyoi_uw_p5',
+        'am2_reyoi_uw_p10',
+        'am2_reyoi_uw_m2',
+        'am2_reyoi_uw_m5',
+        'am2_reyoi_uw_m10',
+        'am2_reyoi_uw_lo_0p5',
+        'am2_reyoi_uw_lo_0p5_p2k',
+        'am2_reyoi_uw_lo_0p5_p4k',
+        'am2_reyoi_uw_lo_0p5_p6k',
+        'am2_reyoi_uw_lo_0p5_p8k',
+        'am2_reyoi_uw_lo_0p5_p10k',
+        'am2_reyoi_uw_lo_0p5_m2k',
+        'am2_reyoi_uw_lo_0p5_m4k',
+        'am2_reyoi_uw_lo_0p5_m6k',
+        'am2_reyoi_uw_lo_0p5_m8k',
+        'am2_reyoi_uw_lo_0p5_m10k',
+        'am2_reyoi_uw_lo_0p25',
+        'am2_reyoi_uw_lo_0p25_p2k',
+        'am2_cld_lock_cont',
+        'am2_cld_lock_p2',
+        'am2_cld_lock_sst',
+        'am2_cld_lock_cld',
+        'am2_amip1',
+        'am2_amip1_p2',
+        'am2_reynolds',
+        'am2_reynolds_p2',
+        'am2_hurrell_cont',
+        'am2_hurrell_p2',
+        'am2_cld_seed_all_p2',
+        'am2_cld_seed_np_p2',
+        'am2_cld_seed_sp_p2',
+        'am2_cld_seed_sa_p2',
+        'am2_zshen_cont',
+        'am2_atmos_heat_wpwp',
+        'am2_atmos_heat_wpwp_small',
+        'am2_reyoi_w_ice',
+        'am2_test',
+    ),
+    'am3_runs': (
+        'am3_cont',
+        'am3_aero',
+        'am3_atm',
+        'am3_amtm',
+        'am3_gas',
+        'am3_gtm',
+        'am3_gmtm',
+        'am3_aatl',
+        'am3_aind',
+        'am3_apac',
+        'am3_hc',
+        'am3_hp1k',
+        'am3_hp2k',
+        'am3_hp4k',
+        'am3_hp6k',
+        'am3_hp8k',
+        'am3_hp10k',
+        'am3_hm1k',
+        'am3_hm2k',
+        'am3_hm4k',
+        'am3_hm6k',
+        'am3_hm8k',
+        'am3_hm10k',
+        'am3_hm15k',
+        # am3_amip,
+        'am3_hwpwp_p2k',
+        'am3_hc_static_veg',
+        'am3_hc_static_veg_p4k',
+        'am3_hc_static_veg_10kyr',
+    ),
+    'gfdl_runs': (
+        'sm2_cont',
+        'sm2_aero',
+        'sm2_gas',
+        'sm2_both',
+        'hiram_c48_0',
+        'hiram_c48_0_p2K',
+        'hiram_c48_1',
+        'hiram_c48_1_p2K',
+        'hiram_c48_2',
+        'hiram_c48_2_p2K',
+        'hiram_c48_3',
+        'hiram_c48_3_p2K',
+        'hiram_c48_4',
+        'hiram_c48_4_p2K',
+        'hiram_c48_5',
+        'hiram_c48_5_p2K',
+        'hiram_c48_6',
+        'hiram_c48_6_p2K',
+        'hiram_c48_7',
+        'hiram_c48_7_p2K',
+        'hiram_c48_8',
+        'hiram_c48_8_p2K',
+        'am3c90_cont',
+        'am3c90_p2K',
+        'am2p5_cont',
+        'am2p5_p2K',
+        'am4_a1c',
+        'am4_a1p2k',
+        'am4_a2c',
+        'am4_a2p2k',
+        'am4_c1c',
+        'am4_c1p2k',
+    ),
+    'hiram_runs': (
+        'hiram_cont',
+        'hiram_aero',
+        'hiram_atm',
+        'hiram_amtm',
+        'hiram_apac',
+        'hiram_aatl',
+        'hiram_aind',
+        'hiram_gas',
+        'hiram_gtm',
+        'hiram_gmtm',
+        # hiram_amip
+    ),
+})
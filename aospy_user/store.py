@@ -0,0 +1,227 @@
+"""Persistent record of completed Calcs, to avoid recomputing them.
+
+Each completed Calc is recorded under a key hashing everything that
+determines its output: the Var's definition and the source code of its
+function (and likewise for every Var it is computed from), the run, the
+paths, modification times, and sizes of the input data files, the date
+range, the input and output time intervals and data types, the vertical
+levels, and the regions.  When the suite is re-run, a Calc whose key is
+recorded and whose output files are unchanged since is skipped.
+
+Since most Vars' functions are thin wrappers over shared helpers, the
+source of every module of `aospy_user.calcs` is hashed as well, and for a
+function defined elsewhere, that of its module.  Editing any of them
+therefore marks the affected Calcs as not current.  Helpers outside these
+modules, e.g. in aospy itself, aren't tracked; after changing one, clear
+the store.
+"""
+import glob
+import hashlib
+import inspect
+import json
+import logging
+import os
+import sys
+
+import aospy
+
+
+_FUNC_SOURCES = {}
+
+
+def _func_source(func):
+    """Source code of the function, or its repr if that is unavailable."""
+    try:
+        return _FUNC_SOURCES[func]
+    except (KeyError, TypeError):
+        pass
+    try:
+        source = inspect.getsource(func)
+    except (IOError, TypeError):
+        source = repr(func)
+    try:
+        _FUNC_SOURCES[func] = source
+    except TypeError:
+        pass
+    return source
+
+
+_CALCS_PACKAGE = 'aospy_user.calcs'
+_MODULE_DIGESTS = {}
+
+
+def _files_digest(paths):
+    sha = hashlib.sha1()
+    for path in sorted(paths):
+        with open(path, 'rb') as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+
+def _module_digest(func):
+    """Hash of the source of the modules the function may depend on.
+
+    All of `aospy_user.calcs` for functions defined within it, or otherwise
+    the function's own module.  None if the source is unavailable.
+    """
+    name = getattr(func, '__module__', None)
+    if name is None:
+        return None
+    if name == _CALCS_PACKAGE or name.startswith(_CALCS_PACKAGE + '.'):
+        name = _CALCS_PACKAGE
+    try:
+        return _MODULE_DIGESTS[name]
+    except KeyError:
+        pass
+    module = sys.modules.get(name)
+    path = getattr(module, '__file__', None)
+    if path is None:
+        digest = None
+    else:
+        path = os.path.splitext(path)[0] + '.py'
+        if name == _CALCS_PACKAGE:
+            paths = glob.glob(os.path.join(os.path.dirname(path), '*.py'))
+        else:
+            paths = [path]
+        try:
+            digest = _files_digest(paths)
+        except (IOError, OSError):
+            digest = None
+    _MODULE_DIGESTS[name] = digest
+    return digest
+
+
+def _var_signature(var):
+    """Everything about the Var affecting what is computed from it."""
+    if not isinstance(var, aospy.Var):
+        return repr(getattr(var, 'value', var))
+    func = getattr(var, 'func', None)
+    inputs = getattr(var, 'variables', None) or ()
+    return (var.name, _func_source(func) if func is not None else None,
+            _module_digest(func) if func is not None else None,
+            getattr(var, 'func_input_dtype', None),
+            getattr(var, 'def_time', None), getattr(var, 'def_vert', None),
+            tuple(_var_signature(v) for v in inputs))
+
+
+def _loaded_vars(var):
+    """The Vars whose data is loaded from disk in computing the given Var."""
+    inputs = [v for v in (getattr(var, 'variables', None) or ())
+              if isinstance(v, aospy.Var)]
+    return inputs or [var]
+
+
+def _input_files(calc):
+    """Paths of the data files the Calc reads, or None if undeterminable.
+
+    That includes the case of any of them missing, e.g. for a
+    `GFDLDataLoader`, so that the Calc is treated as not current.
+    """
+    files = set()
+    for var in _loaded_vars(calc.var):
+        if var.name in ('p', 'dp'):
+            var = calc.ps
+        try:
+            files.update(calc.data_loader._generate_file_set(
+                var=var, start_date=calc.start_date, end_date=calc.end_date,
+                **calc.data_loader_attrs
+            ))
+        except (AttributeError, IOError, KeyError, NotImplementedError,
+                OSError):
+            return None
+    return sorted(files)
+
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return path, None, None
+    return path, stat.st_mtime, stat.st_size
+
+
+def _region_signature(calc):
+    regions = getattr(calc, 'region', None) or {}
+    if isinstance(regions, dict):
+        regions = regions.values()
+    return sorted((r.name, repr(getattr(r, 'mask_bounds', None)),
+                   getattr(r, 'do_land_mask', None)) for r in regions)
+
+
+def calc_key(calc):
+    """Hash identifying the output of the Calc.
+
+    Returns None if the Calc's input files can't be determined, in which
+    case it can't be safely skipped.
+    """
+    files = _input_files(calc)
+    if files is None:
+        return None
+    signature = (
+        _var_signature(calc.var), calc.proj_str, calc.model_str,
+        calc.run_str_full, calc.ens_mem, str(calc.start_date),
+        str(calc.end_date), calc.intvl_in, calc.intvl_out,
+        calc.dtype_in_time, calc.dtype_in_vert, tuple(calc.dtype_out_time),
+        calc.dtype_out_vert, repr(calc.level), _region_signature(calc),
+        [_file_stamp(path) for path in files]
+    )
+    return hashlib.sha1(repr(signature).encode('utf-8')).hexdigest()
+
+
+class ResultStore(object):
+    """Persistent record of completed Calcs and the outputs they saved.
+
+    Parameters
+    ----------
+    direc : str
+        Directory in which to keep the record.  Created if necessary.
+    """
+    def __init__(self, direc):
+        self.direc = direc
+
+    def _entry_path(self, key):
+        return os.path.join(self.direc, key[:2], key + '.json')
+
+    def _output_stamps(self, calc):
+        return sorted(_file_stamp(path) for path in calc.path_out.values())
+
+    def is_current(self, calc):
+        """Whether the Calc was completed and its outputs are unchanged."""
+        key = calc_key(calc)
+        if key is None:
+            return False
+        try:
+            with open(self._entry_path(key)) as f:
+                entry = json.load(f)
+        except (IOError, OSError, ValueError):
+            return False
+        stamps = [tuple(stamp) for stamp in entry['outputs']]
+        current = [tuple(stamp) for stamp in self._output_stamps(calc)]
+        return stamps == current and all(mtime is not None
+                                         for _, mtime, _ in current)
+
+    def record(self, calc):
+        """Record the Calc as completed, along with its saved outputs."""
+        key = calc_key(calc)
+        if key is None:
+            return
+        path = self._entry_path(key)
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as f:
+                json.dump({'calc': str(calc),
+                           'outputs': self._output_stamps(calc)}, f)
+        except (IOError, OSError) as e:
+            logging.warning("Couldn't record Calc in result store: "
+                            "{}".format(repr(e)))
+
+    def misses(self, calcs):
+        """The Calcs that aren't current, i.e. that need to be computed."""
+        misses = []
+        for calc in calcs:
+            if self.is_current(calc):
+                logging.info("Skipping {}: outputs are current".format(calc))
+            else:
+                misses.append(calc)
+        return misses
@@ -1,8 +1,30 @@
 #! /usr/bin/env python
 """Main testing module for `aospy_user` package."""
+import datetime
+import os
+import shutil
+import subprocess
 import sys
+import tempfile
 import unittest
 
+from aospy import Calc, Region, Var
+from aospy.data_loader import GFDLDataLoader
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from aospy_user import CalcScheduler, projs, regions, variables
+from aospy_user.calcs import by_year_chunks
+from aospy_user.catalog import Catalog, get_catalog
+from aospy_user.ensemble import (group_calcs_by_ensemble, stack_runs,
+                                 unstack_run)
+from aospy_user.incremental import compute_incremental, is_incremental
+from aospy_user.manifest import DataManifest
+from aospy_user.region_index import RegionIndex
+from aospy_user import store
+from aospy_user.store import ResultStore
+
 
 class CalcsTestCase(unittest.TestCase):
     def setUp(self):
@@ -15,5 +37,442 @@ class CalcsTestCase(unittest.TestCase):
 class TestCalcs(CalcsTestCase):
     pass
 
+
+class FakeCalc(object):
+    def __init__(self, name, n_years=1, error=None):
+        self.name = name
+        self.start_date = datetime.datetime(2000, 1, 1)
+        self.end_date = datetime.datetime(1999 + n_years, 12, 31)
+        self.error = error
+
+    def compute(self):
+        if self.error is not None:
+            raise self.error
+        return self.name
+
+
+class TestCalcScheduler(unittest.TestCase):
+    def test_errors_isolated(self):
+        calcs = [FakeCalc('a'), FakeCalc('b', error=IOError('missing')),
+                 FakeCalc('c', error=RuntimeError('bad'))]
+        scheduler = CalcScheduler(n_workers=2, backend='thread')
+        results = list(scheduler.run(calcs))
+        self.assertEqual(len(results), 3)
+        successes = [res for _, res, err in results if err is None]
+        self.assertEqual(successes, ['a'])
+
+    def test_other_errors_raised(self):
+        calcs = [FakeCalc('a', error=ValueError('bug'))]
+        scheduler = CalcScheduler(n_workers=1, backend='thread')
+        with self.assertRaises(ValueError):
+            list(scheduler.run(calcs))
+
+    def test_ordered_by_cost(self):
+        calcs = [FakeCalc(str(n), n_years=n) for n in range(1, 5)]
+        scheduler = CalcScheduler(n_workers=1, backend='thread')
+        names = [res for _, res, _ in scheduler.run(calcs)]
+        self.assertEqual(names, ['4', '3', '2', '1'])
+
+    def test_invalid_backend(self):
+        with self.assertRaises(ValueError):
+            CalcScheduler(backend='gpu')
+
+
+class TestStackRuns(unittest.TestCase):
+    def setUp(self):
+        self.runs = [xr.DataArray(np.arange(3.) + n, dims=['time'],
+                                  coords={'time': [0, 1, 2]})
+                     for n in range(2)]
+        self.grid = xr.DataArray(np.arange(4.), dims=['lat'])
+
+    def test_stack_unstack(self):
+        stacked = stack_runs(self.runs, ['a', 'b'])
+        self.assertEqual(stacked.dims, ('run', 'time'))
+        for n, arr in enumerate(self.runs):
+            self.assertTrue(unstack_run(stacked, n).identical(arr))
+
+    def test_static_not_stacked(self):
+        self.assertIs(stack_runs([self.grid, self.grid.copy()], ['a', 'b']),
+                      self.grid)
+        self.assertEqual(stack_runs([6371e3, 6371e3], ['a', 'b']), 6371e3)
+
+    def test_mismatched_time(self):
+        other = self.runs[1].assign_coords(time=[3, 4, 5])
+        self.assertRaises(ValueError, stack_runs, [self.runs[0], other],
+                          ['a', 'b'])
+
+
+class FakeEnsembleCalc(object):
+    def __init__(self, run, **attrs):
+        self.name = 'precip'
+        self.model_str = 'am2'
+        self.run_str = run
+        self.start_date = datetime.datetime(2000, 1, 1)
+        self.end_date = datetime.datetime(2004, 12, 31)
+        self.intvl_in = 'monthly'
+        self.dtype_in_time = 'ts'
+        self.dtype_in_vert = False
+        self.intvl_out = 'ann'
+        self.dtype_out_vert = False
+        self.level = None
+        self.region = {'globe': regions.globe}
+        self.time_offset = None
+        for name, value in attrs.items():
+            setattr(self, name, value)
+
+
+class TestGroupCalcsByEnsemble(unittest.TestCase):
+    def test_grouped_by_run_only(self):
+        calcs = [FakeEnsembleCalc('cont'), FakeEnsembleCalc('+2K'),
+                 FakeEnsembleCalc('cont', intvl_out='djf'),
+                 FakeEnsembleCalc('cont', level=500.),
+                 FakeEnsembleCalc('cont', region={'sahel': regions.sahel}),
+                 FakeEnsembleCalc('cont', dtype_out_vert='vert_int'),
+                 FakeEnsembleCalc('cont', time_offset={'days': -15})]
+        ensembles = group_calcs_by_ensemble(calcs)
+        self.assertEqual([len(ens) for ens in ensembles],
+                         [2, 1, 1, 1, 1, 1])
+
+
+class FakeDataLoader(object):
+    def __init__(self, direc):
+        self.direc = direc
+
+    def _generate_file_set(self, var=None, **kwargs):
+        return [os.path.join(self.direc, var.name + '.nc')]
+
+
+class FakeStoredCalc(FakeCalc):
+    def __init__(self, direc):
+        super(FakeStoredCalc, self).__init__('precip')
+        self.var = Var(name='precip', def_time=True)
+        self.data_loader = FakeDataLoader(direc)
+        self.data_loader_attrs = {}
+        self.proj_str, self.model_str, self.run_str_full = 'p', 'm', 'r'
+        self.ens_mem = self.level = self.region = None
+        self.intvl_in = self.intvl_out = 'monthly'
+        self.dtype_in_time, self.dtype_in_vert = 'ts', False
+        self.dtype_out_time, self.dtype_out_vert = ['av'], False
+        self.path_out = {'av': os.path.join(direc, 'out.nc')}
+
+    def compute(self):
+        with open(self.path_out['av'], 'w') as f:
+            f.write('output')
+
+
+class TestResultStore(unittest.TestCase):
+    def setUp(self):
+        self.direc = tempfile.mkdtemp()
+        with open(os.path.join(self.direc, 'precip.nc'), 'w') as f:
+            f.write('input')
+        self.store = ResultStore(os.path.join(self.direc, 'store'))
+        self.calc = FakeStoredCalc(self.direc)
+
+    def tearDown(self):
+        shutil.rmtree(self.direc)
+
+    def test_record(self):
+        self.assertEqual(self.store.misses([self.calc]), [self.calc])
+        self.calc.compute()
+        self.store.record(self.calc)
+        self.assertEqual(self.store.misses([self.calc]), [])
+
+    def test_input_changed(self):
+        self.calc.compute()
+        self.store.record(self.calc)
+        with open(os.path.join(self.direc, 'precip.nc'), 'a') as f:
+            f.write('more input')
+        self.assertFalse(self.store.is_current(self.calc))
+
+    def test_output_removed(self):
+        self.calc.compute()
+        self.store.record(self.calc)
+        os.remove(self.calc.path_out['av'])
+        self.assertFalse(self.store.is_current(self.calc))
+
+    def test_input_files_missing(self):
+        self.calc.data_loader = GFDLDataLoader(
+            data_direc=self.direc, data_dur=5,
+            data_start_date=datetime.datetime(2000, 1, 1),
+            data_end_date=datetime.datetime(2004, 12, 31)
+        )
+        self.calc.data_loader_attrs = dict(
+            domain='atmos', intvl_in='monthly', dtype_in_vert=False,
+            dtype_in_time='ts', intvl_out='ann'
+        )
+        self.calc.compute()
+        self.store.record(self.calc)
+        self.assertFalse(self.store.is_current(self.calc))
+        self.assertEqual(self.store.misses([self.calc]), [self.calc])
+
+    def test_helper_changed(self):
+        path = os.path.join(self.direc, 'budget_helpers.py')
+        with open(path, 'w') as f:
+            f.write('def helper(x):\n    return x\n\n\n'
+                    'def wrapper(x):\n    return helper(x)\n')
+        sys.path.insert(0, self.direc)
+        try:
+            import budget_helpers
+        finally:
+            sys.path.remove(self.direc)
+        self.addCleanup(sys.modules.pop, 'budget_helpers')
+        self.calc.var = Var(name='precip', def_time=True,
+                            func=budget_helpers.wrapper)
+        self.calc.compute()
+        self.store.record(self.calc)
+        self.assertTrue(self.store.is_current(self.calc))
+        with open(path, 'a') as f:
+            f.write('\n\ndef unused():\n    pass\n')
+        store._MODULE_DIGESTS.clear()
+        self.assertFalse(self.store.is_current(self.calc))
+
+
+class FakeYearlyCalc(Calc):
+    """Mimics how aospy.Calc creates yearly timeseries.
+
+    The time reductions are those of aospy.Calc itself.
+    """
+    def __init__(self, data, first_year, last_year, dir_out,
+                 dtype_out_time=('av', 'std'), var=None):
+        self.data = data
+        self.var = var or Var(name='precip', def_time=True)
+        self.name = self.var.name
+        self.model_str = self.run_str = 'precip'
+        self.def_time, self.def_vert = True, False
+        self.ens_mem = None
+        self.intvl_in, self.intvl_out = 'daily', 'ann'
+        self.dtype_in_time, self.dtype_in_vert = 'ts', False
+        self.dtype_out_time, self.dtype_out_vert = dtype_out_time, False
+        self.region = {'globe': Region(name='globe', lat_bounds=(-90, 90),
+                                       lon_bounds=(0, 360))}
+        self.dir_out = dir_out
+        self.start_date = datetime.datetime(first_year, 1, 1)
+        self.end_date = datetime.datetime(last_year, 12, 31)
+        self.loaded = []
+        self.data_out = {}
+
+    def _get_all_data(self, start_date, end_date):
+        self.loaded.append((start_date.year, end_date.year))
+        return [self.data.sel(time=slice(start_date, end_date))]
+
+    def _make_full_mean_eddy_ts(self, data):
+        arr = self.var.func(*data) if self.var.variables else data[0]
+        return arr.groupby('time.year').mean('time'), False, False
+
+    def save(self, data, dtype_out_time, **kwargs):
+        self.data_out[dtype_out_time] = data
+
+
+class TestComputeIncremental(unittest.TestCase):
+    def setUp(self):
+        self.direc = tempfile.mkdtemp()
+        time = pd.date_range('2000-01-01', '2005-12-31', freq='D')
+        self.data = xr.DataArray(
+            np.random.RandomState(0).rand(time.size, 2, 3).astype('float32'),
+            dims=['time', 'lat', 'lon'],
+            coords={'time': time, 'lat': [0., 1.], 'lon': [0., 1., 2.],
+                    'sfc_area': (('lat', 'lon'), [[1., 2., 3.],
+                                                  [1., 2., 3.]])}
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.direc)
+
+    def _check_extension(self, dtype_out_time):
+        compute_incremental(FakeYearlyCalc(self.data, 2000, 2003,
+                                           self.direc, dtype_out_time))
+        extended = FakeYearlyCalc(self.data, 2000, 2005, self.direc,
+                                  dtype_out_time)
+        compute_incremental(extended)
+        self.assertEqual(extended.loaded, [(2004, 2005)])
+        scratch = FakeYearlyCalc(self.data, 2000, 2005, self.direc,
+                                 dtype_out_time)
+        scratch.compute()
+        self.assertEqual(sorted(extended.data_out),
+                         sorted(dtype_out_time))
+        for dtype, data in scratch.data_out.items():
+            if 'reg' in dtype:
+                for name, arr in data.items():
+                    np.testing.assert_array_equal(
+                        extended.data_out[dtype][name], arr
+                    )
+            else:
+                np.testing.assert_array_equal(extended.data_out[dtype], data)
+
+    def test_extension_matches_from_scratch(self):
+        self._check_extension(('av', 'std'))
+
+    def test_regional_extension_matches_from_scratch(self):
+        self._check_extension(('ts', 'reg.av', 'reg.std', 'reg.ts'))
+
+    def test_regional_pressure_not_incremental(self):
+        calc = FakeYearlyCalc(self.data, 2000, 2005, self.direc,
+                              ('av', 'reg.av'))
+        self.assertTrue(is_incremental(calc))
+        calc.def_vert, calc.dtype_in_vert = 'pfull', 'sigma'
+        self.assertFalse(is_incremental(calc))
+        calc.dtype_out_time = ('av',)
+        self.assertTrue(is_incremental(calc))
+
+    def test_cross_year_func_not_incremental(self):
+        precip = Var(name='precip', def_time=True)
+
+        def precip_change(arr):
+            return arr - arr.shift(time=1)
+
+        var = Var(name='precip_change', func=precip_change,
+                  variables=(precip,), def_time=True)
+        compute_incremental(FakeYearlyCalc(self.data, 2000, 2003,
+                                           self.direc, var=var))
+        extended = FakeYearlyCalc(self.data, 2000, 2005, self.direc,
+                                  var=var)
+        self.assertFalse(is_incremental(extended))
+        compute_incremental(extended)
+        self.assertEqual(extended.loaded, [(2000, 2005)])
+        scratch = FakeYearlyCalc(self.data, 2000, 2005, self.direc, var=var)
+        scratch.compute()
+        for dtype, data in scratch.data_out.items():
+            np.testing.assert_array_equal(extended.data_out[dtype], data)
+
+        var.func = by_year_chunks(precip_change)
+        self.assertTrue(is_incremental(extended))
+
+
+class TestRegionIndex(unittest.TestCase):
+    def setUp(self):
+        lat = np.arange(-87.5, 90., 5.)
+        lon = np.arange(2.5, 360., 5.)
+        rand = np.random.RandomState(0)
+        values = rand.rand(3, lat.size, lon.size)
+        values[0, 5, 5] = np.nan
+        self.arr = xr.DataArray(
+            values, dims=['year', 'lat', 'lon'],
+            coords={'year': [2000, 2001, 2002], 'lat': lat, 'lon': lon}
+        )
+        self.arr.coords['sfc_area'] = (('lat', 'lon'), np.cos(np.deg2rad(
+            lat))[:, np.newaxis]*np.ones(lon.size))
+        self.arr.coords['land_mask'] = (('lat', 'lon'),
+                                        rand.rand(lat.size, lon.size))
+        self.regions = [
+            Region(name='globe', lat_bounds=(-90, 90), lon_bounds=(0, 360)),
+            Region(name='land', lat_bounds=(-90, 90), lon_bounds=(0, 360),
+                   do_land_mask=True),
+            Region(name='sahel', do_land_mask='ocean',
+                   mask_bounds=[((10, 20), (0, 40)),
+                                ((10, 20), (342, 360))]),
+        ]
+
+    def test_matches_region(self):
+        index = RegionIndex(self.regions, self.arr)
+        for func in ('ts', 'av', 'std'):
+            reduced = index.reduce(self.arr, func)
+            for region in self.regions:
+                np.testing.assert_allclose(
+                    reduced[region.name], getattr(region, func)(self.arr)
+                )
+
+    def test_grid_mismatch(self):
+        index = RegionIndex(self.regions, self.arr)
+        self.assertRaises(ValueError, index.ts, self.arr.isel(lat=[0, 1]))
+
+
+class TestLazyImport(unittest.TestCase):
+    def test_heavy_modules_not_imported(self):
+        heavy = ['aospy_user.variables', 'aospy_user.runs.am2_runs',
+                 'aospy_user.plot', 'matplotlib', 'animal_spharm']
+        code = ("import sys, aospy_user; print(sorted(set({}) & "
+                "set(sys.modules)))".format(heavy))
+        output = subprocess.check_output([sys.executable, '-c', code])
+        self.assertEqual(output.decode('utf-8').strip(), '[]')
+
+    def test_declared_attrs(self):
+        import aospy_user
+        self.assertTrue(callable(aospy_user.main))
+        self.assertIn('variables', dir(aospy_user))
+        self.assertRaises(AttributeError, getattr, aospy_user, 'not_an_attr')
+
+
+class TestCatalog(unittest.TestCase):
+    def setUp(self):
+        self.catalog = get_catalog()
+
+    def test_alt_names(self):
+        self.assertIs(self.catalog.to_var('temp'), variables.temp)
+        self.assertIs(self.catalog.to_var('ta'), variables.temp)
+        self.assertEqual(self.catalog.to_var(['T', 'ta']),
+                         [variables.temp, variables.temp])
+        self.assertRaises(AttributeError, self.catalog.to_var, 'not_a_var')
+
+    def test_projs_and_regions(self):
+        self.assertIs(self.catalog.to_proj('aero_3agcm'), projs.aero_3agcm)
+        self.assertIs(self.catalog.to_region('sahel'), regions.sahel)
+
+    def test_save_load(self):
+        direc = tempfile.mkdtemp()
+        try:
+            path = os.path.join(direc, 'catalog.json')
+            self.catalog.save(path)
+            loaded = Catalog.load(path)
+        finally:
+            shutil.rmtree(direc)
+        self.assertIs(loaded.to_var('ta'), variables.temp)
+
+
+class FakeGFDLCalc(object):
+    def __init__(self, direc, first_year, last_year):
+        self.var = Var(name='precip', alt_names=('pr',))
+        self.ps = Var(name='ps')
+        self.data_loader = GFDLDataLoader(
+            data_direc=direc, data_dur=5,
+            data_start_date=datetime.datetime(1983, 1, 1),
+            data_end_date=datetime.datetime(1997, 12, 31)
+        )
+        self.data_loader_attrs = dict(domain='atmos', intvl_in='monthly',
+                                      dtype_in_vert=False,
+                                      dtype_in_time='ts', intvl_out='ann')
+        self.dtype_in_vert = False
+        self.start_date = datetime.datetime(first_year, 1, 1)
+        self.end_date = datetime.datetime(last_year, 12, 31)
+
+
+class TestDataManifest(unittest.TestCase):
+    def setUp(self):
+        self.direc = tempfile.mkdtemp()
+        subdir = os.path.join(self.direc, 'atmos', 'ts', 'monthly', '5yr')
+        os.makedirs(subdir)
+        for dates in ('198301-198712', '198801-199212'):
+            open(os.path.join(subdir, 'atmos.{}.pr.nc'.format(dates)),
+                 'w').close()
+        self.manifest = DataManifest(os.path.join(self.direc, 'cache.json'))
+
+    def tearDown(self):
+        shutil.rmtree(self.direc)
+
+    def test_feasible(self):
+        self.assertTrue(self.manifest.is_feasible(
+            FakeGFDLCalc(self.direc, 1983, 1992)))
+        missing = self.manifest.missing_files(
+            FakeGFDLCalc(self.direc, 1985, 1997))
+        self.assertEqual([os.path.basename(path) for path in missing],
+                         ['atmos.199301-199712.pr.nc'])
+        calcs = [FakeGFDLCalc(self.direc, 1983, 1987),
+                 FakeGFDLCalc(self.direc, 1990, 1995)]
+        self.assertEqual(self.manifest.prune(calcs), calcs[:1])
+
+    def test_summary(self):
+        self.assertEqual(self.manifest.summary(self.direc),
+                         {('atmos', 'ts', 'monthly', 'pr'): [(1983, 1987),
+                                                             (1988, 1992)]})
+
+    def test_cached(self):
+        self.manifest.files(self.direc)
+        shutil.rmtree(os.path.join(self.direc, 'atmos'))
+        manifest = DataManifest(os.path.join(self.direc, 'cache.json'))
+        calc = FakeGFDLCalc(self.direc, 1983, 1992)
+        self.assertTrue(manifest.is_feasible(calc))
+        manifest.refresh(self.direc)
+        self.assertFalse(manifest.is_feasible(calc))
+
+
 if __name__ == '__main__':
     sys.exit(unittest.main())
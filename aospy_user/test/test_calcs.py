@@ -1,3 +1,5 @@
+import warnings
+
 import numpy as np
 import pytest
 import xarray as xr
@@ -35,3 +37,523 @@ def test_tend_each_timestep():
                              coords=arr.coords)
     darr_dt = tend_each_timestep(arr_zeros)
     assert not darr_dt.any()
+
+
+def test_tend_each_timestep_year_boundaries():
+    time = xr.DataArray(np.arange('1999-12-30', '2001-01-03',
+                                  dtype='datetime64[D]'), dims=['time'])
+    arr = xr.DataArray(np.random.RandomState(0).rand(time.size, 3),
+                       dims=['time', 'lat'], coords={'time': time})
+    expected = arr.groupby('time.year').apply(calcs.tendencies.cen_diff_time)
+    np.testing.assert_array_equal(calcs.time_tendency_each_timestep(arr),
+                                  expected)
+
+
+@pytest.mark.parametrize('chunked', [False, True])
+def test_tend_each_timestep_single_timestep_year(chunked):
+    time = xr.DataArray(np.array(['2000-12-30', '2000-12-31', '2001-06-01',
+                                  '2002-01-01', '2002-01-02'],
+                                 dtype='datetime64[ns]'), dims=['time'])
+    arr = xr.DataArray([0., 1., 5., 2., 4.], dims=['time'],
+                       coords={'time': time})
+    if chunked:
+        pytest.importorskip('dask.array')
+        arr = arr.chunk()
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', RuntimeWarning)
+        actual = calcs.time_tendency_each_timestep(arr).compute()
+    np.testing.assert_allclose(actual*86400., [1., 1., np.nan, 2., 2.])
+
+
+def test_period_stats_matches_resample():
+    time = xr.DataArray(np.arange('2000-01-01T00', '2000-04-01T00',
+                                  np.timedelta64(6, 'h'),
+                                  dtype='datetime64[h]'), dims=['time'])
+    arr = xr.DataArray(np.random.RandomState(0).rand(3, time.size),
+                       dims=['lat', 'time'], coords={'time': time})
+    stats = calcs.period_stats(arr, freq='1M')
+    for name in ('first', 'last', 'mean'):
+        expected = arr.resample('1M', 'time', how=name)
+        np.testing.assert_allclose(stats[name], expected)
+    np.testing.assert_array_equal(stats['duration'],
+                                  calcs.first_to_last_vals_dur(arr))
+
+
+def test_period_stats_skips_missing():
+    time = xr.DataArray(np.arange('2000-01-01', '2000-03-01',
+                                  dtype='datetime64[D]'), dims=['time'])
+    arr = xr.DataArray(np.arange(2.*time.size).reshape(2, -1),
+                       dims=['lat', 'time'], coords={'time': time})
+    arr[0, 0] = np.nan
+    arr[1, 30] = np.nan
+    stats = calcs.period_stats(arr, freq='MS')
+    np.testing.assert_array_equal(stats['first'], [[1., 31.], [60., 91.]])
+    np.testing.assert_array_equal(stats['last'], [[30., 59.], [89., 119.]])
+    np.testing.assert_array_equal(stats['duration'], [30*86400., 28*86400.])
+    np.testing.assert_allclose(
+        calcs.time_tendency_first_to_last(arr, freq='MS'),
+        (stats['last'] - stats['first']) / stats['duration']
+    )
+    xr.testing.assert_equal(calcs.period_mean(arr, freq='MS'), stats['mean'])
+
+
+def test_intermediate_cache_reuses_results():
+    cache = calcs.memo.IntermediateCache()
+    n_calls = []
+
+    @cache.memoize
+    def double(arr):
+        n_calls.append(1)
+        return 2*arr
+
+    arr = xr.DataArray(np.arange(10.), dims=['lat'],
+                       coords={'lat': np.arange(10.)})
+    first = double(arr)
+    # An equal array loaded separately should still hit the cache.
+    second = double(arr.copy(deep=True))
+    assert len(n_calls) == 1
+    assert cache.hits == 1
+    xr.testing.assert_identical(first, second)
+
+    double(arr + 1)
+    assert len(n_calls) == 2
+
+
+def test_intermediate_cache_results_read_only():
+    cache = calcs.memo.IntermediateCache()
+
+    @cache.memoize
+    def halves(arr):
+        return 0.5*arr, 0.5*arr.values
+
+    arr = xr.DataArray(np.arange(10.), dims=['lat'])
+    first, _ = halves(arr)
+    first.name = 'renamed'
+    with pytest.raises(ValueError):
+        first.values[:] = 0.
+    second, second_values = halves(arr)
+    assert second.name is None
+    with pytest.raises(ValueError):
+        second_values[:] = 0.
+    np.testing.assert_array_equal(second, 0.5*np.arange(10.))
+
+
+def test_fingerprint_dask_not_computed():
+    da = pytest.importorskip('dask.array')
+    n_computed = []
+
+    def ones(block):
+        n_computed.append(1)
+        return np.ones_like(block)
+
+    lazy = xr.DataArray(da.zeros(10, chunks=5).map_blocks(ones),
+                        dims=['lat'])
+    # Dask calls the function when building the array, to infer its type.
+    del n_computed[:]
+    key = calcs.memo.fingerprint(lazy)
+    assert key == calcs.memo.fingerprint(lazy.copy())
+    assert key != calcs.memo.fingerprint(lazy + 1)
+    assert not n_computed
+
+
+def test_intermediate_cache_lru_eviction():
+    arr = np.zeros(100)
+    cache = calcs.memo.IntermediateCache(max_bytes=2*arr.nbytes)
+    cache.put('a', arr)
+    cache.put('b', arr)
+    cache.get('a')
+    cache.put('c', arr)
+    assert 'a' in cache and 'c' in cache
+    assert 'b' not in cache
+    assert cache.nbytes == 2*arr.nbytes
+
+
+def test_pointwise_regr_stats_matches_scipy():
+    import scipy.stats
+    rand = np.random.RandomState(0)
+    x = rand.randn(50, 2, 3, 4)
+    y = 0.5*x + rand.randn(50, 2, 3, 4)
+    x[3, 0, 0, 0] = np.nan
+    y[7, 1, 2, 3] = np.nan
+    stats = calcs.stats.pointwise_regr_stats(x, y)
+    chunked = calcs.stats.pointwise_regr_stats(x, y, chunk_size=7)
+    for ind in [(0, 0, 0), (1, 2, 3), (1, 0, 2)]:
+        x_pt, y_pt = x[(slice(None),) + ind], y[(slice(None),) + ind]
+        valid = ~(np.isnan(x_pt) | np.isnan(y_pt))
+        expected = scipy.stats.linregress(x_pt[valid], y_pt[valid])
+        for result in (stats, chunked):
+            np.testing.assert_allclose(result['slope'][ind], expected[0])
+            np.testing.assert_allclose(result['intercept'][ind], expected[1])
+            np.testing.assert_allclose(result['corr'][ind], expected[2])
+            np.testing.assert_allclose(result['p_value'][ind], expected[3])
+            np.testing.assert_allclose(result['stderr'][ind], expected[4])
+
+
+def test_by_year_chunks_matches_unchunked():
+    time = xr.DataArray(
+        np.array(['2000-01-15', '2000-06-15', '2001-01-15', '2001-06-15',
+                  '2002-01-15'], dtype='datetime64[ns]'), dims=['time'],
+        name='time'
+    )
+    arr = xr.DataArray(np.arange(10.).reshape(5, 2), dims=['time', 'lat'],
+                       coords={'time': time, 'lat': [0., 10.]})
+    calls = []
+
+    @calcs.by_year_chunks
+    def func(arr, factor):
+        calls.append(arr.sizes['time'])
+        return arr*factor
+
+    expected = func(arr, 2.)
+    with calcs.years_per_chunk(2):
+        actual = func(arr, 2.)
+    assert calls == [5, 4, 1]
+    xr.testing.assert_identical(actual, expected)
+
+
+def test_hybrid_coord_matches_vertcoord():
+    from aospy.utils.vertcoord import dp_from_ps, pfull_from_ps
+    bk = xr.DataArray([0., 0., 0.5, 1.], dims=['phalf'],
+                      coords={'phalf': [1., 2., 3., 4.]})
+    pk = xr.DataArray([0., 1e4, 5e3, 0.], dims=['phalf'],
+                      coords={'phalf': [1., 2., 3., 4.]})
+    pfull = xr.DataArray([1.5, 2.5, 3.5], dims=['pfull'], name='pfull',
+                         coords={'pfull': [1.5, 2.5, 3.5]})
+    ps = xr.DataArray(1e5 + np.arange(6.).reshape(2, 3), dims=['time', 'lat'],
+                      coords={'time': [0, 1], 'lat': [-10., 0., 10.]})
+    calcs.clear_hybrid_coords()
+    coord = calcs.hybrid_coord(bk, pk, pfull)
+    assert calcs.hybrid_coord(bk.copy(), pk.copy(), pfull.copy()) is coord
+    xr.testing.assert_identical(coord.pfull(ps),
+                                pfull_from_ps(bk, pk, ps, pfull))
+    xr.testing.assert_identical(coord.dp(ps), dp_from_ps(bk, pk, ps, pfull))
+    # Derived once, and read-only whether newly derived or not.
+    dp = coord.dp(ps.copy())
+    assert np.shares_memory(dp.values, coord.dp(ps).values)
+    assert not dp.values.flags.writeable
+    xr.testing.assert_allclose(coord.dp_deta(ps),
+                               coord.dp(ps).transpose('pfull', 'time', 'lat'))
+
+
+def test_spectral_batch_matches_separate_transforms():
+    pytest.importorskip('animal_spharm')
+    rand = np.random.RandomState(0)
+    coords = {'time': [0, 1], 'lat': np.linspace(-87.5, 87.5, 36),
+              'lon': np.arange(0., 360., 5.)}
+    ps = xr.DataArray(1e5 + rand.randn(2, 36, 72), dims=['time', 'lat', 'lon'],
+                      coords=coords)
+    u, v = 10.*rand.randn(2, 2, 36, 72), 10.*rand.randn(2, 2, 36, 72)
+    u, v = [xr.DataArray(wind, dims=['time', 'pfull', 'lat', 'lon'],
+                         coords=dict(coords, pfull=[500., 850.]))
+            for wind in (u, v)]
+    batch = calcs.SpectralBatch([u, ps], [(u, v)], radius=6.371e6)
+    for n, arr in enumerate([u, ps]):
+        for actual, expected in zip(
+                batch.gradient(n),
+                calcs.numerics.horiz_gradient_spharm(arr, 6.371e6)):
+            xr.testing.assert_allclose(actual, expected)
+    xr.testing.assert_allclose(batch.divergence(),
+                               calcs.mass.horiz_divg_spharm(u, v, 6.371e6))
+
+
+def test_lat_metrics_match_per_slice():
+    rand = np.random.RandomState(0)
+    lat = np.linspace(-88.75, 88.75, 72)
+    shift = rand.uniform(-10., 10., (20, 1))
+    coords = {'time': np.arange(20), 'lat': lat}
+    flux = xr.DataArray(np.sin(np.deg2rad(lat - shift)), dims=['time', 'lat'],
+                        coords=coords)
+    flux[0] = np.nan
+    expected = [np.nan] + [calcs.thermal_equator(f, lat)
+                           for f in flux.values[1:]]
+    np.testing.assert_allclose(calcs.thermal_equator_lat(flux), expected)
+
+    strmfunc = -np.sin(3*np.deg2rad(lat - shift))
+    strmfunc = xr.DataArray(strmfunc[:, np.newaxis] * np.ones((1, 7, 1)),
+                            dims=['time', 'level', 'lat'],
+                            coords=dict(coords, level=np.arange(7.)))
+    expected = [calcs.had_bounds500(s, lat) for s in strmfunc.values]
+    np.testing.assert_allclose(calcs.hadley_edges(strmfunc, level=5.),
+                               expected)
+
+    precip = xr.DataArray(np.exp(-((lat - shift) / 10.)**2),
+                          dims=['time', 'lat'], coords=coords)
+    # Within half of the grid spacing of the true maximum.
+    np.testing.assert_allclose(calcs.itcz_lat(precip), shift[:, 0],
+                               atol=1.25)
+
+
+def test_mass_streamfunction_level_order():
+    from aospy.constants import grav, r_e
+    lat = np.linspace(-88.75, 88.75, 72)
+    level = np.array([1000., 850., 500., 250., 100.])
+    v = xr.DataArray(np.ones((3, level.size, lat.size)),
+                     dims=['time', 'level', 'lat'],
+                     coords={'time': np.arange(3), 'level': level,
+                             'lat': lat})
+    strmfunc = calcs.mass_streamfunction(v)
+    # Uniform northward flow: the mass above the middle of each level.
+    dp = calcs.plevel_thickness(v['level'])
+    mass_above = (dp.values[::-1].cumsum() - 0.5*dp.values[::-1])[::-1]
+    expected = (-2.*np.pi*r_e.value/grav.value * mass_above[:, np.newaxis] *
+                np.cos(np.deg2rad(lat)))
+    np.testing.assert_allclose(strmfunc.isel(time=0), expected)
+
+    flipped = calcs.mass_streamfunction(v.isel(level=slice(None, None, -1)))
+    np.testing.assert_allclose(flipped.sel(level=level), strmfunc)
+    on_pfull = calcs.mass_streamfunction(v.rename(level='pfull'),
+                                         dp=dp.rename(level='pfull'))
+    np.testing.assert_allclose(on_pfull, strmfunc)
+    np.testing.assert_allclose(calcs.mass_streamfunction_max(v),
+                               strmfunc.min('level'))
+
+    # The numpy wrappers' results can be modified without affecting others.
+    for func in (calcs.msf, calcs.msf_max):
+        legacy = func(lat, level, v.values[..., np.newaxis])
+        expected = legacy.copy()
+        legacy[:] = 0.
+        np.testing.assert_array_equal(
+            func(lat, level, v.values[..., np.newaxis]), expected
+        )
+
+
+def test_tropopause_pressure():
+    from aospy.constants import grav, R_d
+    z = np.arange(0., 25e3, 5.)
+
+    def profile(level, heights, lapse_rates):
+        """Temperature at the levels, and pressure at the given heights.
+
+        Each lapse rate applies from the corresponding height up to the
+        next one.  The pressure is in hydrostatic balance.
+        """
+        lapse_rate = np.asarray(lapse_rates)[
+            np.searchsorted(heights, z, side='right') - 1
+        ]
+        temp = 300. - np.concatenate([[0.], np.cumsum(
+            0.5*(lapse_rate[1:] + lapse_rate[:-1])*np.diff(z))])
+        log_p = np.log(1e5) - grav.value/R_d.value*np.concatenate([[0.], (
+            np.cumsum(0.5*(1./temp[1:] + 1./temp[:-1])*np.diff(z)))])
+        z_level = np.interp(-np.log(100.*level), -log_p, z)
+        return (np.interp(z_level, z, temp),
+                np.exp(np.interp(heights, z, log_p)))
+
+    level = np.arange(1000., 25., -25.)
+    temp, p_trop = zip(
+        profile(level, [0., 12e3], [6.5e-3, 0.]),
+        # A stable layer shallower than 2 km doesn't count.
+        profile(level, [0., 6e3, 7e3, 12e3], [6.5e-3, 0., 6.5e-3, 0.]),
+        profile(level, [0.], [6.5e-3])
+    )
+    temp = xr.DataArray(list(temp), dims=['lat', 'level'],
+                        coords={'level': level})
+    trop_p = calcs.tropopause_pressure(temp)
+    # Within half of the level spacing.
+    np.testing.assert_allclose(trop_p[:2], [p_trop[0][1], p_trop[1][3]],
+                               atol=1250.)
+    assert np.isnan(trop_p[2])
+    np.testing.assert_allclose(
+        calcs.tropopause_pressure(temp.isel(level=slice(None, None, -1))),
+        trop_p
+    )
+    p = xr.DataArray(np.broadcast_to(100.*level, temp.shape),
+                     dims=['lat', 'pfull'])
+    np.testing.assert_allclose(
+        calcs.tropopause_pressure(temp.rename(level='pfull'), p), trop_p
+    )
+    level_pa = xr.DataArray(100.*level, dims=['level'],
+                            attrs={'units': 'Pa'})
+    np.testing.assert_allclose(
+        calcs.tropopause_pressure(temp.assign_coords(level=level_pa)), trop_p
+    )
+    np.testing.assert_allclose(calcs.trop_height(level, temp.values.T),
+                               1e-2*trop_p)
+    np.testing.assert_allclose(
+        calcs.trop_height(100.*level, temp.values.T, units='Pa'), trop_p
+    )
+
+    # On unevenly spaced levels, a stable layer shallower than 2 km that
+    # counts, since the average lapse rate over 2 km is still below 2 K/km.
+    level = np.array([1000., 925., 850., 700., 600., 500., 400., 300., 250.,
+                      200., 150., 100., 70., 50., 30., 20., 10.])
+    temp, p_trop = profile(level, [0., 8e3, 9.8e3, 16e3],
+                           [6.5e-3, 0., 8e-3, 0.])
+    temp = xr.DataArray(temp, dims=['level'], coords={'level': level})
+    np.testing.assert_allclose(calcs.tropopause_pressure(temp), p_trop[1],
+                               atol=5000.)
+
+
+def test_precip_centroid_matches_interp():
+    rand = np.random.RandomState(0)
+    lat = np.linspace(-88.75, 88.75, 72)
+    shift = rand.uniform(-5., 5., (10, 1))
+    precip = xr.DataArray(np.exp(-((lat - shift) / 10.)**2),
+                          dims=['time', 'lat'],
+                          coords={'time': np.arange(10), 'lat': lat})
+    precip[0] = np.nan
+    # Cumulative integral of each profile interpolated by `np.interp`.
+    lat_interp = np.arange(-20., 20.01, 0.1)
+    trop = np.abs(lat) < 20.
+    expected = []
+    for prec in precip.values[1:]:
+        prec = (np.interp(lat_interp, lat[trop], prec[trop]) *
+                np.cos(np.deg2rad(lat_interp)))
+        prec_int = np.concatenate(
+            [[0.], np.cumsum(0.5*(prec[1:] + prec[:-1]))])
+        expected.append(lat_interp[np.argmin(np.abs(prec_int -
+                                                    0.5*prec_int[-1]))])
+    centroid = calcs.precip_centroid_lat(precip)
+    assert np.isnan(centroid[0])
+    np.testing.assert_allclose(centroid[1:], expected)
+    exact = calcs.precip_centroid_lat(precip, exact=True)
+    np.testing.assert_allclose(exact[1:], expected, atol=0.05)
+    # The same weights are reused, whatever the latitudes' order.
+    flipped = calcs.precip_centroid_lat(precip.isel(lat=slice(None, None, -1)),
+                                        exact=True)
+    np.testing.assert_allclose(flipped, exact)
+    assert (calcs.centroid_weights(lat)[-1] is
+            calcs.centroid_weights(lat.copy())[-1])
+
+
+def test_implied_transport():
+    lat = np.linspace(-89.5, 89.5, 180)
+    lat = xr.DataArray(lat, dims=['lat'], coords={'lat': lat})
+    lon = np.arange(0.5, 360., 1.)
+    lon = xr.DataArray(lon, dims=['lon'], coords={'lon': lon})
+    radius = 6371e3
+    sfc_area = calcs.grid_sfc_area(lat, lon, radius=radius)
+    np.testing.assert_allclose(sfc_area.sum(), 4*np.pi*radius**2)
+    assert calcs.grid_sfc_area(lat.copy(), lon.copy(),
+                               radius=radius) is sfc_area
+
+    # Source antisymmetric about the equator, plus a uniform part that the
+    # global mean removes.  Exactly, the transport at latitude phi is then
+    # pi*r^2*(sin(phi)^2 - 1).
+    lat_edges = np.deg2rad(lat.values + 0.5)
+    profile = np.sin(np.deg2rad(lat)) * xr.DataArray([1., 2.], dims=['run'])
+    source = (profile + 10.) * xr.ones_like(lon)
+    transport = calcs.implied_transport(source, sfc_area=sfc_area)
+    expected = (np.pi*radius**2 *
+                xr.DataArray(np.sin(lat_edges)**2 - 1., dims=['lat']) *
+                xr.DataArray([1., 2.], dims=['run']))
+    np.testing.assert_allclose(transport.transpose('run', 'lat'),
+                               expected.transpose('run', 'lat'),
+                               atol=1e-3*np.pi*radius**2)
+
+    flipped = calcs.implied_transport(source.isel(lat=slice(None, None, -1)),
+                                      sfc_area=sfc_area)
+    # Roundoff leaves a few W at the north pole.
+    atol = 1e-6*np.pi*radius**2
+    np.testing.assert_allclose(flipped.sel(lat=lat), transport, atol=atol)
+    parts = calcs.implied_transport(source, sfc_area=sfc_area,
+                                    latent_source=0.25*source)
+    np.testing.assert_allclose(parts.sel(component='total'), transport,
+                               atol=atol)
+    np.testing.assert_allclose(parts.sel(component='latent'), 0.25*transport,
+                               atol=atol)
+    np.testing.assert_allclose(parts.sel(component='dry_static'),
+                               0.75*transport, atol=atol)
+
+
+@pytest.mark.parametrize('freq', [None, 'MS'])
+def test_budget_terms_match_per_term(freq):
+    pytest.importorskip('animal_spharm')
+    from aospy.utils.vertcoord import int_dp_g
+    rand = np.random.RandomState(0)
+    radius = 6.371e6
+    time = np.arange('2000-01-01T00', '2000-03-01T00', np.timedelta64(6, 'h'),
+                     dtype='datetime64[h]')
+    pfull = [300., 500., 850.]
+    coords = {'time': time, 'pfull': pfull,
+              'lat': np.linspace(-87.5, 87.5, 36),
+              'lon': np.arange(0., 360., 10.)}
+    dims = ['time', 'pfull', 'lat', 'lon']
+    shape = (time.size, 3, 36, 36)
+    q, u, v, omega = [xr.DataArray(scale*rand.randn(*shape), dims=dims,
+                                   coords=coords)
+                      for scale in (1e-3, 10., 10., 0.1)]
+    p = 100.*q['pfull']
+    dp = xr.DataArray([250e2, 275e2, 250e2], dims=['pfull'],
+                      coords={'pfull': pfull})
+    evap, precip = [xr.DataArray(1e-5*rand.rand(time.size, 36, 36),
+                                 dims=['time', 'lat', 'lon'],
+                                 coords={name: coords[name]
+                                         for name in ('time', 'lat', 'lon')})
+                    for _ in range(2)]
+    terms = calcs.moisture_budget_terms(q, u, v, dp, radius, evap, precip,
+                                        omega=omega, p=p, freq=freq)
+
+    column = int_dp_g(q, dp)
+    transport = calcs.column_flux_divg(q, u, v, radius, dp)
+    source = calcs.moisture_column_source(precip, evap)
+    expected = {'horiz_advec': calcs.horiz_advec(q, u, v, radius),
+                'vert_advec': calcs.vert_advec(q, omega, p)}
+    if freq is None:
+        expected.update(column=column, column_divg=transport, source=source,
+                        tendency=calcs.time_tendency_each_timestep(column))
+        expected['residual'] = expected['tendency'] + transport - source
+    else:
+        expected = dict((name, calcs.period_mean(term, freq))
+                        for name, term in expected.items())
+        tendency = calcs.time_tendency_first_to_last(column, freq=freq)
+        expected.update(
+            column=calcs.period_mean(column, freq), tendency=tendency,
+            column_divg=calcs.period_mean(transport, freq),
+            source=calcs.period_mean(source, freq),
+            residual=calcs.mass.budget_residual(tendency, transport,
+                                                source, freq=freq)
+        )
+    assert set(terms.data_vars) == set(expected)
+    assert terms['time'].size == (time.size if freq is None else 2)
+    for name, term in expected.items():
+        np.testing.assert_allclose(terms[name].transpose(*term.dims), term,
+                                   err_msg=name)
+
+
+@pytest.mark.parametrize('order', [2, 4])
+def test_periodic_cen_deriv(order):
+    lon = np.arange(0., 360., 2.5)
+    arr = xr.DataArray(np.sin(np.deg2rad(lon))[np.newaxis] * [[1.], [2.]],
+                       dims=['lat', 'lon'],
+                       coords={'lat': [0., 10.], 'lon': lon}, name='arr')
+    expected = np.cos(np.deg2rad(lon))[np.newaxis] * [[1.], [2.]]
+    actual = calcs.periodic_cen_deriv(arr, 'lon', order=order)
+    assert actual.dims == arr.dims and actual.name == arr.name
+    np.testing.assert_allclose(actual, expected, atol=10.**(-1 - order))
+
+
+@pytest.mark.parametrize('order', [1, 2, 3])
+def test_periodic_upwind_advec(order):
+    lon = np.arange(0., 360., 1.)
+    arr = xr.DataArray(np.sin(np.deg2rad(lon)), dims=['lon'],
+                       coords={'lon': lon})
+    flow = xr.DataArray(np.where(lon < 180., 2., -2.), dims=['lon'],
+                        coords={'lon': lon})
+    expected = flow*np.cos(np.deg2rad(lon))
+    actual = calcs.periodic_upwind_advec(flow, arr, 'lon', order=order)
+    np.testing.assert_allclose(actual, expected, atol=10.**(-order))
+
+
+def test_periodic_upwind_advec_upstream():
+    lon = np.arange(0., 360., 90.)
+    arr = xr.DataArray([0., 1., 0., 0.], dims=['lon'], coords={'lon': lon})
+    flow = xr.DataArray([1., 1., -1., -1.], dims=['lon'],
+                        coords={'lon': lon})
+    actual = calcs.periodic_upwind_advec(flow, arr, 'lon', order=1)
+    np.testing.assert_allclose(actual*np.pi/2., [0., 1., 0., 0.])
+
+
+def test_periodic_upwind_advec_dask():
+    pytest.importorskip('dask.array')
+    lon = np.arange(0., 360., 10.)
+    rand = np.random.RandomState(0)
+    arr = xr.DataArray(rand.rand(4, lon.size), dims=['lat', 'lon'],
+                       coords={'lat': np.arange(4.), 'lon': lon})
+    flow = xr.DataArray(rand.randn(4), dims=['lat'],
+                        coords={'lat': np.arange(4.)})
+    expected = calcs.periodic_upwind_advec(flow.broadcast_like(arr), arr,
+                                           'lon', order=2)
+    actual = calcs.periodic_upwind_advec(flow, arr.chunk({'lat': 2}), 'lon',
+                                         order=2)
+    assert hasattr(actual.data, 'dask') and actual.dims == arr.dims
+    xr.testing.assert_allclose(actual.compute(), expected)
@@ -2813,12 +2813,12 @@ msf = Var(
     name='msf',
     domain='atmos',
     description='Eulerian meridional mass streamfunction.',
-    variables=(level, vcomp),
+    variables=(vcomp, dp),
     def_time=True,
     def_vert=True,
     def_lat=True,
     def_lon=False,
-    func=calcs.msf,
+    func=calcs.mass_streamfunction,
     units=units.kg_s1
 )
 mass_flux = Var(
@@ -2826,12 +2826,12 @@ mass_flux = Var(
     domain='atmos',
     description=('Mass flux: Eulerian meridional mass streamfunction '
                  'integrated to the level of its maximum magnitude.'),
-    variables=(level, vcomp),
+    variables=(vcomp, dp),
     def_time=True,
     def_vert=False,
     def_lat=True,
     def_lon=False,
-    func=calcs.msf_max,
+    func=calcs.mass_streamfunction_max,
     units=units.kg_s1
 )
 omega_from_divg_eta = Var(
@@ -2908,6 +2908,20 @@ prec_conv_frac = Var(
     func=calcs.prec_conv_frac,
     units=units.unitless
 )
+precip_centroid = Var(
+    name='precip_centroid',
+    domain='atmos',
+    description=('ITCZ location as the centroid of the area-weighted '
+                 'zonal-mean precipitation within 20 degrees of the '
+                 'equator.'),
+    variables=(precip,),
+    def_time=True,
+    def_vert=False,
+    def_lat=False,
+    def_lon=False,
+    func=calcs.precip_centroid_lat,
+    units=units.latlon
+)
 precip_large_scale = Var(
     name='precip_large_scale',
     domain='atmos',
@@ -3433,6 +3447,19 @@ total_gms = Var(
     func=calcs.total_gms,
     units=units.K
 )
+trop_p = Var(
+    name='trop_p',
+    domain='atmos',
+    description=('Pressure of the WMO lapse-rate tropopause, following '
+                 'Reichler et al 2003.'),
+    variables=(temp, p),
+    def_time=True,
+    def_vert=False,
+    def_lat=True,
+    def_lon=True,
+    func=calcs.tropopause_pressure,
+    units=units.Pa
+)
 cre_sw_precip_corr = Var(
     name='cre_sw_precip_corr',
     domain='atmos',
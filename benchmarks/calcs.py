@@ -0,0 +1,125 @@
+"""Benchmarks of the most expensive functions in `aospy_user.calcs`.
+
+Each is timed on synthetic data on the grids of AM2, AM3, and HiRAM.
+"""
+from aospy_user import calcs
+from aospy_user.calcs.advection import (zonal_advec_upwind,
+                                        merid_advec_upwind)
+from aospy_user.calcs.mass import (horiz_divg_spharm,
+                                   uv_column_budget_adjustment)
+from aospy_user.calcs.numerics import horiz_gradient_spharm, spharm_plan
+from aospy_user.calcs.transport import omega_from_divg_eta
+from aospy_user.calcs.circ_metrics import (hadley_edges, itcz_lat,
+                                           precip_centroid_lat,
+                                           thermal_equator_lat)
+from aospy_user.calcs.zonal_mean_circ import (had_bounds500, itcz_loc, msf,
+                                              prec_centroid, thermal_equator)
+
+from . import synthetic
+from .synthetic import RADIUS
+
+
+class _GridBenchmark(object):
+    params = sorted(synthetic.GRIDS)
+    param_names = ['grid']
+    timeout = 300
+
+
+class FiniteDifferences(_GridBenchmark):
+    def setup(self, grid):
+        self.ds = synthetic.eta_dataset(grid)
+
+    def time_d_dx_from_latlon(self, grid):
+        calcs.d_dx_from_latlon(self.ds.temp, RADIUS)
+
+    def time_d_dy_from_lat(self, grid):
+        calcs.d_dy_from_lat(self.ds.temp, RADIUS)
+
+    def time_zonal_advec_upwind(self, grid):
+        zonal_advec_upwind(self.ds.temp, self.ds.ucomp, RADIUS)
+
+    def time_merid_advec_upwind(self, grid):
+        merid_advec_upwind(self.ds.temp, self.ds.vcomp, RADIUS)
+
+
+class SphericalHarmonics(_GridBenchmark):
+    def setup(self, grid):
+        self.ds = synthetic.eta_dataset(grid)
+        # Time the transforms themselves, not the one-off creation of the
+        # transform object for the grid.
+        spharm_plan(self.ds.lat.size, self.ds.lon.size, RADIUS)
+        self.ps = self.ds.ps
+        self.residual = self.ps - self.ps.mean()
+
+    def time_horiz_gradient_spharm(self, grid):
+        horiz_gradient_spharm(self.ds.temp, RADIUS)
+
+    def time_horiz_divg_spharm(self, grid):
+        horiz_divg_spharm(self.ds.ucomp, self.ds.vcomp, RADIUS)
+
+    def time_uv_column_budget_adjustment(self, grid):
+        uv_column_budget_adjustment(self.ds.ucomp, self.ds.vcomp,
+                                    self.residual, self.ps, RADIUS)
+
+    def time_omega_from_divg_eta(self, grid):
+        omega_from_divg_eta(self.ds.ucomp, self.ds.vcomp, self.ps, RADIUS,
+                            self.ds.bk, self.ds.pk)
+
+    def peakmem_omega_from_divg_eta(self, grid):
+        omega_from_divg_eta(self.ds.ucomp, self.ds.vcomp, self.ps, RADIUS,
+                            self.ds.bk, self.ds.pk)
+
+
+class PressureLevelDiagnostics(_GridBenchmark):
+    def setup(self, grid):
+        self.ds = synthetic.plevel_dataset(grid, n_time=12)
+
+    def time_z_from_hypso(self, grid):
+        calcs.z_from_hypso(self.ds.ps, self.ds.temp, self.ds.sphum)
+
+    def time_pointwise_corr(self, grid):
+        calcs.pointwise_corr(self.ds.temp, self.ds.sphum)
+
+    def time_implied_transport(self, grid):
+        calcs.implied_transport(self.ds.ps)
+
+    def time_tropopause_pressure(self, grid):
+        calcs.tropopause_pressure(self.ds.temp)
+
+    def time_msf(self, grid):
+        msf(self.ds.lat.values, synthetic.PLEVELS, self.ds.vcomp.values)
+
+
+class LatitudeMetrics(_GridBenchmark):
+    """Vectorized metrics versus looping over the samples one at a time."""
+    def setup(self, grid):
+        self.ds = synthetic.zonal_mean_profiles(grid)
+        self.lat = self.ds.lat.values
+
+    def time_itcz_lat(self, grid):
+        itcz_lat(self.ds.precip)
+
+    def time_itcz_loc_loop(self, grid):
+        for precip in self.ds.precip.values:
+            itcz_loc(self.lat, precip)
+
+    def time_thermal_equator_lat(self, grid):
+        thermal_equator_lat(self.ds.flux)
+
+    def time_thermal_equator_loop(self, grid):
+        for flux in self.ds.flux.values:
+            thermal_equator(flux, self.lat)
+
+    def time_hadley_edges(self, grid):
+        hadley_edges(self.ds.strmfunc, level=synthetic.PLEVELS[5])
+
+    def time_had_bounds500_loop(self, grid):
+        for strmfunc in self.ds.strmfunc.values:
+            had_bounds500(strmfunc, self.lat)
+
+    def time_precip_centroid_lat(self, grid):
+        precip_centroid_lat(self.ds.precip)
+
+    def time_prec_centroid_loop(self, grid):
+        for precip in self.ds.precip:
+            prec_centroid(precip)
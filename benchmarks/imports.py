@@ -0,0 +1,20 @@
+"""Benchmarks of the time to import `aospy_user` and its registries.
+
+Each is timed in a fresh interpreter, so that nothing is already imported.
+"""
+
+
+class ImportTime(object):
+    timeout = 120
+
+    def timeraw_import_aospy_user(self):
+        return "import aospy_user"
+
+    def timeraw_import_main(self):
+        return "from aospy_user import main"
+
+    def timeraw_access_proj(self):
+        return "import aospy_user; aospy_user.projs.aero_3agcm"
+
+    def timeraw_access_variables(self):
+        return "import aospy_user; aospy_user.variables"
@@ -0,0 +1,120 @@
+"""Synthetic data on grids mimicking those of GFDL models."""
+import numpy as np
+import xarray as xr
+
+from aospy_user import (LAT_STR, LON_STR, PFULL_STR, PHALF_STR, PLEVEL_STR,
+                        TIME_STR)
+
+RADIUS = 6370997.
+
+# Number of latitudes, longitudes, and model-native vertical levels.
+GRIDS = {
+    'am2': (90, 144, 24),
+    'am3': (90, 144, 48),
+    'hiram': (360, 576, 32),
+}
+
+# Standard pressure levels in hPa, as in the GFDL post-processed output.
+PLEVELS = np.array([1000., 925., 850., 775., 700., 600., 500., 400., 300.,
+                    250., 200., 150., 100., 70., 50., 30., 20., 10.])
+
+
+def _latlon(n_lat, n_lon):
+    dlat, dlon = 180. / n_lat, 360. / n_lon
+    lat = xr.DataArray(np.arange(-90. + 0.5*dlat, 90., dlat), dims=[LAT_STR],
+                       name=LAT_STR)
+    lon = xr.DataArray(np.arange(0.5*dlon, 360., dlon), dims=[LON_STR],
+                       name=LON_STR)
+    return lat, lon
+
+
+def _time(n_time):
+    times = (np.datetime64('2000-01-01', 'ns') +
+             np.arange(n_time)*np.timedelta64(6, 'h'))
+    return xr.DataArray(times, dims=[TIME_STR], name=TIME_STR)
+
+
+def hybrid_coefs(n_lev, p_top=100., p_ref=1e5):
+    """Hybrid sigma-pressure `bk` and `pk` on the model's half levels.
+
+    Levels are pure pressure near the model top and pure sigma at the
+    surface, as in the GFDL models.
+    """
+    eta = np.linspace(0., 1., n_lev + 1)
+    bk = eta**2
+    pk = p_top + (p_ref - p_top)*eta - p_ref*bk
+    phalf = (pk + bk*p_ref) * 1e-2
+    coords = {PHALF_STR: phalf}
+    return (xr.DataArray(bk, dims=[PHALF_STR], coords=coords, name='bk'),
+            xr.DataArray(pk, dims=[PHALF_STR], coords=coords, name='pk'))
+
+
+def _random(dims, coords, mean, std, name, seed):
+    coords = dict((dim, coords[dim]) for dim in dims)
+    shape = [coords[dim].size for dim in dims]
+    values = mean + std*np.random.RandomState(seed).standard_normal(shape)
+    return xr.DataArray(values, dims=dims, coords=coords, name=name)
+
+
+def eta_dataset(grid, n_time=4):
+    """Fields on the model-native hybrid levels of the given grid."""
+    n_lat, n_lon, n_lev = GRIDS[grid]
+    lat, lon = _latlon(n_lat, n_lon)
+    bk, pk = hybrid_coefs(n_lev)
+    pfull = 0.5*(bk[PHALF_STR].values[1:] + bk[PHALF_STR].values[:-1])
+    coords = {TIME_STR: _time(n_time), PFULL_STR: pfull, LAT_STR: lat,
+              LON_STR: lon}
+    dims_3d = [TIME_STR, PFULL_STR, LAT_STR, LON_STR]
+    dims_2d = [TIME_STR, LAT_STR, LON_STR]
+    ds = xr.Dataset({
+        'ps': _random(dims_2d, coords, 1e5, 1e3, 'ps', 0),
+        'temp': _random(dims_3d, coords, 250., 20., 'temp', 1),
+        'sphum': np.abs(_random(dims_3d, coords, 0., 5e-3, 'sphum', 2)),
+        'ucomp': _random(dims_3d, coords, 5., 10., 'ucomp', 3),
+        'vcomp': _random(dims_3d, coords, 0., 5., 'vcomp', 4),
+    })
+    ds['bk'], ds['pk'] = bk, pk
+    return ds
+
+
+def plevel_dataset(grid, n_time=4):
+    """Fields interpolated to standard pressure levels on the given grid."""
+    n_lat, n_lon, _ = GRIDS[grid]
+    lat, lon = _latlon(n_lat, n_lon)
+    coords = {TIME_STR: _time(n_time), PLEVEL_STR: PLEVELS, LAT_STR: lat,
+              LON_STR: lon}
+    dims_3d = [TIME_STR, PLEVEL_STR, LAT_STR, LON_STR]
+    dims_2d = [TIME_STR, LAT_STR, LON_STR]
+    return xr.Dataset({
+        'ps': _random(dims_2d, coords, 1e5, 1e3, 'ps', 0),
+        'temp': _random(dims_3d, coords, 250., 20., 'temp', 1),
+        'sphum': np.abs(_random(dims_3d, coords, 0., 5e-3, 'sphum', 2)),
+        'vcomp': _random(dims_3d, coords, 0., 5., 'vcomp', 4),
+    })
+
+
+def zonal_mean_profiles(grid, n_samples=720):
+    """Zonal-mean precipitation, energy flux, and streamfunction.
+
+    Each sample (e.g. a month of one of many runs) has its ITCZ, thermal
+    equator, and Hadley cells displaced by a random amount.
+    """
+    n_lat, _, _ = GRIDS[grid]
+    lat, _ = _latlon(n_lat, 1)
+    rand = np.random.RandomState(0)
+    shift = rand.uniform(-10., 10., (n_samples, 1))
+    noise = rand.standard_normal((n_samples, n_lat))
+    lat_shifted = lat.values[np.newaxis] - shift
+    coords = {'sample': np.arange(n_samples), LAT_STR: lat,
+              PLEVEL_STR: PLEVELS}
+    # Streamfunction zero crossings at the equator and at 60 degrees.
+    profile = -np.sin(3*np.deg2rad(lat_shifted))
+    vert = np.sin(np.pi*np.arange(PLEVELS.size) / (PLEVELS.size - 1.))
+    return xr.Dataset({
+        'precip': (['sample', LAT_STR],
+                   np.exp(-(lat_shifted / 10.)**2) + 0.01*noise),
+        'flux': (['sample', LAT_STR], np.sin(np.deg2rad(lat_shifted)) +
+                 0.01*noise),
+        'strmfunc': (['sample', PLEVEL_STR, LAT_STR],
+                     1e11*vert[:, np.newaxis]*profile[:, np.newaxis]),
+    }, coords=coords)